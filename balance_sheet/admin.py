@@ -1,3 +1,37 @@
 from django.contrib import admin
+from .models import Account, BalanceSnapshot, NetWorth
 
-# Register your models here.
+
+class BalanceSnapshotInline(admin.TabularInline):
+    model = BalanceSnapshot
+    extra = 1
+    fields = ['year_month', 'amount', 'memo']
+
+
+@admin.register(Account)
+class AccountAdmin(admin.ModelAdmin):
+    list_display = ['name', 'kind', 'category', 'source', 'is_active']
+    list_filter = ['kind', 'category', 'source', 'is_active']
+    search_fields = ['name']
+    inlines = [BalanceSnapshotInline]
+
+
+@admin.register(BalanceSnapshot)
+class BalanceSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['year_month', 'account', 'amount']
+    list_filter = ['account__kind', 'year_month']
+    search_fields = ['account__name']
+    list_select_related = ['account']
+    date_hierarchy = 'year_month'
+
+
+@admin.register(NetWorth)
+class NetWorthAdmin(admin.ModelAdmin):
+    list_display = ['year_month', 'total_assets', 'total_liabilities', 'net_worth']
+    date_hierarchy = 'year_month'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
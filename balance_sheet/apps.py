@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class BalanceSheetConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'balance_sheet'
+
+    def ready(self):
+        from . import signals
+        signals.connect()
@@ -0,0 +1,305 @@
+"""
+財務健全性指標
+月次キャッシュフロー・支払いスケジュール・純資産推移・現金科目の残高を年月順に1回だけ走査し、
+各月の指標と移動窓の統計（平均・標準偏差・傾き）を計算する
+
+- 貯蓄率: 純キャッシュフロー ÷ 収入合計
+- 返済負担率: ローン返済（固定費のローン＋短期ローン）÷ 収入合計
+- 生活防衛資金: 現金・預金 ÷ 移動窓の平均支出（ヶ月分）
+- クレカ利用率: 引落予定 ÷ 利用限度額（限度額が登録されたカードのみ）
+- 支出比率: 支出総額 ÷ 収入合計
+
+結果はデータの版（各テーブルの件数と最終更新日時）ごとにキャッシュし、
+データが変わっていなければ集計せずに返す
+"""
+import hashlib
+import heapq
+import math
+from collections import deque
+from itertools import groupby
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from common.database import iterate
+
+from .models import Account, BalanceSnapshot, NetWorth
+
+
+DEFAULT_WINDOW = 12
+CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+# 生活防衛資金に数える科目のカテゴリ
+LIQUID_CATEGORIES = ['cash']
+
+# 窓全体でこれ以上動いたら「傾向」として警告する（支出比率は5ポイント）
+TREND_TOLERANCE = 0.05
+
+# 指標ごとの (注意, 危険) のしきい値と、値が小さいほど悪いか
+THRESHOLDS = {
+    'savings_rate': (0.1, 0.0, True),
+    'debt_service_ratio': (0.25, 0.35, False),
+    'emergency_fund_months': (3.0, 1.0, True),
+    'credit_utilization': (0.3, 0.7, False),
+    'expense_ratio': (0.8, 1.0, False),
+}
+
+METRICS = list(THRESHOLDS)
+
+METRIC_LABELS = {
+    'savings_rate': '貯蓄率',
+    'debt_service_ratio': '返済負担率',
+    'emergency_fund_months': '生活防衛資金（ヶ月）',
+    'credit_utilization': 'クレカ利用率',
+    'expense_ratio': '支出比率',
+}
+
+
+class RollingWindow:
+    """
+    直近 size 件の移動窓の統計（合計・二乗和・x*y の和を更新して1件あたり O(1)）
+    None は窓に入れない
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.values = deque()
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.weighted = 0.0  # Σ i*y（i は窓内の位置 0..n-1）
+
+    def push(self, value):
+        if value is None:
+            return
+        if len(self.values) == self.size:
+            removed = self.values.popleft()
+            self.total -= removed
+            self.total_squares -= removed * removed
+            # 位置が1つずつ前にずれる: Σ(i-1)*y = Σ i*y - Σ y（外れた値は位置0なので寄与なし）
+            self.weighted -= self.total
+        self.weighted += len(self.values) * value
+        self.values.append(value)
+        self.total += value
+        self.total_squares += value * value
+
+    @property
+    def count(self):
+        return len(self.values)
+
+    def mean(self):
+        if not self.values:
+            return None
+        return self.total / len(self.values)
+
+    def std(self):
+        """標本標準偏差（2件未満なら None）"""
+        n = len(self.values)
+        if n < 2:
+            return None
+        variance = (self.total_squares - self.total * self.total / n) / (n - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def slope(self):
+        """最小二乗法による1件あたりの傾き（2件未満なら None）"""
+        n = len(self.values)
+        if n < 2:
+            return None
+        mean_x = (n - 1) / 2
+        sxx = n * (n * n - 1) / 12
+        return (self.weighted - mean_x * self.total) / sxx
+
+    def stats(self):
+        return {
+            'mean': self.mean(),
+            'std': self.std(),
+            'slope': self.slope(),
+            'count': self.count,
+        }
+
+
+def _ratio(numerator, denominator):
+    if not denominator:
+        return None
+    return numerator / denominator
+
+
+def _sources():
+    """データの版を判定するモデル（すべて updated_at を持つ）"""
+    from cashflow.models import MonthlyCashFlow
+    from credit.models import CreditCard, PaymentSchedule
+    return [MonthlyCashFlow, PaymentSchedule, CreditCard, Account, BalanceSnapshot, NetWorth]
+
+
+def data_version():
+    """
+    集計元テーブルの件数と最終更新日時から作ったデータの版（テーブルごとに1クエリ）
+    一括更新（bulk_update / update）でも updated_at が更新されるため、シグナルに頼らず変更を検出できる
+    """
+    parts = []
+    for model in _sources():
+        stats = model.objects.aggregate(count=Count('pk'), updated=Max('updated_at'))
+        parts.append(f"{model._meta.label_lower}:{stats['count']}:{stats['updated']}")
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+def _streams():
+    """
+    集計元ごとの (年月, 種類, 値) を年月順に返すイテレータ（それぞれ1クエリ、iterate() で逐次読み込み）
+    """
+    from cashflow.models import MonthlyCashFlow
+    from credit.models import PaymentSchedule
+
+    cashflows = iterate(MonthlyCashFlow.objects.order_by('year_month').values_list(
+        'year_month', 'total_income', 'total_expense', 'net_cashflow',
+        'housing_loan', 'other_loans', 'closing_balance'
+    ))
+    schedules = iterate(PaymentSchedule.objects.order_by('year_month').values_list(
+        'year_month', 'credit_card_payments', 'total_loan_payment'
+    ))
+    net_worth = iterate(NetWorth.objects.order_by('year_month').values_list(
+        'year_month', 'total_assets', 'total_liabilities', 'net_worth'
+    ))
+    liquid = iterate(BalanceSnapshot.objects.filter(
+        account__kind='asset', account__category__in=LIQUID_CATEGORIES
+    ).order_by('year_month').values_list('year_month', 'account_id', 'amount'))
+
+    return [
+        ((row[0], 'cashflow', row[1:]) for row in cashflows),
+        ((row[0], 'schedule', row[1:]) for row in schedules),
+        ((row[0], 'net_worth', row[1:]) for row in net_worth),
+        ((row[0], 'liquid', row[1:]) for row in liquid),
+    ]
+
+
+def compute(window=DEFAULT_WINDOW):
+    """
+    全期間の指標を1回の走査で計算
+    {'window', 'months': [各月の指標], 'rolling': {指標: 統計}, 'latest': 最新の指標,
+     'latest_months': {指標: 値の年月}, 'alerts': [...]}
+    """
+    from credit.models import CreditCard
+
+    limits = dict(
+        CreditCard.objects.filter(is_active=True, credit_limit__gt=0).values_list('name', 'credit_limit')
+    )
+    total_limit = sum(limits.values())
+    windows = {name: RollingWindow(window) for name in METRICS}
+    expense_window = RollingWindow(window)
+    net_worth_window = RollingWindow(window)
+    liquid_balances = {}
+
+    merged = heapq.merge(*_streams(), key=lambda item: item[0])
+    months = []
+    for year_month, items in groupby(merged, key=lambda item: item[0]):
+        month = {'year_month': year_month}
+        cashflow = schedule = None
+        for _, kind, values in items:
+            if kind == 'cashflow':
+                cashflow = values
+            elif kind == 'schedule':
+                schedule = values
+            elif kind == 'net_worth':
+                month['total_assets'], month['total_liabilities'], month['net_worth'] = values
+            else:
+                account_id, amount = values
+                liquid_balances[account_id] = amount
+
+        income = expense = loans = 0
+        if cashflow is not None:
+            income, expense, net_cashflow, housing_loan, other_loans, closing_balance = cashflow
+            loans = housing_loan + other_loans
+            month['savings_rate'] = _ratio(net_cashflow, income)
+            month['expense_ratio'] = _ratio(expense, income)
+            expense_window.push(expense)
+        if schedule is not None:
+            card_payments, short_term_loans = schedule
+            loans += short_term_loans
+            used = sum(amount for card, amount in card_payments.items() if card in limits)
+            month['credit_utilization'] = _ratio(used, total_limit)
+        if cashflow is not None or schedule is not None:
+            month['debt_service_ratio'] = _ratio(loans, income)
+
+        # 現金科目がなければ口座残高（期末）を使う
+        if liquid_balances:
+            liquid = sum(liquid_balances.values())
+        elif cashflow is not None:
+            liquid = closing_balance
+        else:
+            liquid = None
+        if liquid is not None:
+            month['emergency_fund_months'] = _ratio(liquid, expense_window.mean())
+
+        for name in METRICS:
+            month.setdefault(name, None)
+            windows[name].push(month[name])
+        if 'net_worth' in month:
+            net_worth_window.push(month['net_worth'])
+        months.append(month)
+
+    # 指標ごとに値がある最新の月の値と、その年月（最新月に値がない指標は前の月の値になる）
+    latest, latest_months = {}, {}
+    for month in months:
+        for key, value in month.items():
+            if value is not None:
+                latest[key] = value
+                latest_months[key] = month['year_month']
+    rolling = {name: windows[name].stats() for name in METRICS}
+    rolling['net_worth'] = net_worth_window.stats()
+    return {
+        'window': window,
+        'months': months,
+        'rolling': rolling,
+        'latest': latest,
+        'latest_months': latest_months,
+        'alerts': alerts(latest, rolling, latest_months),
+    }
+
+
+def level(name, value):
+    """指標の値を 'safe' / 'warning' / 'danger' に判定（値がなければ None）"""
+    if value is None:
+        return None
+    warning, danger, lower_is_worse = THRESHOLDS[name]
+    if lower_is_worse:
+        value, warning, danger = -value, -warning, -danger
+    if value >= danger:
+        return 'danger'
+    if value >= warning:
+        return 'warning'
+    return 'safe'
+
+
+def alerts(latest, rolling, latest_months=None):
+    """
+    最新の指標と推移から警告を [(レベル, メッセージ), ...] で返す
+    最新月より前の月の値で判定した指標は、メッセージにその年月を付ける
+    """
+    latest_months = latest_months or {}
+    messages = []
+    for name in METRICS:
+        result = level(name, latest.get(name))
+        if result in ('warning', 'danger'):
+            message = f"{METRIC_LABELS[name]}が基準を外れています"
+            as_of = latest_months.get(name)
+            if as_of is not None and as_of != latest.get('year_month'):
+                message += f"（{as_of:%Y年%m月}時点）"
+            messages.append((result, message))
+    trend = rolling['expense_ratio']
+    if trend['slope'] is not None and trend['slope'] * trend['count'] > TREND_TOLERANCE:
+        messages.append(('warning', "支出比率が上昇傾向です"))
+    slope = rolling['net_worth']['slope']
+    if slope is not None and slope < 0:
+        messages.append(('warning', "純資産が減少傾向です"))
+    return messages
+
+
+def health_check(window=DEFAULT_WINDOW, use_cache=True):
+    """データの版ごとにキャッシュした compute() の結果"""
+    if not use_cache:
+        return compute(window)
+    key = f'balance_sheet:health:{data_version()}:{window}'
+    report = cache.get(key)
+    if report is None:
+        report = compute(window)
+        cache.set(key, report, CACHE_TIMEOUT)
+    return report
@@ -0,0 +1,96 @@
+"""
+ローン由来の負債科目
+固定費（ローン）と短期ローンの残債（total_remaining）を負債のスナップショットとして記録する
+ローンの保存・削除時にシグナルで当月分が更新される（balance_sheet.signals）
+"""
+from django.utils import timezone
+
+from common.months import month_start
+
+from .models import Account, BalanceSnapshot
+
+
+def loan_sources():
+    """作成元ごとのローンのモデル"""
+    from cashflow.models import FixedExpense
+    from credit.models import ShortTermLoan
+    return {
+        'fixed_expense': FixedExpense,
+        'short_term_loan': ShortTermLoan,
+    }
+
+
+def source_for_model(model):
+    """モデルクラスから作成元の名前を取得（対象外なら None）"""
+    for source, source_model in loan_sources().items():
+        if model is source_model:
+            return source
+    return None
+
+
+def loan_balance(loan):
+    """ローンの残債（無効なローンは0）"""
+    if not loan.is_active:
+        return 0
+    return loan.total_remaining()
+
+
+def sync_loan(source, loan, year_month=None, amount=None):
+    """
+    ローン1件の残債を year_month（省略時は当月）の負債スナップショットに記録
+    amount を省略した場合は loan_balance() の値
+    残債が直前のスナップショットと同じなら書き込まない。記録した場合は True を返す
+    """
+    year_month = month_start(year_month or timezone.localdate())
+    if amount is None:
+        amount = loan_balance(loan)
+
+    account = Account.objects.filter(source=source, source_id=loan.pk).first()
+    if account is None:
+        if not amount:
+            return False
+        account = Account.objects.create(
+            name=loan.name, kind='liability', category='loan', source=source, source_id=loan.pk
+        )
+    elif account.name != loan.name or (amount and not account.is_active):
+        account.name = loan.name
+        account.is_active = account.is_active or bool(amount)
+        account.save(update_fields=['name', 'is_active', 'updated_at'])
+
+    latest = account.snapshots.filter(year_month__lte=year_month).order_by('-year_month').first()
+    if latest is not None and latest.amount == amount:
+        return False
+    if latest is not None and latest.year_month == year_month:
+        latest.amount = amount
+        latest.save(update_fields=['amount', 'updated_at'])
+    else:
+        BalanceSnapshot.objects.create(account=account, year_month=year_month, amount=amount)
+    return True
+
+
+def sync_loans(year_month=None):
+    """
+    すべてのローンの残債を記録し、記録した件数を返す
+    元のローンが削除された負債科目は残高0にする
+    """
+    synced = 0
+    for source, model in loan_sources().items():
+        loans = model.objects.all()
+        if source == 'fixed_expense':
+            loans = loans.filter(is_loan=True)
+        loan_ids = set()
+        for loan in loans:
+            loan_ids.add(loan.pk)
+            synced += sync_loan(source, loan, year_month)
+
+        orphans = Account.objects.filter(source=source, is_active=True).exclude(source_id__in=loan_ids)
+        for account in orphans:
+            synced += close_loan(source, model(pk=account.source_id, name=account.name), year_month)
+    return synced
+
+
+def close_loan(source, loan, year_month=None):
+    """削除されたローンの負債科目を残高0にして無効にする"""
+    synced = sync_loan(source, loan, year_month, amount=0)
+    Account.objects.filter(source=source, source_id=loan.pk).update(is_active=False)
+    return synced
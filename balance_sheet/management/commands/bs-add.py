@@ -0,0 +1,106 @@
+"""
+資産・負債の残高入力
+
+使い方:
+    python manage.py bs-add -cash 500000                 # 資産（正の金額）
+    python manage.py bs-add -loan:house -12000000        # 負債（負の金額）
+    python manage.py bs-add cash 500000 nisa 1200000 --month 2025-01
+    python manage.py bs-add                              # 当月のバランスシートを表示するだけ
+
+科目名の ':' より前がカテゴリ（cash, investment, loan など）として使われる
+固定費（ローン）・短期ローンの残債は自動で負債として記録される
+"""
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from balance_sheet import loans, networth
+from balance_sheet.models import Account, BalanceSnapshot
+from common.months import add_months, month_start, parse_year_month
+
+
+# README の '-cash 500000' 形式の科目名（-h / -v などのオプションは除く）
+DASHED_NAME = re.compile(r'^-[^\d\-][^=]+$')
+
+CATEGORIES = [value for value, label in Account.CATEGORY_CHOICES]
+
+
+def account_category(name):
+    """科目名からカテゴリを推定（'loan:house' → loan）"""
+    prefix = name.split(':', 1)[0]
+    if prefix in CATEGORIES:
+        return prefix
+    return 'other'
+
+
+class Command(BaseCommand):
+    help = '資産・負債の月末残高を記録し、純資産を表示します'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'entries',
+            nargs='*',
+            help='科目名と金額の組（負債は負の金額）。例: cash 500000 loan:house -12000000'
+        )
+        parser.add_argument(
+            '--month',
+            help='対象年月（YYYY-MM、省略時は当月）'
+        )
+        parser.add_argument(
+            '--memo',
+            default='',
+            help='スナップショットのメモ'
+        )
+
+    def run_from_argv(self, argv):
+        argv = argv[:2] + [arg[1:] if DASHED_NAME.match(arg) else arg for arg in argv[2:]]
+        super().run_from_argv(argv)
+
+    def parse_entries(self, entries):
+        if len(entries) % 2:
+            raise CommandError('科目名と金額を組で指定してください（例: cash 500000）')
+        parsed = []
+        for name, amount in zip(entries[::2], entries[1::2]):
+            try:
+                amount = int(amount.replace(',', ''))
+            except ValueError:
+                raise CommandError(f"金額は整数で指定してください: {name} {amount}")
+            parsed.append((name, amount))
+        return parsed
+
+    def handle(self, *args, **options):
+        try:
+            year_month = parse_year_month(options['month']) if options['month'] else month_start(timezone.localdate())
+        except ValueError as e:
+            raise CommandError(str(e))
+        entries = self.parse_entries(options['entries'])
+
+        with transaction.atomic():
+            for name, amount in entries:
+                kind = 'liability' if amount < 0 else 'asset'
+                account, created = Account.objects.get_or_create(
+                    source='manual', name=name,
+                    defaults={'kind': kind, 'category': account_category(name)}
+                )
+                if not created and amount < 0 and account.kind != 'liability':
+                    raise CommandError(f"{name} は資産の科目です。負の金額は指定できません")
+                BalanceSnapshot.objects.update_or_create(
+                    account=account, year_month=year_month,
+                    defaults={'amount': abs(amount), 'memo': options['memo']}
+                )
+                self.stdout.write(f"{account} {year_month:%Y-%m}: {abs(amount):,}円を記録しました")
+            # ローンの残債は現在の値しか分からないため、当月の入力時だけ記録する
+            if year_month == month_start(timezone.localdate()):
+                loans.sync_loans(year_month)
+
+        self.stdout.write(f"\n{year_month:%Y年%m月} 末のバランスシート")
+        for account, balance in networth.balances_at(year_month):
+            self.stdout.write(f"  {account.get_kind_display()} {account.name:<20} {balance:>14,}円")
+
+        previous, current = networth.net_worth_series(add_months(year_month, -1), year_month)
+        self.stdout.write(
+            f"資産合計 {current['total_assets']:,}円 / 負債合計 {current['total_liabilities']:,}円\n"
+            f"純資産 {current['net_worth']:,}円（前月比 {current['net_worth'] - previous['net_worth']:+,}円）"
+        )
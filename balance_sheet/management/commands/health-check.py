@@ -0,0 +1,81 @@
+"""
+財務健全性チェック
+
+使い方:
+    python manage.py health-check
+    python manage.py health-check --window 6 --months 12
+    python manage.py health-check --no-cache     # キャッシュを使わず集計し直す
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from balance_sheet import health
+
+
+def _format(name, value):
+    if value is None:
+        return '-'
+    if name == 'emergency_fund_months':
+        return f"{value:.1f}ヶ月"
+    return f"{value * 100:.1f}%"
+
+
+class Command(BaseCommand):
+    help = '貯蓄率・返済負担率・生活防衛資金・クレカ利用率・支出比率を全期間から計算します'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--window',
+            type=int,
+            default=health.DEFAULT_WINDOW,
+            help='移動窓の月数'
+        )
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=6,
+            help='月別の指標を表示する直近の月数（0で表示しない）'
+        )
+        parser.add_argument(
+            '--no-cache',
+            action='store_true',
+            help='キャッシュを使わずに集計する'
+        )
+
+    def handle(self, *args, **options):
+        if options['window'] < 2:
+            raise CommandError('--window は2以上を指定してください')
+
+        report = health.health_check(options['window'], use_cache=not options['no_cache'])
+        if not report['months']:
+            raise CommandError('キャッシュフロー・支払いスケジュール・バランスシートのデータがありません')
+
+        latest, rolling = report['latest'], report['rolling']
+        self.stdout.write(f"{latest['year_month']:%Y年%m月} 時点（移動窓 {report['window']}ヶ月）")
+        for name in health.METRICS:
+            stats = rolling[name]
+            level = health.level(name, latest.get(name))
+            # 最新月に値がない指標は、値の年月を併記する
+            as_of = report['latest_months'].get(name)
+            note = f"  ({as_of:%Y-%m})" if as_of is not None and as_of != latest['year_month'] else ''
+            self.stdout.write(
+                f"  {health.METRIC_LABELS[name]:<12} {_format(name, latest.get(name)):>9}"
+                f"  平均 {_format(name, stats['mean']):>9}  [{level or '-'}]{note}"
+            )
+        if 'net_worth' in latest:
+            self.stdout.write(f"  純資産 {latest['net_worth']:,}円")
+
+        if options['months'] > 0:
+            self.stdout.write('')
+            self.stdout.write('年月     ' + ' '.join(f"{health.METRIC_LABELS[name]:>10}" for name in health.METRICS))
+            for month in report['months'][-options['months']:]:
+                self.stdout.write(
+                    f"{month['year_month']:%Y-%m}  "
+                    + ' '.join(f"{_format(name, month[name]):>12}" for name in health.METRICS)
+                )
+
+        self.stdout.write('')
+        for level, message in report['alerts']:
+            style = self.style.ERROR if level == 'danger' else self.style.WARNING
+            self.stdout.write(style(message))
+        if not report['alerts']:
+            self.stdout.write(self.style.SUCCESS('健全な状態です'))
@@ -0,0 +1,36 @@
+"""
+月次純資産推移（NetWorth）の再構築・検証
+
+使い方:
+    python manage.py rebuild-networth              # スナップショットから作り直す
+    python manage.py rebuild-networth --verify     # スナップショットと突き合わせるだけ（書き込まない）
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from balance_sheet import networth
+
+
+class Command(BaseCommand):
+    help = '月次純資産推移をスナップショットから再構築、またはスナップショットとの一致を検証します'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='再構築せず、推移テーブルとスナップショットの不一致を報告する'
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            mismatches = networth.verify()
+            for year_month, stored, expected in mismatches:
+                self.stderr.write(
+                    f"{year_month:%Y-%m}: 推移テーブル={stored} スナップショット={expected}（資産, 負債, 純資産）"
+                )
+            if mismatches:
+                raise CommandError(f"推移テーブルとスナップショットが {len(mismatches)} 件一致しません")
+            self.stdout.write(self.style.SUCCESS("推移テーブルはスナップショットと一致しています"))
+            return
+
+        created = networth.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"月次純資産推移を再構築しました（{created}行）"))
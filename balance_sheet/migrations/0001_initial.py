@@ -0,0 +1,85 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:25
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Account',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='例: cash、loan:house', max_length=100, verbose_name='科目名')),
+                ('kind', models.CharField(choices=[('asset', '資産'), ('liability', '負債')], max_length=10, verbose_name='区分')),
+                ('category', models.CharField(choices=[('cash', '現金・預金'), ('investment', '投資'), ('real_estate', '不動産'), ('vehicle', '車両'), ('loan', 'ローン'), ('credit', 'クレジット'), ('other', 'その他')], default='other', max_length=20, verbose_name='カテゴリ')),
+                ('source', models.CharField(choices=[('manual', '手入力'), ('fixed_expense', '固定費（ローン）'), ('short_term_loan', '短期ローン')], default='manual', max_length=20, verbose_name='作成元')),
+                ('source_id', models.PositiveBigIntegerField(blank=True, help_text='作成元の固定費・短期ローンのID', null=True, verbose_name='作成元ID')),
+                ('is_active', models.BooleanField(default=True, verbose_name='有効')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('memo', models.TextField(blank=True, verbose_name='メモ')),
+            ],
+            options={
+                'verbose_name': '資産・負債科目',
+                'verbose_name_plural': '資産・負債科目一覧',
+                'ordering': ['kind', 'category', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year_month', models.DateField(help_text='対象月（YYYY-MM-01形式）', verbose_name='年月')),
+                ('amount', models.BigIntegerField(help_text='負債も正の金額で入力', validators=[django.core.validators.MinValueValidator(0)], verbose_name='残高')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('memo', models.TextField(blank=True, verbose_name='メモ')),
+            ],
+            options={
+                'verbose_name': '残高スナップショット',
+                'verbose_name_plural': '残高スナップショット一覧',
+                'ordering': ['-year_month', 'account'],
+            },
+        ),
+        migrations.CreateModel(
+            name='NetWorth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year_month', models.DateField(help_text='対象月（YYYY-MM-01形式）', unique=True, verbose_name='年月')),
+                ('total_assets', models.BigIntegerField(default=0, verbose_name='資産合計')),
+                ('total_liabilities', models.BigIntegerField(default=0, verbose_name='負債合計')),
+                ('net_worth', models.BigIntegerField(default=0, verbose_name='純資産')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': '純資産推移',
+                'verbose_name_plural': '純資産推移一覧',
+                'ordering': ['-year_month'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='account',
+            constraint=models.UniqueConstraint(condition=models.Q(('source', 'manual')), fields=('name',), name='bs_account_manual_name_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='account',
+            constraint=models.UniqueConstraint(condition=models.Q(('source_id__isnull', False)), fields=('source', 'source_id'), name='bs_account_source_unique'),
+        ),
+        migrations.AddField(
+            model_name='balancesnapshot',
+            name='account',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='balance_sheet.account', verbose_name='科目'),
+        ),
+        migrations.AddConstraint(
+            model_name='balancesnapshot',
+            constraint=models.UniqueConstraint(fields=('account', 'year_month'), name='bs_snapshot_account_month_unique'),
+        ),
+    ]
@@ -1,3 +1,169 @@
 from django.db import models
+from django.core.validators import MinValueValidator
 
-# Create your models here.
+
+class Account(models.Model):
+    """
+    資産・負債の科目
+    ローン由来の負債は固定費（ローン）・短期ローンから自動で作成される（balance_sheet.loans）
+    """
+    KIND_CHOICES = [
+        ('asset', '資産'),
+        ('liability', '負債'),
+    ]
+
+    CATEGORY_CHOICES = [
+        ('cash', '現金・預金'),
+        ('investment', '投資'),
+        ('real_estate', '不動産'),
+        ('vehicle', '車両'),
+        ('loan', 'ローン'),
+        ('credit', 'クレジット'),
+        ('other', 'その他'),
+    ]
+
+    SOURCE_CHOICES = [
+        ('manual', '手入力'),
+        ('fixed_expense', '固定費（ローン）'),
+        ('short_term_loan', '短期ローン'),
+    ]
+
+    name = models.CharField(
+        max_length=100,
+        verbose_name="科目名",
+        help_text="例: cash、loan:house"
+    )
+    kind = models.CharField(
+        max_length=10,
+        choices=KIND_CHOICES,
+        verbose_name="区分"
+    )
+    category = models.CharField(
+        max_length=20,
+        choices=CATEGORY_CHOICES,
+        default='other',
+        verbose_name="カテゴリ"
+    )
+
+    # 自動作成の場合の元データ
+    source = models.CharField(
+        max_length=20,
+        choices=SOURCE_CHOICES,
+        default='manual',
+        verbose_name="作成元"
+    )
+    source_id = models.PositiveBigIntegerField(
+        verbose_name="作成元ID",
+        null=True,
+        blank=True,
+        help_text="作成元の固定費・短期ローンのID"
+    )
+
+    # ステータス
+    is_active = models.BooleanField(
+        default=True,
+        verbose_name="有効"
+    )
+
+    # メタデータ
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    memo = models.TextField(blank=True, verbose_name="メモ")
+
+    class Meta:
+        verbose_name = "資産・負債科目"
+        verbose_name_plural = "資産・負債科目一覧"
+        ordering = ['kind', 'category', 'name']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name'],
+                condition=models.Q(source='manual'),
+                name='bs_account_manual_name_unique'
+            ),
+            models.UniqueConstraint(
+                fields=['source', 'source_id'],
+                condition=models.Q(source_id__isnull=False),
+                name='bs_account_source_unique'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name}（{self.get_kind_display()}）"
+
+
+class BalanceSnapshot(models.Model):
+    """
+    科目の月末残高
+    次のスナップショットまでの月は同じ残高が続くものとみなす
+    保存・削除時にシグナルで純資産推移（NetWorth）が差分更新される（balance_sheet.networth）
+    """
+    account = models.ForeignKey(
+        Account,
+        on_delete=models.CASCADE,
+        related_name='snapshots',
+        verbose_name="科目"
+    )
+    year_month = models.DateField(
+        verbose_name="年月",
+        help_text="対象月（YYYY-MM-01形式）"
+    )
+    amount = models.BigIntegerField(
+        verbose_name="残高",
+        validators=[MinValueValidator(0)],
+        help_text="負債も正の金額で入力"
+    )
+
+    # メタデータ
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    memo = models.TextField(blank=True, verbose_name="メモ")
+
+    class Meta:
+        verbose_name = "残高スナップショット"
+        verbose_name_plural = "残高スナップショット一覧"
+        ordering = ['-year_month', 'account']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['account', 'year_month'],
+                name='bs_snapshot_account_month_unique'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.year_month.strftime('%Y年%m月')} {self.account.name} {self.amount:,}円"
+
+
+class NetWorth(models.Model):
+    """
+    月次純資産推移（マテリアライズ）
+    最初のスナップショットの月から最後のスナップショットの月まで、各月末時点の合計を1行ずつ保持する
+    推移の表示は year_month の範囲検索1回で済む
+    """
+    year_month = models.DateField(
+        verbose_name="年月",
+        unique=True,
+        help_text="対象月（YYYY-MM-01形式）"
+    )
+    total_assets = models.BigIntegerField(
+        verbose_name="資産合計",
+        default=0
+    )
+    total_liabilities = models.BigIntegerField(
+        verbose_name="負債合計",
+        default=0
+    )
+    net_worth = models.BigIntegerField(
+        verbose_name="純資産",
+        default=0
+    )
+
+    # メタデータ
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "純資産推移"
+        verbose_name_plural = "純資産推移一覧"
+        ordering = ['-year_month']
+
+    def __str__(self):
+        return f"{self.year_month.strftime('%Y年%m月')} 純資産: {self.net_worth:,}円"
@@ -0,0 +1,238 @@
+"""
+月次純資産推移（NetWorth）の更新・読み出し・再構築
+スナップショットの保存・削除時は、その科目の残高が変わった月だけを差分で更新する
+"""
+from django.db import transaction
+from django.db.models import F, Max, Min
+from django.utils import timezone
+
+from common.database import iterate
+from common.months import add_months, iter_months, month_start
+
+from .models import BalanceSnapshot, NetWorth
+
+
+def account_snapshots(account_id):
+    """科目のスナップショットを [(年月, 残高), ...]（年月順）で取得（1クエリ）"""
+    return list(
+        BalanceSnapshot.objects.filter(account_id=account_id)
+        .order_by('year_month')
+        .values_list('year_month', 'amount')
+    )
+
+
+def month_end_balances(snapshots, months):
+    """
+    各月末時点の残高を返す（直前のスナップショットの残高が続く。それより前は0）
+    snapshots: [(年月, 残高), ...] 年月順, months: 年月の昇順リスト
+    """
+    balances = []
+    index, balance = 0, 0
+    for year_month in months:
+        while index < len(snapshots) and snapshots[index][0] <= year_month:
+            balance = snapshots[index][1]
+            index += 1
+        balances.append(balance)
+    return balances
+
+
+def _totals(kind, balance):
+    """残高を (資産の増分, 負債の増分) に振り分ける"""
+    return (balance, 0) if kind == 'asset' else (0, balance)
+
+
+def _ensure_rows(start, end):
+    """
+    start～end の行がなければ作る
+    最初の行より前は0、最後の行より後は最後の行の値を引き継ぐ
+    """
+    bounds = NetWorth.objects.aggregate(first=Min('year_month'), last=Max('year_month'))
+    first, last = bounds['first'], bounds['last']
+    rows = []
+    if first is None:
+        rows += [NetWorth(year_month=m) for m in iter_months(start, end)]
+    else:
+        if start < first:
+            rows += [NetWorth(year_month=m) for m in iter_months(start, add_months(first, -1))]
+        if end > last:
+            latest = NetWorth.objects.get(year_month=last)
+            rows += [
+                NetWorth(
+                    year_month=m,
+                    total_assets=latest.total_assets,
+                    total_liabilities=latest.total_liabilities,
+                    net_worth=latest.net_worth,
+                )
+                for m in iter_months(add_months(last, 1), end)
+            ]
+    if rows:
+        NetWorth.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+    return end if last is None else max(end, last)
+
+
+def apply_change(before_kind, before, after_kind, after):
+    """
+    1科目の変更を推移テーブルに反映
+    before / after: 変更前後のその科目のスナップショット [(年月, 残高), ...]
+    残高が同じ差分になる連続した月をまとめて、範囲ごとに1回だけ更新する
+    """
+    changed = set(before) ^ set(after) if before_kind == after_kind else set(before) | set(after)
+    if not changed:
+        return
+    start = min(year_month for year_month, amount in changed)
+    end = max(year_month for year_month, amount in before + after)
+    end = _ensure_rows(start, end)
+
+    months = list(iter_months(start, end))
+    deltas = []
+    for old, new in zip(month_end_balances(before, months), month_end_balances(after, months)):
+        old_assets, old_liabilities = _totals(before_kind, old)
+        new_assets, new_liabilities = _totals(after_kind, new)
+        deltas.append((new_assets - old_assets, new_liabilities - old_liabilities))
+
+    now = timezone.now()
+    run_start = 0
+    for i in range(1, len(months) + 1):
+        if i < len(months) and deltas[i] == deltas[run_start]:
+            continue
+        assets, liabilities = deltas[run_start]
+        if assets or liabilities:
+            NetWorth.objects.filter(
+                year_month__gte=months[run_start], year_month__lte=months[i - 1]
+            ).update(
+                total_assets=F('total_assets') + assets,
+                total_liabilities=F('total_liabilities') + liabilities,
+                net_worth=F('net_worth') + assets - liabilities,
+                updated_at=now,
+            )
+        run_start = i
+
+
+# ========================================
+# 推移の読み出し
+# ========================================
+
+def net_worth_series(start, end):
+    """
+    start～end の各月の純資産を [{'year_month', 'total_assets', 'total_liabilities', 'net_worth'}, ...] で返す
+    推移テーブルの範囲検索1回（範囲が最後のスナップショットより後だけの場合は2回）
+    最後の行より後の月は最後の行の値、最初の行より前の月は0とする
+    """
+    start, end = month_start(start), month_start(end)
+    fields = ['year_month', 'total_assets', 'total_liabilities', 'net_worth']
+    rows = {
+        row['year_month']: row
+        for row in NetWorth.objects.filter(
+            year_month__gte=start, year_month__lte=end
+        ).order_by('year_month').values(*fields)
+    }
+    if rows:
+        carried = None
+    else:
+        carried = NetWorth.objects.filter(year_month__lt=start).order_by('-year_month').values(*fields).first()
+
+    series = []
+    for year_month in iter_months(start, end):
+        row = rows.get(year_month)
+        if row is not None:
+            carried = row
+        values = carried or {'total_assets': 0, 'total_liabilities': 0, 'net_worth': 0}
+        series.append({
+            'year_month': year_month,
+            'total_assets': values['total_assets'],
+            'total_liabilities': values['total_liabilities'],
+            'net_worth': values['net_worth'],
+        })
+    return series
+
+
+def balances_at(year_month):
+    """year_month 末時点の科目ごとの残高を [(科目, 残高), ...] で返す（1クエリ、残高0の科目は除く）"""
+    snapshots = BalanceSnapshot.objects.filter(
+        year_month__lte=month_start(year_month)
+    ).select_related('account').order_by('account_id', '-year_month')
+    balances, seen = [], set()
+    for snapshot in snapshots:
+        if snapshot.account_id in seen:
+            continue
+        seen.add(snapshot.account_id)
+        if snapshot.amount:
+            balances.append((snapshot.account, snapshot.amount))
+    balances.sort(key=lambda item: (item[0].kind, item[0].category, item[0].name))
+    return balances
+
+
+# ========================================
+# 全件再構築・検証
+# ========================================
+
+def compute_from_snapshots():
+    """
+    スナップショットから推移を計算（1クエリ）
+    {年月: (資産合計, 負債合計)} を最初の月から最後の月まで返す
+    """
+    by_account = {}
+    rows = BalanceSnapshot.objects.order_by('account_id', 'year_month').values_list(
+        'account_id', 'account__kind', 'year_month', 'amount'
+    )
+    for account_id, kind, year_month, amount in iterate(rows):
+        by_account.setdefault((account_id, kind), []).append((year_month, amount))
+    if not by_account:
+        return {}
+
+    months = list(iter_months(
+        min(snapshots[0][0] for snapshots in by_account.values()),
+        max(snapshots[-1][0] for snapshots in by_account.values()),
+    ))
+    assets, liabilities = [0] * len(months), [0] * len(months)
+    for (account_id, kind), snapshots in by_account.items():
+        totals = assets if kind == 'asset' else liabilities
+        for i, balance in enumerate(month_end_balances(snapshots, months)):
+            totals[i] += balance
+    return {m: (a, l) for m, a, l in zip(months, assets, liabilities)}
+
+
+def verify():
+    """
+    推移テーブルとスナップショットの突き合わせ
+    不一致を [(年月, 推移テーブルの値, スナップショットからの値), ...] で返す
+    値は (資産合計, 負債合計, 純資産)
+    """
+    expected = compute_from_snapshots()
+    stored = {
+        year_month: values
+        for year_month, *values in iterate(NetWorth.objects.values_list(
+            'year_month', 'total_assets', 'total_liabilities', 'net_worth'
+        ))
+    }
+    first = min(expected, default=None)
+    last = max(expected, default=None)
+
+    mismatches = []
+    for year_month in sorted(set(expected) | set(stored)):
+        if first is None or year_month < first:
+            assets, liabilities = 0, 0
+        else:
+            assets, liabilities = expected[min(year_month, last)]
+        values = (assets, liabilities, assets - liabilities)
+        stored_values = tuple(stored[year_month]) if year_month in stored else None
+        if stored_values != values:
+            mismatches.append((year_month, stored_values, values))
+    return mismatches
+
+
+def rebuild():
+    """スナップショットから推移テーブルを作り直す。作成した行数を返す"""
+    expected = compute_from_snapshots()
+    with transaction.atomic():
+        NetWorth.objects.all().delete()
+        NetWorth.objects.bulk_create([
+            NetWorth(
+                year_month=year_month,
+                total_assets=assets,
+                total_liabilities=liabilities,
+                net_worth=assets - liabilities,
+            )
+            for year_month, (assets, liabilities) in expected.items()
+        ], batch_size=1000)
+    return len(expected)
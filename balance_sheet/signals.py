@@ -0,0 +1,121 @@
+"""
+スナップショットの変更を純資産推移（NetWorth）へ反映するシグナルハンドラと、
+ローンの変更を負債スナップショットへ反映するシグナルハンドラ
+BalanceSheetConfig.ready() から connect() で対象モデルにだけ接続する
+"""
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+
+from common.signals import post_bulk_create
+
+from . import loans, networth
+from .models import Account, BalanceSnapshot
+
+
+def _account_kinds(account_ids):
+    return dict(Account.objects.filter(pk__in=account_ids).values_list('pk', 'kind'))
+
+
+def remember_snapshots(sender, instance, raw=False, **kwargs):
+    """変更前の、関係する科目のスナップショットを控えておく"""
+    instance._networth_before = None
+    if raw:
+        return
+    account_ids = {instance.account_id}
+    if instance.pk is not None:
+        previous = BalanceSnapshot.objects.filter(pk=instance.pk).values_list('account_id', flat=True).first()
+        if previous is not None:
+            account_ids.add(previous)
+    kinds = _account_kinds(account_ids)
+    instance._networth_before = {
+        account_id: (kinds.get(account_id), networth.account_snapshots(account_id))
+        for account_id in account_ids
+    }
+
+
+def update_networth(sender, instance, raw=False, **kwargs):
+    before = getattr(instance, '_networth_before', None)
+    if raw or before is None:
+        return
+    for account_id, (kind, snapshots) in before.items():
+        if kind is None:
+            continue
+        networth.apply_change(kind, snapshots, kind, networth.account_snapshots(account_id))
+    instance._networth_before = None
+
+
+def remember_snapshots_on_delete(sender, instance, origin=None, **kwargs):
+    """
+    削除前の科目のスナップショットを控えておく
+    1回の削除（QuerySet.delete() や科目の削除の CASCADE）で複数行消える場合、pre_delete がすべて先に送られるため、
+    削除の起点（origin）ごと・科目ごとに最初の1回だけ控え、post_delete でも1回だけ反映する
+    """
+    pending = (origin if origin is not None else instance).__dict__.setdefault('_networth_deleting', {})
+    if instance.account_id not in pending:
+        kinds = _account_kinds([instance.account_id])
+        pending[instance.account_id] = (
+            kinds.get(instance.account_id), networth.account_snapshots(instance.account_id)
+        )
+
+
+def update_networth_on_delete(sender, instance, origin=None, **kwargs):
+    pending = (origin if origin is not None else instance).__dict__.get('_networth_deleting', {})
+    kind, snapshots = pending.pop(instance.account_id, (None, None))
+    if kind is None:
+        return
+    networth.apply_change(kind, snapshots, kind, networth.account_snapshots(instance.account_id))
+
+
+def update_networth_on_bulk_create(sender, objs, **kwargs):
+    """一括登録したスナップショットを科目ごとに反映（登録前の状態は登録分を除いて求める）"""
+    created = {}
+    for obj in objs:
+        created.setdefault(obj.account_id, set()).add(obj.year_month)
+    kinds = _account_kinds(created)
+    for account_id, months in created.items():
+        after = networth.account_snapshots(account_id)
+        before = [(year_month, amount) for year_month, amount in after if year_month not in months]
+        networth.apply_change(kinds[account_id], before, kinds[account_id], after)
+
+
+def remember_account_kind(sender, instance, raw=False, **kwargs):
+    instance._networth_kind = None
+    if raw or instance.pk is None:
+        return
+    instance._networth_kind = Account.objects.filter(pk=instance.pk).values_list('kind', flat=True).first()
+
+
+def update_networth_on_kind_change(sender, instance, raw=False, **kwargs):
+    """資産・負債の区分が変わった科目の残高を付け替える"""
+    previous = getattr(instance, '_networth_kind', None)
+    if raw or previous is None or previous == instance.kind:
+        return
+    snapshots = networth.account_snapshots(instance.pk)
+    networth.apply_change(previous, snapshots, instance.kind, snapshots)
+    instance._networth_kind = None
+
+
+def sync_loan_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    loans.sync_loan(loans.source_for_model(sender), instance)
+
+
+def close_loan_on_delete(sender, instance, **kwargs):
+    loans.close_loan(loans.source_for_model(sender), instance)
+
+
+def connect():
+    """スナップショット・科目・ローンのモデルにシグナルハンドラを接続"""
+    uid = 'balance_sheet_networth'
+    pre_save.connect(remember_snapshots, sender=BalanceSnapshot, dispatch_uid=uid)
+    post_save.connect(update_networth, sender=BalanceSnapshot, dispatch_uid=uid)
+    pre_delete.connect(remember_snapshots_on_delete, sender=BalanceSnapshot, dispatch_uid=uid)
+    post_delete.connect(update_networth_on_delete, sender=BalanceSnapshot, dispatch_uid=uid)
+    post_bulk_create.connect(update_networth_on_bulk_create, sender=BalanceSnapshot, dispatch_uid=uid)
+    pre_save.connect(remember_account_kind, sender=Account, dispatch_uid=uid)
+    post_save.connect(update_networth_on_kind_change, sender=Account, dispatch_uid=uid)
+
+    for source, model in loans.loan_sources().items():
+        loan_uid = f'balance_sheet_loan_{source}'
+        post_save.connect(sync_loan_on_save, sender=model, dispatch_uid=loan_uid)
+        post_delete.connect(close_loan_on_delete, sender=model, dispatch_uid=loan_uid)
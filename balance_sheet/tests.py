@@ -1,3 +1,224 @@
-from django.test import TestCase
+from datetime import date
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from cashflow.models import FixedExpense, MonthlyCashFlow
+from common.months import month_start
+from common.testing import capture_query_plans, full_table_scans, requires_sqlite
+from credit.models import CreditCard, PaymentSchedule, ShortTermLoan
+from . import health, networth
+from .models import Account, BalanceSnapshot, NetWorth
+
+
+class NetWorthTests(TestCase):
+    """純資産推移がスナップショットの変更に差分で追従することを確認"""
+
+    def setUp(self):
+        self.cash = Account.objects.create(name='cash', kind='asset', category='cash')
+        self.house = Account.objects.create(name='loan:house', kind='liability', category='loan')
+
+    def net_worth(self, start, end):
+        return [row['net_worth'] for row in networth.net_worth_series(start, end)]
+
+    def test_save_update_delete(self):
+        january = BalanceSnapshot.objects.create(account=self.cash, year_month=date(2025, 1, 1), amount=500000)
+        BalanceSnapshot.objects.create(account=self.house, year_month=date(2025, 3, 1), amount=200000)
+        BalanceSnapshot.objects.create(account=self.cash, year_month=date(2025, 4, 1), amount=600000)
+        self.assertEqual(
+            self.net_worth(date(2024, 12, 1), date(2025, 5, 1)),
+            [0, 500000, 500000, 300000, 400000, 400000]
+        )
+
+        january.year_month = date(2024, 11, 1)
+        january.amount = 450000
+        january.save()
+        self.assertEqual(
+            self.net_worth(date(2024, 10, 1), date(2025, 4, 1)),
+            [0, 450000, 450000, 450000, 450000, 250000, 400000]
+        )
+
+        BalanceSnapshot.objects.filter(year_month=date(2025, 4, 1)).delete()
+        self.assertEqual(self.net_worth(date(2025, 3, 1), date(2025, 4, 1)), [250000, 250000])
+        self.assertEqual(networth.verify(), [])
+
+    def test_kind_change_and_account_delete(self):
+        BalanceSnapshot.objects.create(account=self.cash, year_month=date(2025, 1, 1), amount=100000)
+        BalanceSnapshot.objects.create(account=self.house, year_month=date(2025, 1, 1), amount=30000)
+        self.house.kind = 'asset'
+        self.house.save()
+        self.assertEqual(self.net_worth(date(2025, 1, 1), date(2025, 1, 1)), [130000])
+
+        self.cash.delete()
+        self.assertEqual(self.net_worth(date(2025, 1, 1), date(2025, 1, 1)), [30000])
+        self.assertEqual(networth.verify(), [])
+
+    def test_delete_several_snapshots_at_once(self):
+        other = Account.objects.create(name='savings', kind='asset', category='cash')
+        BalanceSnapshot.objects.create(account=self.cash, year_month=date(2025, 1, 1), amount=100)
+        BalanceSnapshot.objects.create(account=self.cash, year_month=date(2025, 2, 1), amount=200)
+        BalanceSnapshot.objects.create(account=other, year_month=date(2025, 1, 1), amount=50)
+        self.assertEqual(self.net_worth(date(2025, 1, 1), date(2025, 2, 1)), [150, 250])
+
+        BalanceSnapshot.objects.filter(account=self.cash).delete()
+        self.assertEqual(self.net_worth(date(2025, 1, 1), date(2025, 2, 1)), [50, 50])
+        self.assertEqual(networth.verify(), [])
+
+        BalanceSnapshot.objects.create(account=self.cash, year_month=date(2025, 1, 1), amount=100)
+        BalanceSnapshot.objects.create(account=self.cash, year_month=date(2025, 2, 1), amount=200)
+        self.cash.delete()
+        self.assertEqual(self.net_worth(date(2025, 1, 1), date(2025, 2, 1)), [50, 50])
+        self.assertEqual(networth.verify(), [])
+
+    def test_rebuild(self):
+        BalanceSnapshot.objects.create(account=self.cash, year_month=date(2025, 1, 1), amount=100000)
+        NetWorth.objects.update(net_worth=0)
+        self.assertEqual(len(networth.verify()), 1)
+        self.assertEqual(networth.rebuild(), 1)
+        self.assertEqual(networth.verify(), [])
+
+    def create_history(self):
+        BalanceSnapshot.objects.bulk_create([
+            BalanceSnapshot(account=self.cash, year_month=date(year, month, 1), amount=year * 1000 + month)
+            for year in range(2010, 2025)
+            for month in range(1, 13)
+        ])
+        networth.rebuild()
+
+    def test_series_is_one_range_read(self):
+        self.create_history()
+        with self.assertNumQueries(1):
+            series = networth.net_worth_series(date(2012, 1, 1), date(2024, 12, 1))
+        self.assertEqual(len(series), 13 * 12)
+        self.assertEqual(series[-1]['net_worth'], 2024 * 1000 + 12)
+
+    @requires_sqlite
+    def test_series_uses_index(self):
+        self.create_history()
+        plans = capture_query_plans(networth.net_worth_series, date(2012, 1, 1), date(2024, 12, 1))
+        self.assertEqual(full_table_scans(plans, {'balance_sheet_networth'}), [])
+
+
+class LoanSyncTests(TestCase):
+    """ローンの残債が負債として記録されることを確認"""
+
+    def test_loans_follow_saves(self):
+        this_month = month_start(timezone.localdate())
+        car = FixedExpense.objects.create(
+            name='車ローン', category='loan', monthly_amount=20000, is_loan=True, remaining_months=10
+        )
+        FixedExpense.objects.create(name='Netflix', category='subscription', monthly_amount=1490)
+        phone = ShortTermLoan.objects.create(
+            name='iPhone 分割', monthly_payment=5000, remaining_months=4, payment_date=27,
+            start_date=date(2025, 1, 1)
+        )
+        self.assertEqual(Account.objects.count(), 2)
+        self.assertEqual(networth.net_worth_series(this_month, this_month)[0]['total_liabilities'], 220000)
+
+        car.remaining_months = 9
+        car.save()
+        phone.delete()
+        current = networth.net_worth_series(this_month, this_month)[0]
+        self.assertEqual(current['total_liabilities'], 180000)
+        self.assertFalse(Account.objects.get(source='short_term_loan').is_active)
+        self.assertEqual(networth.verify(), [])
+
+
+class BsAddCommandTests(TestCase):
+
+    def test_add_asset_and_liability(self):
+        out = StringIO()
+        call_command('bs-add', 'cash', '500000', 'loan:house', '-12000000', '--month', '2025-01', stdout=out)
+        self.assertIn('純資産 -11,500,000円', out.getvalue())
+        self.assertEqual(Account.objects.get(name='loan:house').category, 'loan')
+        self.assertEqual(Account.objects.get(name='cash').kind, 'asset')
+
+        call_command('bs-add', 'cash', '600000', '--month', '2025-02', stdout=out)
+        self.assertIn('前月比 +100,000円', out.getvalue())
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class HealthCheckTests(TestCase):
+    """健全性指標が1回の走査で計算され、データの版ごとにキャッシュされることを確認"""
+
+    def setUp(self):
+        cache.clear()
+        CreditCard.objects.create(name='テストカード', closing_date=15, payment_date=10, credit_limit=500000)
+        MonthlyCashFlow.objects.bulk_create([
+            MonthlyCashFlow(
+                year_month=date(2025, month, 1), total_income=300000, total_expense=200000 + month * 10000,
+                net_cashflow=100000 - month * 10000, housing_loan=60000, closing_balance=600000
+            )
+            for month in range(1, 7)
+        ])
+        PaymentSchedule.objects.bulk_create([
+            PaymentSchedule(
+                year_month=date(2025, month, 1), credit_card_payments={'テストカード': 100000},
+                total_credit_payment=100000, total_loan_payment=15000
+            )
+            for month in range(1, 7)
+        ])
+
+    def test_metrics(self):
+        report = health.compute(window=3)
+        latest = report['latest']
+        self.assertEqual(latest['year_month'], date(2025, 6, 1))
+        self.assertAlmostEqual(latest['savings_rate'], 40000 / 300000)
+        self.assertAlmostEqual(latest['debt_service_ratio'], 75000 / 300000)
+        self.assertAlmostEqual(latest['credit_utilization'], 0.2)
+        self.assertAlmostEqual(latest['emergency_fund_months'], 600000 / 250000)
+        self.assertAlmostEqual(report['rolling']['expense_ratio']['slope'], 10000 / 300000)
+        self.assertIn(('warning', '支出比率が上昇傾向です'), report['alerts'])
+
+        # 現金科目があれば口座残高の代わりに使う
+        cash = Account.objects.create(name='cash', kind='asset', category='cash')
+        BalanceSnapshot.objects.create(account=cash, year_month=date(2025, 5, 1), amount=1000000)
+        self.assertAlmostEqual(health.compute(window=3)['latest']['emergency_fund_months'], 4.0)
+
+    def test_stale_metrics_and_inactive_cards(self):
+        # 解約済みカードの限度額は利用率の分母に含めない
+        CreditCard.objects.create(
+            name='解約済みカード', closing_date=15, payment_date=10, credit_limit=500000, is_active=False
+        )
+        # 翌月は支払いスケジュールだけがある
+        PaymentSchedule.objects.create(year_month=date(2025, 7, 1))
+        PaymentSchedule.objects.filter(year_month=date(2025, 7, 1)).update(
+            credit_card_payments={'テストカード': 50000}, total_loan_payment=15000
+        )
+        report = health.compute(window=3)
+        latest, latest_months = report['latest'], report['latest_months']
+        self.assertEqual(latest['year_month'], date(2025, 7, 1))
+        self.assertAlmostEqual(latest['credit_utilization'], 0.1)
+        self.assertEqual(latest_months['credit_utilization'], date(2025, 7, 1))
+        self.assertEqual(latest_months['debt_service_ratio'], date(2025, 6, 1))
+        self.assertIn(('warning', '返済負担率が基準を外れています（2025年06月時点）'), report['alerts'])
+
+        out = StringIO()
+        call_command('health-check', '--window', '3', '--no-cache', stdout=out)
+        self.assertIn('(2025-06)', out.getvalue())
+
+    def test_rolling_window(self):
+        window = health.RollingWindow(4)
+        values = [3.0, 1.0, 4.0, 1.0, 5.0, 9.0, 2.0]
+        for value in values:
+            window.push(value)
+        self.assertAlmostEqual(window.mean(), sum(values[-4:]) / 4)
+        self.assertAlmostEqual(window.slope(), 0.7)
+        self.assertAlmostEqual(window.std(), 3.593976442141304)
+
+    def test_cached_per_data_version(self):
+        health.health_check()
+        with self.assertNumQueries(len(health._sources())):
+            health.health_check()
+
+        MonthlyCashFlow.objects.filter(year_month=date(2025, 6, 1)).update(
+            total_income=400000, updated_at=timezone.now()
+        )
+        self.assertAlmostEqual(health.health_check()['latest']['expense_ratio'], 260000 / 400000)
+
+        out = StringIO()
+        call_command('health-check', '--window', '3', stdout=out)
+        self.assertIn('2025年06月', out.getvalue())
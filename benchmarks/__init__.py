@@ -0,0 +1,10 @@
+"""
+計算処理のベンチマーク（クエリ数・実行時間）
+
+使い方:
+    python -m benchmarks                                  # 3年分・規模1で計測し benchmark.json に保存
+    python -m benchmarks --years 10 --scale 4 --repeat 10 --output after.json
+    python -m benchmarks --compare before.json            # 前回の結果と比較
+
+一時的なテスト用データベースに合成データを作って計測するため、開発用のDBには書き込まない
+"""
@@ -0,0 +1,70 @@
+import argparse
+import json
+import os
+import sys
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='計算処理のクエリ数・実行時間を計測します')
+    parser.add_argument('--years', type=int, default=3, help='合成データの年数')
+    parser.add_argument('--scale', type=int, default=1, help='1ヶ月あたりの明細数の倍率')
+    parser.add_argument('--seed', type=int, default=0, help='乱数のシード')
+    parser.add_argument('--repeat', type=int, default=5, help='各ケースの計測回数')
+    parser.add_argument('--case', action='append', help='計測するケース名（部分一致、複数指定可）')
+    parser.add_argument('--output', default='benchmark.json', help='結果を保存するJSONファイル')
+    parser.add_argument('--compare', help='比較する前回の結果（JSONファイル）')
+    return vars(parser.parse_args(argv))
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    baseline = None
+    if options['compare']:
+        with open(options['compare'], encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    from . import runner, synthetic
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        rows = synthetic.generate(options['years'], options['scale'], options['seed'])
+        client = Client()
+        client.force_login(User.objects.create_superuser('benchmark', password='benchmark'))
+        context = {'months': synthetic.months_for(options['years']), 'client': client}
+        results = runner.run_cases(context, repeat=options['repeat'], selected=options['case'])
+        meta = runner.metadata(options, rows)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    runner.save(options['output'], meta, results)
+    print(f"{'ケース':<40} {'クエリ':>6} {'中央値(ms)':>11}")
+    for name, result in results.items():
+        print(f"{name:<40} {result['queries']:>6} {result['median_ms']:>11.2f}")
+    print(f"結果を {options['output']} に保存しました")
+
+    if baseline is None:
+        return 0
+    regressed = False
+    print(f"\n前回（{baseline['meta'].get('revision')}）との比較")
+    for name, old_queries, new_queries, old_ms, new_ms in runner.compare(baseline, results):
+        ratio = new_ms / old_ms if old_ms else float('inf')
+        marker = ' ← クエリ数増加' if new_queries > old_queries else ''
+        regressed = regressed or new_queries > old_queries
+        print(f"{name:<40} クエリ {old_queries:>4} → {new_queries:<4} 中央値 x{ratio:.2f}{marker}")
+    # クエリ数の増加は環境に依存しない退行なので終了コードで知らせる
+    return 1 if regressed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
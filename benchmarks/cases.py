@@ -0,0 +1,64 @@
+"""
+計測対象の処理
+各ケースは (名前, 準備関数) で、準備関数は合成データを受け取って計測する引数なしの関数を返す
+"""
+ADMIN_CHANGELISTS = [
+    'salary/salaryrecord',
+    'credit/creditusage',
+    'credit/paymentschedule',
+    'cashflow/income',
+    'cashflow/variableexpense',
+    'cashflow/fixedexpense',
+    'cashflow/monthlycashflow',
+]
+
+
+def monthly_cashflow_calculate_all(context):
+    from cashflow.models import MonthlyCashFlow
+    year_month = context['months'][-1]
+    return lambda: MonthlyCashFlow(year_month=year_month).calculate_all()
+
+
+def payment_schedule_calculate_all(context):
+    from credit.models import PaymentSchedule
+    year_month = context['months'][-1]
+    return lambda: PaymentSchedule(year_month=year_month).calculate_all()
+
+
+def credit_card_next_payment_amount(context):
+    from credit.models import CreditCard
+    cards = list(CreditCard.objects.all())
+    return lambda: [card.get_next_payment_amount() for card in cards]
+
+
+def monthly_cashflow_recalculate_months(context):
+    from cashflow.models import MonthlyCashFlow
+    return lambda: MonthlyCashFlow.recalculate_months(context['months'])
+
+
+def payment_schedule_recalculate_months(context):
+    from credit.models import PaymentSchedule
+    return lambda: PaymentSchedule.recalculate_months(context['months'])
+
+
+def admin_changelist(path):
+    def prepare(context):
+        client = context['client']
+        url = f'/admin/{path}/'
+
+        def run():
+            response = client.get(url)
+            if response.status_code != 200:
+                raise RuntimeError(f"{url} が {response.status_code} を返しました")
+        return run
+    return prepare
+
+
+CASES = [
+    ('MonthlyCashFlow.calculate_all', monthly_cashflow_calculate_all),
+    ('PaymentSchedule.calculate_all', payment_schedule_calculate_all),
+    ('CreditCard.get_next_payment_amount', credit_card_next_payment_amount),
+    ('MonthlyCashFlow.recalculate_months', monthly_cashflow_recalculate_months),
+    ('PaymentSchedule.recalculate_months', payment_schedule_recalculate_months),
+    *[(f'admin:{path}', admin_changelist(path)) for path in ADMIN_CHANGELISTS],
+]
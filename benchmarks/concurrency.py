@@ -0,0 +1,202 @@
+"""
+SQLite の同時読み書きのベンチマーク
+複数のプロセスで再計算（書き込み）を繰り返しながら、別のプロセスで管理画面の一覧を開き、
+既定の設定と SQLITE_TUNING を有効にした設定のスループット・読み込みの待ち時間・ロックエラーを比較する
+
+使い方:
+    python -m benchmarks.concurrency
+    python -m benchmarks.concurrency --seconds 10 --readers 8 --writers 2 --output concurrency.json
+
+WAL はファイルのDBでしか効かないため、一時ディレクトリにファイルのテスト用DBを作って計測する
+スレッドでは GIL のため読み書きが交互にしか進まず SQLite のロック待ちが表れないので、
+読み込み・書き込みはそれぞれ別プロセス（fork）で実行する
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+
+# 有効にした設定で使う接続の再利用時間（秒）
+TUNED_CONN_MAX_AGE = 600
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.concurrency', description='SQLite の同時読み書きのスループットを計測します'
+    )
+    parser.add_argument('--years', type=int, default=3, help='合成データの年数')
+    parser.add_argument('--scale', type=int, default=1, help='1ヶ月あたりの明細数の倍率')
+    parser.add_argument('--seed', type=int, default=0, help='乱数のシード')
+    parser.add_argument('--seconds', type=float, default=5.0, help='各設定の計測時間（秒）')
+    parser.add_argument('--readers', type=int, default=4, help='読み込みプロセス数')
+    parser.add_argument('--writers', type=int, default=2, help='書き込みプロセス数')
+    parser.add_argument('--output', help='結果を保存するJSONファイル')
+    return vars(parser.parse_args(argv))
+
+
+def percentile(values, ratio):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * ratio))]
+
+
+def writer(months, start, stop, results):
+    """キャッシュフローと支払いスケジュールの再計算を繰り返す"""
+    from django.db import OperationalError, close_old_connections, connection
+
+    from cashflow.models import MonthlyCashFlow
+    from credit.models import PaymentSchedule
+
+    result = {'writes': 0, 'errors': 0}
+    start.wait()
+    try:
+        while not stop.is_set():
+            for model in (MonthlyCashFlow, PaymentSchedule):
+                try:
+                    model.recalculate_months(months)
+                    result['writes'] += 1
+                except OperationalError:
+                    result['errors'] += 1
+                close_old_connections()
+    finally:
+        connection.close()
+        results.put(('writer', result))
+
+
+def reader(client, urls, start, stop, results):
+    """管理画面の一覧を順に開き、1リクエストごとの時間を記録する"""
+    from django.db import OperationalError, connection
+
+    result = {'latencies': [], 'errors': 0}
+    start.wait()
+    try:
+        while not stop.is_set():
+            for url in urls:
+                started = time.perf_counter()
+                try:
+                    status = client.get(url).status_code
+                except OperationalError:
+                    status = None
+                if status == 200:
+                    result['latencies'].append((time.perf_counter() - started) * 1000)
+                else:
+                    result['errors'] += 1
+    finally:
+        connection.close()
+        results.put(('reader', result))
+
+
+def run(months, clients, urls, seconds, writers):
+    """書き込み（writers 個）と読み込み（clients の数）のプロセスを seconds 秒動かして集計する"""
+    from django.db import connections
+
+    context = multiprocessing.get_context('fork')
+    start, stop = context.Event(), context.Event()
+    results = context.Queue()
+    # fork した子プロセスに親の接続を持ち込まない
+    connections.close_all()
+    processes = [context.Process(target=reader, args=(client, urls, start, stop, results)) for client in clients]
+    processes += [context.Process(target=writer, args=(months, start, stop, results)) for _ in range(writers)]
+    for process in processes:
+        process.start()
+    start.set()
+    time.sleep(seconds)
+    stop.set()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    read_results = [result for kind, result in collected if kind == 'reader']
+    write_results = [result for kind, result in collected if kind == 'writer']
+    latencies = [latency for result in read_results for latency in result['latencies']]
+    return {
+        'reads_per_sec': round(len(latencies) / seconds, 2),
+        'writes_per_sec': round(sum(result['writes'] for result in write_results) / seconds, 2),
+        'read_median_ms': round(statistics.median(latencies), 3) if latencies else None,
+        'read_p95_ms': round(percentile(latencies, 0.95), 3) if latencies else None,
+        'read_max_ms': round(max(latencies), 3) if latencies else None,
+        'errors': sum(result['errors'] for result in read_results + write_results),
+    }
+
+
+def main(argv=None):
+    options = parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client, override_settings
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    from . import synthetic
+    from .cases import ADMIN_CHANGELISTS
+    from .runner import git_revision
+
+    if connection.vendor != 'sqlite':
+        print('SQLite 以外のデータベースでは計測できません')
+        return 1
+
+    urls = [f'/admin/{path}/' for path in ADMIN_CHANGELISTS]
+    results = {}
+    setup_test_environment()
+    with tempfile.TemporaryDirectory() as directory:
+        connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'concurrency.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            rows = synthetic.generate(options['years'], options['scale'], options['seed'])
+            User.objects.create_superuser('benchmark', password='benchmark')
+            months = synthetic.months_for(options['years'])
+            for label, tuning in (('default', False), ('tuned', True)):
+                # WAL はファイルに残るため、既定の設定の計測では rollback journal に戻す
+                if not tuning:
+                    with connection.cursor() as cursor:
+                        cursor.execute('PRAGMA journal_mode = DELETE')
+                connection.close()
+                connection.settings_dict['CONN_MAX_AGE'] = TUNED_CONN_MAX_AGE if tuning else 0
+                with override_settings(SQLITE_TUNING=tuning):
+                    clients = []
+                    for _ in range(options['readers']):
+                        client = Client()
+                        client.force_login(User.objects.get(username='benchmark'))
+                        clients.append(client)
+                    connection.close()
+                    results[label] = run(months, clients, urls, options['seconds'], options['writers'])
+        finally:
+            connection.settings_dict['CONN_MAX_AGE'] = 0
+            connection.close()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    print(f"{'設定':<10} {'読み込み/秒':>11} {'書き込み/秒':>11} {'中央値(ms)':>11} {'p95(ms)':>9} {'最大(ms)':>9} {'エラー':>6}")
+    for label, result in results.items():
+        print(
+            f"{label:<10} {result['reads_per_sec']:>11.1f} {result['writes_per_sec']:>11.1f}"
+            f" {result['read_median_ms'] or 0:>11.2f} {result['read_p95_ms'] or 0:>9.2f}"
+            f" {result['read_max_ms'] or 0:>9.2f} {result['errors']:>6}"
+        )
+
+    if options['output']:
+        meta = {
+            'revision': git_revision(),
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'rows': rows,
+            **{key: options[key] for key in ('years', 'scale', 'seed', 'seconds', 'readers', 'writers')},
+        }
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump({'meta': meta, 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"結果を {options['output']} に保存しました")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
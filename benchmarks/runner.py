@@ -0,0 +1,93 @@
+"""
+計測と結果（JSON）の保存・比較
+"""
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .cases import CASES
+
+
+def measure(func, repeat=5, warmup=1):
+    """
+    func の実行時間（ミリ秒）とクエリ数を計測
+    ウォームアップ後、最初の計測回のクエリ数を記録する
+    """
+    for _ in range(warmup):
+        func()
+    times = []
+    queries = None
+    for i in range(repeat):
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            func()
+            times.append((time.perf_counter() - started) * 1000)
+        if queries is None:
+            queries = len(context.captured_queries)
+    return {
+        'queries': queries,
+        'min_ms': round(min(times), 3),
+        'median_ms': round(statistics.median(times), 3),
+        'mean_ms': round(statistics.mean(times), 3),
+        'runs': repeat,
+    }
+
+
+def run_cases(context, repeat=5, selected=None):
+    """ケースを順に計測して {ケース名: 結果} を返す。selected は名前に含まれる文字列のリスト"""
+    results = {}
+    for name, prepare in CASES:
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        results[name] = measure(prepare(context), repeat=repeat)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(options, rows):
+    import django
+    return {
+        'revision': git_revision(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'years': options['years'],
+        'scale': options['scale'],
+        'seed': options['seed'],
+        'repeat': options['repeat'],
+        'rows': rows,
+    }
+
+
+def save(path, meta, results):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'meta': meta, 'results': results}, f, ensure_ascii=False, indent=2)
+
+
+def compare(baseline, results):
+    """
+    前回の結果との比較
+    [(ケース名, 前回のクエリ数, 今回のクエリ数, 前回の中央値, 今回の中央値), ...] を返す
+    """
+    rows = []
+    for name, current in results.items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            continue
+        rows.append((name, previous['queries'], current['queries'], previous['median_ms'], current['median_ms']))
+    return rows
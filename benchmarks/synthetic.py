@@ -0,0 +1,117 @@
+"""
+合成データ（1世帯分の数年分の明細）の生成
+scale は1ヶ月あたりの明細数の倍率（scale=1 でクレカ利用60件・変動費40件・収入2件）
+"""
+import random
+from datetime import date
+
+from common.months import add_months, month_start
+
+
+CREDIT_USAGES_PER_MONTH = 60
+VARIABLE_EXPENSES_PER_MONTH = 40
+INCOMES_PER_MONTH = 2
+
+CARDS = [
+    # (名前, 締め日, 引落日, 限度額)
+    ('楽天カード', 25, 27, 500000),
+    ('三井住友カード', 15, 10, 300000),
+    ('dカード', 15, 10, 200000),
+]
+
+FIXED_EXPENSES = [
+    # (費目名, カテゴリ, 月額, 残回数)
+    ('住宅ローン', 'loan', 85000, 300),
+    ('車ローン', 'loan', 25000, 36),
+    ('生命保険', 'insurance', 12000, None),
+    ('Netflix', 'subscription', 1490, None),
+    ('電気代', 'utility', 9000, None),
+    ('ahamo', 'communication', 2970, None),
+]
+
+
+def months_for(years, end=None):
+    """end（省略時は先月）までの years 年分の月初日"""
+    end = month_start(end or add_months(date.today(), -1))
+    return [add_months(end, -i) for i in range(years * 12 - 1, -1, -1)]
+
+
+def _day(rng, year_month):
+    return year_month.replace(day=rng.randint(1, 28))
+
+
+def generate(years=3, scale=1, seed=0):
+    """
+    合成データを登録し、{モデル名: 件数} を返す
+    明細は bulk_create で登録し、最後にカテゴリ別集計と月次の集計を作り直す
+    """
+    from cashflow import rollup
+    from cashflow.models import FixedExpense, Income, MonthlyCashFlow, VariableExpense
+    from credit.models import CreditCard, CreditUsage, PaymentSchedule, ShortTermLoan, compute_payment_date
+    from salary.models import SalaryRecord
+
+    rng = random.Random(seed)
+    months = months_for(years)
+    today = date.today()
+
+    cards = [
+        CreditCard.objects.create(name=name, closing_date=closing, payment_date=payment, credit_limit=limit)
+        for name, closing, payment, limit in CARDS
+    ]
+    for name, category, amount, remaining in FIXED_EXPENSES:
+        FixedExpense.objects.create(
+            name=name, category=category, monthly_amount=amount,
+            is_loan=remaining is not None, remaining_months=remaining
+        )
+    ShortTermLoan.objects.create(
+        name='iPhone 分割', monthly_payment=5000, remaining_months=20, payment_date=27, start_date=months[0]
+    )
+
+    salaries, incomes, expenses, usages = [], [], [], []
+    income_categories = ['side_business', 'refund', 'temporary', 'other']
+    expense_categories = [value for value, label in VariableExpense.CATEGORY_CHOICES]
+    usage_categories = [value for value, label in CreditUsage.CATEGORY_CHOICES]
+    for year_month in months:
+        record = SalaryRecord(
+            year_month=year_month, base_salary=300000, housing_allowance=20000,
+            overtime_minutes=rng.randint(0, 2400), health_insurance=15000, pension_insurance=27000,
+            monthly_income_tax=8000, resident_tax=18000
+        )
+        record.overtime_pay = record.overtime_minutes * 40
+        record.calculate_all()
+        salaries.append(record)
+
+        for _ in range(INCOMES_PER_MONTH * scale):
+            incomes.append(Income(
+                year_month=year_month, category=rng.choice(income_categories),
+                amount=rng.randint(1, 50) * 1000, received_date=_day(rng, year_month)
+            ))
+        for _ in range(VARIABLE_EXPENSES_PER_MONTH * scale):
+            expenses.append(VariableExpense(
+                year_month=year_month, category=rng.choice(expense_categories),
+                amount=rng.randint(1, 100) * 100, expense_date=_day(rng, year_month)
+            ))
+        for _ in range(CREDIT_USAGES_PER_MONTH * scale):
+            card = rng.choice(cards)
+            usage_date = _day(rng, year_month)
+            payment_date = compute_payment_date(usage_date, card.closing_date, card.payment_date)
+            usages.append(CreditUsage(
+                credit_card=card, usage_date=usage_date, amount=rng.randint(1, 200) * 100,
+                category=rng.choice(usage_categories), payment_date=payment_date,
+                is_paid=payment_date < today
+            ))
+
+    SalaryRecord.objects.bulk_create(salaries, batch_size=1000)
+    Income.objects.bulk_create(incomes, batch_size=1000)
+    VariableExpense.objects.bulk_create(expenses, batch_size=1000)
+    CreditUsage.objects.bulk_create(usages, batch_size=1000)
+
+    rollup.rebuild()
+    PaymentSchedule.recalculate_months(months)
+    MonthlyCashFlow.recalculate_months(months)
+
+    return {
+        model.__name__: model.objects.count()
+        for model in (SalaryRecord, Income, VariableExpense, CreditUsage, FixedExpense,
+                      PaymentSchedule, MonthlyCashFlow)
+    }
@@ -0,0 +1,18 @@
+from django.test import TestCase
+
+from . import runner, synthetic
+
+
+class BenchmarkSmokeTests(TestCase):
+    """合成データの生成と計測が小さい規模で動くことを確認"""
+
+    def test_generate_and_measure(self):
+        rows = synthetic.generate(years=1, scale=1)
+        self.assertEqual(rows['SalaryRecord'], 12)
+        self.assertEqual(rows['CreditUsage'], 12 * synthetic.CREDIT_USAGES_PER_MONTH)
+        self.assertEqual(rows['MonthlyCashFlow'], 12)
+
+        context = {'months': synthetic.months_for(1), 'client': None}
+        results = runner.run_cases(context, repeat=1, selected=['calculate_all'])
+        self.assertEqual(set(results), {'MonthlyCashFlow.calculate_all', 'PaymentSchedule.calculate_all'})
+        self.assertEqual(results['PaymentSchedule.calculate_all']['queries'], 2)
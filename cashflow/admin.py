@@ -78,8 +78,3 @@ class MonthlyCashFlowAdmin(admin.ModelAdmin):
             'fields': ('created_at', 'updated_at')
         }),
     )
-
-    def save_model(self, request, obj, form, change):
-        """保存時に自動計算"""
-        obj.calculate_all()
-        super().save_model(request, obj, form, change)
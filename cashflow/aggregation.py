@@ -0,0 +1,163 @@
+"""
+月次キャッシュフローの集計エンジン
+副収入・変動費はカテゴリ別月次集計（CategoryRollup）から、
+固定費は条件付き集計で、それぞれ1クエリで取得する
+"""
+from django.db.models import Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from common.months import months_bounds
+
+from . import rollup
+from .models import FixedExpense
+
+
+# Income.category -> MonthlyCashFlow のフィールド名
+INCOME_CATEGORY_FIELDS = {
+    'side_business': 'side_income',
+    'rent_income': 'rent_income',
+    'temporary': 'temporary_income',
+    'refund': 'refund',
+}
+
+# VariableExpense.category -> MonthlyCashFlow のフィールド名
+VARIABLE_CATEGORY_FIELDS = {
+    'food': 'food',
+    'daily_goods': 'daily_goods',
+    'clothing': 'clothing',
+    'social': 'social',
+    'transport': 'transport',
+    'medical': 'medical',
+    'education': 'education',
+    'entertainment': 'entertainment',
+    'other': 'other_variable',
+}
+
+# 住宅ローンの判定キーワード（費目名に含まれるか）
+HOUSING_LOAN_KEYWORD = '住宅'
+
+# MonthlyCashFlow のフィールド名 -> FixedExpense の集計条件
+FIXED_EXPENSE_FILTERS = {
+    'housing_loan': Q(category='loan', name__icontains=HOUSING_LOAN_KEYWORD),
+    'other_loans': Q(category='loan') & ~Q(name__icontains=HOUSING_LOAN_KEYWORD),
+    'insurance': Q(category='insurance'),
+    'subscription': Q(category='subscription'),
+    'utilities': Q(category='utility'),
+    'communication': Q(category='communication'),
+    'rent': Q(category='rent'),
+}
+
+
+def _category_fields(category_totals, category_fields):
+    """{カテゴリ: 合計} を MonthlyCashFlow のフィールド名に読み替え（該当なしは0）"""
+    return {
+        field: category_totals.get(category, 0)
+        for category, field in category_fields.items()
+    }
+
+
+def _sum_if(amount_field, condition):
+    """条件付きSUM（該当行がなければ0）"""
+    return Coalesce(Sum(amount_field, filter=condition), Value(0))
+
+
+def fixed_expense_totals():
+    """有効な固定費をカテゴリ別に集計（1クエリ）"""
+    return FixedExpense.objects.filter(
+        is_active=True
+    ).aggregate(**{
+        field: _sum_if('monthly_amount', condition)
+        for field, condition in FIXED_EXPENSE_FILTERS.items()
+    })
+
+
+def salary_net(year_month):
+    """指定月の給与手取り（SalaryRecordがなければ0）"""
+    from salary.models import SalaryRecord
+    actual_payment = SalaryRecord.objects.filter(
+        year_month=year_month
+    ).values_list('actual_payment', flat=True).first()
+    return actual_payment or 0
+
+
+def credit_payments(year_month):
+    """指定月のクレカ引落（PaymentScheduleがなければ空）"""
+    from credit.models import PaymentSchedule
+    schedule = PaymentSchedule.objects.filter(
+        year_month=year_month
+    ).values('credit_card_payments', 'total_credit_payment').first()
+    if schedule is None:
+        return {'credit_card_payments': {}, 'total_credit_payment': 0}
+    return schedule
+
+
+def month_totals(year_month):
+    """
+    指定月の集計値をすべて取得
+    MonthlyCashFlow のフィールド名をキーとする辞書を返す
+    """
+    rolled = rollup.category_totals(year_month, ['income', 'variable'])
+
+    totals = {'salary_net': salary_net(year_month)}
+    totals.update(_category_fields(rolled['income'], INCOME_CATEGORY_FIELDS))
+    totals.update(fixed_expense_totals())
+    totals.update(credit_payments(year_month))
+    totals.update(_category_fields(rolled['variable'], VARIABLE_CATEGORY_FIELDS))
+    return totals
+
+
+# ========================================
+# 複数月の一括集計
+# ========================================
+
+def salary_net_by_month(start, end):
+    """期間内の給与手取りを {年月: 金額} で取得（1クエリ）"""
+    from salary.models import SalaryRecord
+    range_start, range_end = months_bounds(start, end)
+    return dict(SalaryRecord.objects.filter(
+        year_month__gte=range_start,
+        year_month__lt=range_end
+    ).values_list('year_month', 'actual_payment'))
+
+
+def credit_payments_by_month(start, end):
+    """期間内のクレカ引落を {年月: {...}} で取得（1クエリ）"""
+    from credit.models import PaymentSchedule
+    range_start, range_end = months_bounds(start, end)
+    rows = PaymentSchedule.objects.filter(
+        year_month__gte=range_start,
+        year_month__lt=range_end
+    ).values('year_month', 'credit_card_payments', 'total_credit_payment')
+    return {
+        row.pop('year_month'): row
+        for row in rows
+    }
+
+
+def range_totals(year_months):
+    """
+    複数月の集計値を一括取得
+    月数に関係なく集計元ごとに1クエリで済ませる
+    {年月: MonthlyCashFlow のフィールド名をキーとする辞書} を返す
+    """
+    year_months = sorted(year_months)
+    if not year_months:
+        return {}
+    start, end = year_months[0], year_months[-1]
+
+    salaries = salary_net_by_month(start, end)
+    rolled = rollup.category_totals_by_month(start, end, ['income', 'variable'])
+    fixed = fixed_expense_totals()
+    credits = credit_payments_by_month(start, end)
+
+    empty_credit = {'credit_card_payments': {}, 'total_credit_payment': 0}
+
+    result = {}
+    for year_month in year_months:
+        totals = {'salary_net': salaries.get(year_month) or 0}
+        totals.update(_category_fields(rolled['income'].get(year_month, {}), INCOME_CATEGORY_FIELDS))
+        totals.update(fixed)
+        totals.update(credits.get(year_month, empty_credit))
+        totals.update(_category_fields(rolled['variable'].get(year_month, {}), VARIABLE_CATEGORY_FIELDS))
+        result[year_month] = totals
+    return result
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CashflowConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cashflow'
+
+    def ready(self):
+        from . import dirty, signals
+        signals.connect()
+        dirty.connect()
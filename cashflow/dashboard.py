@@ -0,0 +1,45 @@
+"""キャッシュフローダッシュボードの集計（views.dashboard が common.concurrency.gather_queries で同時に実行する）"""
+from . import aggregation, rollup
+from .models import MonthlyCashFlow
+
+
+def salary(year_month):
+    from salary.models import SalaryRecord
+    return SalaryRecord.objects.filter(year_month=year_month).values(
+        'total_payment', 'total_deduction', 'actual_payment'
+    ).first()
+
+
+def income(year_month):
+    return rollup.category_totals(year_month, ['income'])['income']
+
+
+def variable_expense(year_month):
+    return rollup.category_totals(year_month, ['variable'])['variable']
+
+
+def payment_schedule(year_month):
+    from credit.models import PaymentSchedule
+    return PaymentSchedule.objects.filter(year_month=year_month).values(
+        'credit_card_payments', 'total_credit_payment', 'loan_payments', 'total_loan_payment',
+        'total_payment', 'risk_level'
+    ).first()
+
+
+def cashflow(year_month):
+    return MonthlyCashFlow.objects.filter(year_month=year_month).values(
+        'opening_balance', 'closing_balance', 'total_income', 'total_expense', 'net_cashflow',
+        'risk_level', 'risk_message'
+    ).first()
+
+
+def queries(year_month):
+    """ダッシュボードの各項目を集計する関数 {名前: 引数なしの関数}"""
+    return {
+        'salary': lambda: salary(year_month),
+        'income': lambda: income(year_month),
+        'variable_expense': lambda: variable_expense(year_month),
+        'fixed_expense': aggregation.fixed_expense_totals,
+        'payment_schedule': lambda: payment_schedule(year_month),
+        'cashflow': lambda: cashflow(year_month),
+    }
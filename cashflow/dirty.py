@@ -0,0 +1,167 @@
+"""
+再計算が必要な月（dirty month）の追跡
+明細の保存・削除で影響する月だけを記録し、トランザクション確定時に
+まとめて PaymentSchedule / MonthlyCashFlow を再計算する
+
+- 同じトランザクション内の変更は1回の再計算にまとめられる
+- deferred_flush() の中では再計算を保留し、抜けたときに1回だけ行う
+- 再計算するのは既に作成済みの月だけ（新しい月の作成は recalc-cashflow で行う）
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from common.months import month_start
+from common.signals import post_bulk_create, track_previous
+
+
+_local = threading.local()
+
+
+def _pending():
+    if not hasattr(_local, 'schedule_months'):
+        _local.schedule_months = set()
+        _local.cashflow_months = set()
+        _local.defer_depth = 0
+    return _local
+
+
+def mark_dirty(cashflow_months=(), schedule_months=()):
+    """
+    再計算が必要な月を記録し、トランザクション確定時の再計算を予約
+    支払いスケジュールが変わる月はキャッシュフローも再計算する
+    """
+    state = _pending()
+    schedule_months = {month_start(m) for m in schedule_months if m}
+    cashflow_months = {month_start(m) for m in cashflow_months if m} | schedule_months
+    if not cashflow_months:
+        return
+    state.schedule_months |= schedule_months
+    state.cashflow_months |= cashflow_months
+    if state.defer_depth == 0:
+        # 確定時に何度呼ばれても、2回目以降は空振りになる
+        transaction.on_commit(flush)
+
+
+def flush():
+    """記録済みの月をまとめて再計算（支払いスケジュール → キャッシュフローの順）"""
+    from credit.models import PaymentSchedule
+    from .models import MonthlyCashFlow
+
+    state = _pending()
+    if state.defer_depth > 0:
+        return
+    schedule_months, state.schedule_months = state.schedule_months, set()
+    cashflow_months, state.cashflow_months = state.cashflow_months, set()
+
+    if schedule_months:
+        PaymentSchedule.recalculate_months(schedule_months, create=False)
+    if cashflow_months:
+        MonthlyCashFlow.recalculate_months(cashflow_months, create=False)
+
+
+@contextmanager
+def deferred_flush():
+    """
+    ブロック内の変更による再計算を、ブロックを抜けるときの1回にまとめる
+    例: with deferred_flush(): 大量の明細を個別に save()
+    """
+    state = _pending()
+    state.defer_depth += 1
+    try:
+        yield
+    finally:
+        state.defer_depth -= 1
+    if state.defer_depth == 0:
+        transaction.on_commit(flush)
+
+
+def _existing_months_from(model, start):
+    """start 以降の作成済みの月"""
+    return model.objects.filter(year_month__gte=month_start(start)).values_list('year_month', flat=True)
+
+
+# ========================================
+# 明細ごとの影響月
+# ========================================
+
+def _affected_months(sender, instance):
+    """
+    モデルごとに (キャッシュフローの月, 支払いスケジュールの月) を返す
+    """
+    from credit.models import CreditUsage, PaymentSchedule, ShortTermLoan
+    from salary.models import SalaryRecord
+    from .models import FixedExpense, Income, MonthlyCashFlow, VariableExpense
+
+    if sender in (Income, VariableExpense, SalaryRecord):
+        return {instance.year_month}, set()
+    if sender is CreditUsage:
+        return set(), {instance.payment_date}
+    if sender is FixedExpense:
+        # 固定費は有効なものが毎月に計上されるため、当月以降の作成済みの月すべて
+        return set(_existing_months_from(MonthlyCashFlow, timezone.localdate())), set()
+    if sender is ShortTermLoan:
+        # ローンは有効なものが毎月の支払いに計上されるため、当月以降の作成済みの月すべて
+        return set(), set(_existing_months_from(PaymentSchedule, timezone.localdate()))
+    return set(), set()
+
+
+def _month_fields(sender):
+    """更新前の影響月を調べるために控えるフィールド"""
+    from credit.models import CreditUsage
+    from salary.models import SalaryRecord
+    from .models import Income, VariableExpense
+
+    if sender in (Income, VariableExpense, SalaryRecord):
+        return 'year_month'
+    if sender is CreditUsage:
+        return 'payment_date'
+    return None
+
+
+def mark_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    cashflow_months, schedule_months = _affected_months(sender, instance)
+    # 月が変わる更新では、更新前の月（common.signals.track_previous で控えたもの）も対象にする
+    field = _month_fields(sender)
+    previous_row = getattr(instance, '_previous_row', None)
+    previous = previous_row[field] if field is not None and previous_row is not None else None
+    if previous is not None:
+        if schedule_months:
+            schedule_months.add(previous)
+        else:
+            cashflow_months.add(previous)
+    mark_dirty(cashflow_months, schedule_months)
+
+
+def mark_on_delete(sender, instance, **kwargs):
+    mark_dirty(*_affected_months(sender, instance))
+
+
+def mark_on_bulk_create(sender, objs, **kwargs):
+    cashflow_months, schedule_months = set(), set()
+    for instance in objs:
+        cashflow, schedule = _affected_months(sender, instance)
+        cashflow_months |= cashflow
+        schedule_months |= schedule
+    mark_dirty(cashflow_months, schedule_months)
+
+
+def connect():
+    """影響月を記録するシグナルハンドラを対象モデルに接続"""
+    from credit.models import CreditUsage, ShortTermLoan
+    from salary.models import SalaryRecord
+    from .models import FixedExpense, Income, VariableExpense
+
+    for model in (Income, VariableExpense, FixedExpense, CreditUsage, ShortTermLoan, SalaryRecord):
+        uid = f'cashflow_dirty_{model._meta.label_lower}'
+        field = _month_fields(model)
+        if field is not None:
+            track_previous(model, [field])
+        post_save.connect(mark_on_save, sender=model, dispatch_uid=uid)
+        post_delete.connect(mark_on_delete, sender=model, dispatch_uid=uid)
+        post_bulk_create.connect(mark_on_bulk_create, sender=model, dispatch_uid=uid)
@@ -0,0 +1,209 @@
+"""
+キャッシュフロー予測エンジン
+履歴・固定費・短期ローン・引落予定をNumPy配列に読み込み、
+N ヶ月分の残高推移を1回のベクトル演算で計算する（月ごとのORMループなし）
+
+NumPy が必要: pip install numpy
+"""
+from datetime import date
+
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from common.months import month_ordinal, month_start
+from common.optional import np, require_numpy
+
+
+DEFAULT_HISTORY_MONTHS = 6
+
+# 開始日・終了日・残回数が未設定の場合の番兵値
+NO_LIMIT = 10 ** 9
+
+
+def active_mask(ordinals, base_month, remaining, start=None, end=None):
+    """
+    (費目, 月) ごとに支払いが発生するかのフラグ行列
+    ordinals: 対象月の通し番号 (n,)
+    remaining: 基準月からの残回数 (k,)、start / end: 開始・終了月の通し番号 (k,)
+    """
+    offsets = ordinals - month_ordinal(base_month)
+    mask = offsets[None, :] < remaining[:, None]
+    if start is not None:
+        mask &= ordinals[None, :] >= start[:, None]
+    if end is not None:
+        mask &= ordinals[None, :] <= end[:, None]
+    return mask
+
+
+def date_ordinals(values, default):
+    """日付（None可）の列を月の通し番号の配列に変換"""
+    return np.array(
+        [month_ordinal(v) if v else default for v in values],
+        dtype=np.int64
+    ).reshape(-1)
+
+
+def optional_counts(values):
+    """残回数（None可）の列を配列に変換。None は無期限"""
+    return np.array([NO_LIMIT if v is None else v for v in values], dtype=np.int64)
+
+
+class ForecastInputs:
+    """
+    予測に使う入力データ（DBから読み込んだ配列）
+    予測期間を変えて何度でも project() できる
+    """
+
+    def __init__(self, base_month, opening_balance, income, variable_expense, credit_baseline,
+                 fixed_amounts, fixed_start, fixed_end, fixed_remaining,
+                 loan_amounts, loan_remaining, scheduled_credit):
+        self.base_month = base_month            # 残回数の基準月（当月）
+        self.opening_balance = opening_balance  # 予測開始時点の残高
+        self.income = income                    # 月平均収入（履歴）
+        self.variable_expense = variable_expense  # 月平均変動費（履歴）
+        self.credit_baseline = credit_baseline  # 月平均クレカ引落（履歴）
+        self.fixed_amounts = fixed_amounts      # 固定費 月額 (k,)
+        self.fixed_start = fixed_start          # 固定費 開始月の通し番号 (k,)
+        self.fixed_end = fixed_end              # 固定費 終了月の通し番号 (k,)
+        self.fixed_remaining = fixed_remaining  # 固定費 残回数（基準月から） (k,)
+        self.loan_amounts = loan_amounts        # 短期ローン 月額 (l,)
+        self.loan_remaining = loan_remaining    # 短期ローン 残回数（基準月から） (l,)
+        self.scheduled_months, self.scheduled_amounts = scheduled_credit  # 引落予定（月の通し番号, 金額）
+
+    def project(self, start, months):
+        """start から months ヶ月分の予測を計算"""
+        require_numpy('キャッシュフロー予測')
+        ordinals = month_ordinal(start) + np.arange(months)
+
+        # 固定費: (費目, 月) の有効フラグ × 月額 を月ごとに合計
+        fixed_active = active_mask(
+            ordinals, self.base_month, self.fixed_remaining, self.fixed_start, self.fixed_end
+        )
+        fixed = self.fixed_amounts @ fixed_active
+
+        # 短期ローン: 残回数の間だけ支払い
+        loan_active = active_mask(ordinals, self.base_month, self.loan_remaining)
+        loans = self.loan_amounts @ loan_active
+
+        # クレカ: 引落予定が確定している分と履歴平均の大きい方
+        scheduled = np.zeros(months, dtype=np.int64)
+        index = self.scheduled_months - ordinals[0]
+        in_range = (index >= 0) & (index < months)
+        scheduled[index[in_range]] = self.scheduled_amounts[in_range]
+        credit = np.maximum(scheduled, self.credit_baseline)
+
+        income = np.full(months, self.income, dtype=np.int64)
+        variable = np.full(months, self.variable_expense, dtype=np.int64)
+        expense = fixed + loans + credit + variable
+        net = income - expense
+        balance = self.opening_balance + np.cumsum(net)
+
+        return ForecastResult(
+            months=[date(o // 12, o % 12 + 1, 1) for o in ordinals.tolist()],
+            income=income,
+            fixed_expense=fixed,
+            loan_payment=loans,
+            credit_payment=credit,
+            variable_expense=variable,
+            total_expense=expense,
+            net_cashflow=net,
+            balance=balance,
+        )
+
+
+class ForecastResult:
+    """予測結果（各項目は月ごとのNumPy配列）"""
+
+    FIELDS = [
+        'income', 'fixed_expense', 'loan_payment', 'credit_payment',
+        'variable_expense', 'total_expense', 'net_cashflow', 'balance',
+    ]
+
+    def __init__(self, months, **arrays):
+        self.months = months
+        for field in self.FIELDS:
+            setattr(self, field, arrays[field])
+
+    def first_negative_month(self):
+        """残高が初めてマイナスになる月（なければ None）"""
+        negative = np.flatnonzero(self.balance < 0)
+        return self.months[negative[0]] if negative.size else None
+
+    def rows(self):
+        """月ごとの辞書を順に返す（表示・シリアライズ用）"""
+        columns = [getattr(self, field).tolist() for field in self.FIELDS]
+        for month, values in zip(self.months, zip(*columns)):
+            yield {'year_month': month, **dict(zip(self.FIELDS, values))}
+
+
+def load_inputs(start, history_months=DEFAULT_HISTORY_MONTHS, today=None):
+    """
+    予測に必要なデータを読み込む（テーブルごとに1クエリ）
+    - 履歴: start より前の MonthlyCashFlow 直近 history_months ヶ月の平均
+    - 開始残高: start より前の最新の期末残高
+    - 固定費・短期ローン: 有効なもの（残回数は当月基準）
+    - クレカ: 未払いの利用明細の引落予定
+    """
+    from credit.models import CreditUsage, ShortTermLoan
+    from .models import FixedExpense, MonthlyCashFlow
+
+    require_numpy('キャッシュフロー予測')
+    start = month_start(start)
+    base_month = month_start(today or timezone.localdate())
+
+    history = list(MonthlyCashFlow.objects.filter(
+        year_month__lt=start
+    ).order_by('-year_month').values_list(
+        'closing_balance', 'total_income', 'total_variable_expense', 'total_credit_payment'
+    )[:history_months])
+    if history:
+        values = np.array(history, dtype=np.int64)
+        opening_balance = int(values[0, 0])
+        income, variable, credit = np.rint(values[:, 1:].mean(axis=0)).astype(np.int64).tolist()
+    else:
+        opening_balance = income = variable = credit = 0
+
+    fixed = list(FixedExpense.objects.filter(is_active=True).values_list(
+        'monthly_amount', 'start_date', 'end_date', 'remaining_months'
+    ))
+    loans = list(ShortTermLoan.objects.filter(is_active=True).values_list(
+        'monthly_payment', 'remaining_months'
+    ))
+
+    # 予測開始月以降の引落予定（引落月ごとの合計）
+    scheduled = list(CreditUsage.objects.filter(
+        credit_card__is_active=True,
+        payment_date__gte=start,
+        is_paid=False
+    ).annotate(
+        payment_month=TruncMonth('payment_date')
+    ).values('payment_month').annotate(
+        amount=Sum('amount')
+    ).order_by().values_list('payment_month', 'amount'))
+    scheduled_columns = list(zip(*scheduled)) or [(), ()]
+
+    fixed_columns = list(zip(*fixed)) or [(), (), (), ()]
+    loan_columns = list(zip(*loans)) or [(), ()]
+    return ForecastInputs(
+        base_month=base_month,
+        opening_balance=opening_balance,
+        income=income,
+        variable_expense=variable,
+        credit_baseline=credit,
+        fixed_amounts=np.array(fixed_columns[0], dtype=np.int64),
+        fixed_start=date_ordinals(fixed_columns[1], -NO_LIMIT),
+        fixed_end=date_ordinals(fixed_columns[2], NO_LIMIT),
+        fixed_remaining=optional_counts(fixed_columns[3]),
+        loan_amounts=np.array(loan_columns[0], dtype=np.int64),
+        loan_remaining=np.array(loan_columns[1], dtype=np.int64),
+        scheduled_credit=(
+            date_ordinals(scheduled_columns[0], 0),
+            np.array(scheduled_columns[1], dtype=np.int64),
+        ),
+    )
+
+
+def forecast(start, months, history_months=DEFAULT_HISTORY_MONTHS, today=None):
+    """start から months ヶ月分のキャッシュフローを予測"""
+    return load_inputs(start, history_months, today).project(month_start(start), months)
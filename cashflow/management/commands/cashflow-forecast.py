@@ -0,0 +1,64 @@
+"""
+キャッシュフロー予測
+
+使い方:
+    python manage.py cashflow-forecast 2025-01 --months 3
+    python manage.py cashflow-forecast 2025-01 --months 120 --history 12
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from cashflow import forecast
+from common.months import parse_year_month
+
+
+class Command(BaseCommand):
+    help = '指定月からのキャッシュフロー（残高推移）を予測します'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'start',
+            help='予測開始年月（YYYY-MM）'
+        )
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=3,
+            help='予測する月数'
+        )
+        parser.add_argument(
+            '--history',
+            type=int,
+            default=forecast.DEFAULT_HISTORY_MONTHS,
+            help='平均をとる過去の月数'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start = parse_year_month(options['start'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if options['months'] < 1:
+            raise CommandError('--months は1以上を指定してください')
+        try:
+            result = forecast.forecast(start, options['months'], options['history'])
+        except ImportError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"{'年月':<8} {'収入':>11} {'固定費':>10} {'ローン':>10} {'クレカ':>10} "
+            f"{'変動費':>10} {'純CF':>11} {'残高':>12}"
+        )
+        for row in result.rows():
+            self.stdout.write(
+                f"{row['year_month']:%Y-%m}  {row['income']:>12,} {row['fixed_expense']:>12,} "
+                f"{row['loan_payment']:>12,} {row['credit_payment']:>12,} "
+                f"{row['variable_expense']:>12,} {row['net_cashflow']:>12,} {row['balance']:>13,}"
+            )
+
+        negative_month = result.first_negative_month()
+        if negative_month:
+            self.stdout.write(self.style.ERROR(
+                f"{negative_month:%Y年%m月} に残高がマイナスになる見込みです"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS("予測期間中に残高はマイナスになりません"))
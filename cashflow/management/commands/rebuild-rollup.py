@@ -0,0 +1,47 @@
+"""
+カテゴリ別月次集計（CategoryRollup）の再構築・検証
+
+使い方:
+    python manage.py rebuild-rollup              # 明細から作り直す
+    python manage.py rebuild-rollup --verify     # 明細と突き合わせるだけ（書き込まない）
+    python manage.py rebuild-rollup --source credit
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from cashflow import rollup
+from cashflow.models import CategoryRollup
+
+
+class Command(BaseCommand):
+    help = 'カテゴリ別月次集計を明細から再構築、または明細との一致を検証します'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='再構築せず、集計テーブルと明細の不一致を報告する'
+        )
+        parser.add_argument(
+            '--source',
+            action='append',
+            choices=[value for value, label in CategoryRollup.SOURCE_CHOICES],
+            help='対象の集計元（複数指定可、省略時はすべて）'
+        )
+
+    def handle(self, *args, **options):
+        sources = options['source']
+
+        if options['verify']:
+            mismatches = rollup.verify(sources)
+            for (source, year_month, category), stored, expected in mismatches:
+                self.stderr.write(
+                    f"{source} {year_month:%Y-%m} {category}: "
+                    f"集計テーブル={stored} 明細={expected}（合計, 件数）"
+                )
+            if mismatches:
+                raise CommandError(f"集計テーブルと明細が {len(mismatches)} 件一致しません")
+            self.stdout.write(self.style.SUCCESS("集計テーブルは明細と一致しています"))
+            return
+
+        created = rollup.rebuild(sources)
+        self.stdout.write(self.style.SUCCESS(f"カテゴリ別月次集計を再構築しました（{created}行）"))
@@ -0,0 +1,66 @@
+"""
+月次キャッシュフローの一括再計算
+
+使い方:
+    python manage.py recalc-cashflow --from 2023-01 --to 2025-12
+    python manage.py recalc-cashflow --from 2023-01 --to 2025-12 --with-schedules
+
+収入・変動費・クレカ利用はカテゴリ別月次集計（CategoryRollup）から読む
+SQL やシグナルを送らない方法で明細を書き換えた場合は、先に rebuild-rollup（rollup.rebuild）で作り直す
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from cashflow.models import MonthlyCashFlow
+from credit.models import PaymentSchedule
+from common.months import iter_months, parse_year_month
+
+
+class Command(BaseCommand):
+    help = (
+        '指定期間の月次キャッシュフローを一括で再計算します。'
+        '収入・変動費はカテゴリ別月次集計から読むため、明細を直接書き換えた場合は先に rebuild-rollup を実行してください'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from',
+            dest='from_month',
+            required=True,
+            help='開始年月（YYYY-MM）'
+        )
+        parser.add_argument(
+            '--to',
+            dest='to_month',
+            required=True,
+            help='終了年月（YYYY-MM、この月を含む）'
+        )
+        parser.add_argument(
+            '--with-schedules',
+            action='store_true',
+            help='先に同じ期間の支払いスケジュールも再計算する'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start = parse_year_month(options['from_month'])
+            end = parse_year_month(options['to_month'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if start > end:
+            raise CommandError('--from は --to 以前の年月を指定してください')
+
+        year_months = list(iter_months(start, end))
+
+        if options['with_schedules']:
+            updated, created = PaymentSchedule.recalculate_months(year_months)
+            self.stdout.write(
+                f"支払いスケジュールを再計算しました（更新: {updated}件、作成: {created}件）"
+            )
+
+        updated, created = MonthlyCashFlow.recalculate_months(year_months)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{start:%Y-%m} 〜 {end:%Y-%m}（{len(year_months)}ヶ月）を再計算しました"
+            f"（更新: {updated}件、作成: {created}件）"
+        ))
@@ -0,0 +1,87 @@
+"""
+デフォルトリスクのシミュレーション（モンテカルロ法）
+
+使い方:
+    python manage.py risk-simulate 2025-01 --months 6
+    python manage.py risk-simulate 2025-01 --months 12 --paths 1000000 --seed 42 --workers 4
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from cashflow import montecarlo
+from common.months import parse_year_month
+
+
+class Command(BaseCommand):
+    help = '引落日ごとに残高がマイナスになる確率をシミュレーションします'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'start',
+            help='シミュレーション開始年月（YYYY-MM）'
+        )
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=6,
+            help='シミュレーションする月数'
+        )
+        parser.add_argument(
+            '--paths',
+            type=int,
+            default=100000,
+            help='シミュレーションするパスの数'
+        )
+        parser.add_argument(
+            '--history',
+            type=int,
+            default=montecarlo.DEFAULT_HISTORY_MONTHS,
+            help='分布を推定する過去の月数'
+        )
+        parser.add_argument(
+            '--payday',
+            type=int,
+            default=montecarlo.DEFAULT_PAYDAY,
+            help='給与の入金日'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='乱数のシード（指定すると結果が再現できる）'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='並列に計算するプロセス数'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start = parse_year_month(options['start'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if options['months'] < 1:
+            raise CommandError('--months は1以上を指定してください')
+        if options['paths'] < 1:
+            raise CommandError('--paths は1以上を指定してください')
+
+        try:
+            model = montecarlo.fit_model(
+                start, options['months'], options['history'], options['payday']
+            )
+            result = montecarlo.simulate(
+                model, options['paths'], seed=options['seed'], workers=options['workers']
+            )
+        except ImportError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"{'引落日':<10} {'種別':<6} {'名前':<20} {'金額':>10} {'マイナス確率':>8} {'累積':>8}")
+        for row in result.rows():
+            self.stdout.write(
+                f"{row['date']:%Y-%m-%d}  {row['kind']:<6} {row['name']:<20} {row['amount']:>12,} "
+                f"{row['negative_probability']:>13.2%} {row['cumulative_probability']:>9.2%}"
+            )
+
+        final = result.cumulative_probability[-1] if len(model.events) else 0.0
+        style = self.style.ERROR if final > 0 else self.style.SUCCESS
+        self.stdout.write(style(f"期間中に残高がマイナスになる確率: {final:.2%}（{options['paths']:,}パス）"))
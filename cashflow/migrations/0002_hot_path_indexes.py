@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cashflow', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fixedexpense',
+            index=models.Index(fields=['is_active', 'category'], name='fixed_active_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='income',
+            index=models.Index(fields=['year_month', 'category', 'amount'], name='income_month_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='variableexpense',
+            index=models.Index(fields=['year_month', 'category', 'amount'], name='variable_month_category_idx'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:07
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def populate_rollups(apps, schema_editor):
+    """既存の明細からカテゴリ別月次集計を作成"""
+    CategoryRollup = apps.get_model('cashflow', 'CategoryRollup')
+    sources = [
+        ('income', apps.get_model('cashflow', 'Income'), 'year_month'),
+        ('variable', apps.get_model('cashflow', 'VariableExpense'), 'year_month'),
+        ('credit', apps.get_model('credit', 'CreditUsage'), 'usage_date'),
+    ]
+    for source, model, date_field in sources:
+        rows = model.objects.annotate(
+            rollup_month=TruncMonth(date_field)
+        ).values('rollup_month', 'category').annotate(
+            total=Sum('amount'),
+            count=Count('pk')
+        ).order_by()
+        CategoryRollup.objects.bulk_create([
+            CategoryRollup(
+                source=source,
+                year_month=row['rollup_month'],
+                category=row['category'],
+                total=row['total'],
+                count=row['count'],
+            )
+            for row in rows
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cashflow', '0002_hot_path_indexes'),
+        ('credit', '0002_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('income', '収入'), ('variable', '変動費'), ('credit', 'クレカ利用')], max_length=10, verbose_name='集計元')),
+                ('year_month', models.DateField(help_text='対象月（YYYY-MM-01形式）。クレカ利用は利用日の月', verbose_name='年月')),
+                ('category', models.CharField(max_length=20, verbose_name='カテゴリ')),
+                ('total', models.BigIntegerField(default=0, verbose_name='合計金額')),
+                ('count', models.IntegerField(default=0, verbose_name='件数')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'カテゴリ別月次集計',
+                'verbose_name_plural': 'カテゴリ別月次集計一覧',
+                'ordering': ['-year_month', 'source', 'category'],
+                'indexes': [models.Index(fields=['year_month', 'source'], name='category_rollup_month_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='categoryrollup',
+            constraint=models.UniqueConstraint(fields=('source', 'year_month', 'category'), name='category_rollup_unique_key'),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,40 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from datetime import date
 
+from common.months import months_bounds
+
+
+class RollupQuerySet(models.QuerySet):
+    """
+    カテゴリ別月次集計（CategoryRollup）の集計元の明細の QuerySet
+    update() は post_save を送らないため、集計に関わる列（日付・カテゴリ・金額）を
+    変更するときは変更前後の行の差分を集計へ反映する
+    （bulk_update() もバッチごとにこの update() を呼ぶため同じく反映される）
+    """
+
+    def _rollup_source(self, fields):
+        """変更する列が集計に関わる場合は集計元の名前（関わらなければ None）"""
+        from . import rollup
+        source = rollup.source_for_model(self.model)
+        model, date_field = rollup.rollup_sources()[source]
+        if set(fields) & {date_field, 'category', 'amount'}:
+            return source
+        return None
+
+    def update(self, **kwargs):
+        source = self._rollup_source(kwargs)
+        if source is None:
+            return super().update(**kwargs)
+        from . import rollup
+        with transaction.atomic(using=self.db):
+            pks = list(self.values_list('pk', flat=True))
+            before = rollup.source_rows(source, pks)
+            updated = super().update(**kwargs)
+            rollup.apply_row_changes(source, before, rollup.source_rows(source, pks))
+        return updated
+
 
 class FixedExpense(models.Model):
     """
@@ -79,6 +112,9 @@ class FixedExpense(models.Model):
         verbose_name = "固定費"
         verbose_name_plural = "固定費一覧"
         ordering = ['category', 'name']
+        indexes = [
+            models.Index(fields=['is_active', 'category'], name='fixed_active_category_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.monthly_amount:,}円/月"
@@ -135,10 +171,15 @@ class Income(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     memo = models.TextField(blank=True, verbose_name="メモ")
 
+    objects = RollupQuerySet.as_manager()
+
     class Meta:
         verbose_name = "収入"
         verbose_name_plural = "収入一覧"
         ordering = ['-year_month', '-received_date']
+        indexes = [
+            models.Index(fields=['year_month', 'category', 'amount'], name='income_month_category_idx'),
+        ]
 
     def __str__(self):
         return f"{self.year_month.strftime('%Y年%m月')} {self.get_category_display()} {self.amount:,}円"
@@ -190,10 +231,15 @@ class VariableExpense(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     memo = models.TextField(blank=True, verbose_name="メモ")
 
+    objects = RollupQuerySet.as_manager()
+
     class Meta:
         verbose_name = "変動費"
         verbose_name_plural = "変動費一覧"
         ordering = ['-year_month', '-expense_date']
+        indexes = [
+            models.Index(fields=['year_month', 'category', 'amount'], name='variable_month_category_idx'),
+        ]
 
     def __str__(self):
         return f"{self.year_month.strftime('%Y年%m月')} {self.get_category_display()} {self.amount:,}円"
@@ -413,6 +459,17 @@ class MonthlyCashFlow(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     memo = models.TextField(blank=True, verbose_name="メモ")
 
+    # calculate_all() で自動計算されるフィールド
+    CALCULATED_FIELDS = [
+        'salary_net', 'side_income', 'rent_income', 'temporary_income', 'refund', 'total_income',
+        'housing_loan', 'other_loans', 'insurance', 'subscription', 'utilities', 'communication',
+        'rent', 'total_fixed_expense',
+        'credit_card_payments', 'total_credit_payment',
+        'food', 'daily_goods', 'clothing', 'social', 'transport', 'medical', 'education',
+        'entertainment', 'other_variable', 'total_variable_expense',
+        'total_expense', 'net_cashflow', 'monthly_change', 'risk_level', 'risk_message',
+    ]
+
     class Meta:
         verbose_name = "月次キャッシュフロー"
         verbose_name_plural = "月次キャッシュフロー一覧"
@@ -424,39 +481,18 @@ class MonthlyCashFlow(models.Model):
     def calculate_all(self):
         """
         すべての項目を集計・計算
+        集計元テーブルごとに1クエリでカテゴリ別合計を取得する
         """
-        # SalaryRecordから給与取得
-        from salary.models import SalaryRecord
-        try:
-            salary = SalaryRecord.objects.get(year_month=self.year_month)
-            self.salary_net = salary.actual_payment
-        except SalaryRecord.DoesNotExist:
-            self.salary_net = 0
-
-        # 副収入の集計
-        side_incomes = Income.objects.filter(
-            year_month=self.year_month,
-            category='side_business'
-        ).aggregate(models.Sum('amount'))['amount__sum'] or 0
-        self.side_income = side_incomes
-
-        rent_incomes = Income.objects.filter(
-            year_month=self.year_month,
-            category='rent_income'
-        ).aggregate(models.Sum('amount'))['amount__sum'] or 0
-        self.rent_income = rent_incomes
-
-        temp_incomes = Income.objects.filter(
-            year_month=self.year_month,
-            category='temporary'
-        ).aggregate(models.Sum('amount'))['amount__sum'] or 0
-        self.temporary_income = temp_incomes
-
-        refunds = Income.objects.filter(
-            year_month=self.year_month,
-            category='refund'
-        ).aggregate(models.Sum('amount'))['amount__sum'] or 0
-        self.refund = refunds
+        from .aggregation import month_totals
+        self.apply_totals(month_totals(self.year_month))
+
+    def apply_totals(self, totals):
+        """
+        集計済みの値を反映し、合計・リスクを計算（DBアクセスなし）
+        totals: MonthlyCashFlow のフィールド名をキーとする辞書
+        """
+        for field, value in totals.items():
+            setattr(self, field, value)
 
         # 収入合計
         self.total_income = (
@@ -469,47 +505,7 @@ class MonthlyCashFlow(models.Model):
             self.other_income
         )
 
-        # 固定費の集計
-        fixed_expenses = FixedExpense.objects.filter(is_active=True)
-
-        housing_loans = fixed_expenses.filter(
-            category='loan',
-            name__icontains='住宅'
-        ).aggregate(models.Sum('monthly_amount'))['monthly_amount__sum'] or 0
-        self.housing_loan = housing_loans
-
-        other_loans = fixed_expenses.filter(
-            category='loan'
-        ).exclude(name__icontains='住宅').aggregate(
-            models.Sum('monthly_amount')
-        )['monthly_amount__sum'] or 0
-        self.other_loans = other_loans
-
-        insurance_total = fixed_expenses.filter(
-            category='insurance'
-        ).aggregate(models.Sum('monthly_amount'))['monthly_amount__sum'] or 0
-        self.insurance = insurance_total
-
-        subscription_total = fixed_expenses.filter(
-            category='subscription'
-        ).aggregate(models.Sum('monthly_amount'))['monthly_amount__sum'] or 0
-        self.subscription = subscription_total
-
-        utilities_total = fixed_expenses.filter(
-            category='utility'
-        ).aggregate(models.Sum('monthly_amount'))['monthly_amount__sum'] or 0
-        self.utilities = utilities_total
-
-        communication_total = fixed_expenses.filter(
-            category='communication'
-        ).aggregate(models.Sum('monthly_amount'))['monthly_amount__sum'] or 0
-        self.communication = communication_total
-
-        rent_total = fixed_expenses.filter(
-            category='rent'
-        ).aggregate(models.Sum('monthly_amount'))['monthly_amount__sum'] or 0
-        self.rent = rent_total
-
+        # 固定費合計
         self.total_fixed_expense = (
             self.housing_loan +
             self.other_loans +
@@ -520,38 +516,7 @@ class MonthlyCashFlow(models.Model):
             self.rent
         )
 
-        # クレジットカードの集計
-        from credit.models import PaymentSchedule
-        try:
-            payment_schedule = PaymentSchedule.objects.get(year_month=self.year_month)
-            self.credit_card_payments = payment_schedule.credit_card_payments
-            self.total_credit_payment = payment_schedule.total_credit_payment
-        except PaymentSchedule.DoesNotExist:
-            self.credit_card_payments = {}
-            self.total_credit_payment = 0
-
-        # 変動費の集計
-        variable_expenses = VariableExpense.objects.filter(year_month=self.year_month)
-
-        self.food = variable_expenses.filter(category='food').aggregate(
-            models.Sum('amount'))['amount__sum'] or 0
-        self.daily_goods = variable_expenses.filter(category='daily_goods').aggregate(
-            models.Sum('amount'))['amount__sum'] or 0
-        self.clothing = variable_expenses.filter(category='clothing').aggregate(
-            models.Sum('amount'))['amount__sum'] or 0
-        self.social = variable_expenses.filter(category='social').aggregate(
-            models.Sum('amount'))['amount__sum'] or 0
-        self.transport = variable_expenses.filter(category='transport').aggregate(
-            models.Sum('amount'))['amount__sum'] or 0
-        self.medical = variable_expenses.filter(category='medical').aggregate(
-            models.Sum('amount'))['amount__sum'] or 0
-        self.education = variable_expenses.filter(category='education').aggregate(
-            models.Sum('amount'))['amount__sum'] or 0
-        self.entertainment = variable_expenses.filter(category='entertainment').aggregate(
-            models.Sum('amount'))['amount__sum'] or 0
-        self.other_variable = variable_expenses.filter(category='other').aggregate(
-            models.Sum('amount'))['amount__sum'] or 0
-
+        # 変動費合計
         self.total_variable_expense = (
             self.food +
             self.daily_goods +
@@ -612,10 +577,110 @@ class MonthlyCashFlow(models.Model):
         """
         指定月のキャッシュフローを作成/更新
         """
-        cashflow, created = cls.objects.update_or_create(
-            year_month=year_month,
-            defaults={}
-        )
-        cashflow.calculate_all()
+        cashflow = cls.objects.filter(year_month=year_month).first()
+        if cashflow is None:
+            cashflow = cls(year_month=year_month)
         cashflow.save()
         return cashflow
+
+    @classmethod
+    def recalculate_months(cls, year_months, create=True):
+        """
+        複数月のキャッシュフローを一括で作成/更新
+        集計は月数に関係なく数クエリで行い、書き込みは1トランザクションで
+        bulk_update / bulk_create する（save() は呼ばない）
+        create=False の場合は既存の月だけを更新する
+        (更新件数, 作成件数) を返す
+        """
+        from .aggregation import range_totals
+
+        totals_by_month = range_totals(year_months)
+        if not totals_by_month:
+            return 0, 0
+
+        months = sorted(totals_by_month)
+        range_start, range_end = months_bounds(months[0], months[-1])
+        existing = {
+            cashflow.year_month: cashflow
+            for cashflow in cls.objects.filter(
+                year_month__gte=range_start,
+                year_month__lt=range_end
+            )
+        }
+
+        now = timezone.now()
+        to_update = []
+        to_create = []
+        for year_month in months:
+            cashflow = existing.get(year_month)
+            if cashflow is None:
+                if not create:
+                    continue
+                cashflow = cls(year_month=year_month)
+                to_create.append(cashflow)
+            else:
+                # bulk_update では auto_now が効かないため明示的に設定
+                cashflow.updated_at = now
+                to_update.append(cashflow)
+            cashflow.apply_totals(totals_by_month[year_month])
+
+        with transaction.atomic():
+            cls.objects.bulk_update(to_update, cls.CALCULATED_FIELDS + ['updated_at'], batch_size=500)
+            cls.objects.bulk_create(to_create, batch_size=500)
+
+        return len(to_update), len(to_create)
+
+
+class CategoryRollup(models.Model):
+    """
+    月次カテゴリ別集計（マテリアライズ）
+    収入・変動費・クレカ利用明細の (集計元, 年月, カテゴリ) ごとの合計を保持する
+    明細の保存・削除時にシグナルで差分更新される（cashflow.rollup）
+    """
+    SOURCE_CHOICES = [
+        ('income', '収入'),
+        ('variable', '変動費'),
+        ('credit', 'クレカ利用'),
+    ]
+
+    source = models.CharField(
+        max_length=10,
+        choices=SOURCE_CHOICES,
+        verbose_name="集計元"
+    )
+    year_month = models.DateField(
+        verbose_name="年月",
+        help_text="対象月（YYYY-MM-01形式）。クレカ利用は利用日の月"
+    )
+    category = models.CharField(
+        max_length=20,
+        verbose_name="カテゴリ"
+    )
+    total = models.BigIntegerField(
+        verbose_name="合計金額",
+        default=0
+    )
+    count = models.IntegerField(
+        verbose_name="件数",
+        default=0
+    )
+
+    # メタデータ
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "カテゴリ別月次集計"
+        verbose_name_plural = "カテゴリ別月次集計一覧"
+        ordering = ['-year_month', 'source', 'category']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source', 'year_month', 'category'],
+                name='category_rollup_unique_key'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['year_month', 'source'], name='category_rollup_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.year_month.strftime('%Y年%m月')} {self.get_source_display()} {self.category} {self.total:,}円"
@@ -0,0 +1,340 @@
+"""
+デフォルトリスクのモンテカルロシミュレーション
+変動費・残業代等の分布を履歴から推定し、残高の推移を多数のパスで同時に
+シミュレーションして、各引落日に残高がマイナスになる確率を求める
+
+- 変動費（月合計）: 対数正規分布（VariableExpense の月次集計から推定）
+- 残業・深夜・休日手当: 0未満を切り捨てた正規分布（SalaryRecord から推定）
+- 固定費・短期ローン・クレカ引落: 引落日ごとの確定的なイベント
+- 給与は毎月 payday 日に入金、変動費は月内で日割りに発生するとみなす
+
+NumPy が必要: pip install numpy
+"""
+from calendar import monthrange
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from common.months import add_months, month_ordinal, month_start, months_bounds
+from common.optional import np, require_numpy
+
+from .forecast import DEFAULT_HISTORY_MONTHS, active_mask, date_ordinals, optional_counts
+
+
+DEFAULT_PAYDAY = 25
+DEFAULT_CHUNK_SIZE = 10000
+
+# 支払日が未設定の固定費は月初に引き落とされるとみなす
+DEFAULT_FIXED_PAYMENT_DAY = 1
+
+
+class SimulationModel:
+    """
+    シミュレーションに使うパラメータと引落イベント
+    DBに依存しないのでプロセス間で受け渡しできる
+    """
+
+    def __init__(self, months, opening_balance, base_income, variable_pay, net_ratio,
+                 variable_expense, payday, events, event_month, event_day,
+                 event_amount, month_debits):
+        self.months = months                      # 対象月の一覧
+        self.opening_balance = opening_balance    # 開始時点の残高
+        self.base_income = base_income            # 毎月の確定的な手取り収入
+        self.variable_pay = variable_pay          # 残業等手当の (平均, 標準偏差)
+        self.net_ratio = net_ratio                # 支給額に対する手取りの比率
+        self.variable_expense = variable_expense  # 変動費 log の (平均, 標準偏差)
+        self.payday = payday
+        self.events = events                      # [(年月日, 種別, 名前), ...]
+        self.event_month = event_month            # 各イベントの月インデックス (E,)
+        self.event_day = event_day                # 各イベントの日 (E,)
+        self.event_amount = event_amount          # 各イベントの引落額 (E,)
+        self.month_debits = month_debits          # 月ごとの引落合計 (M,)
+
+        # 月内の経過割合・給与入金済みか・同月内の累計引落
+        days_in_month = np.array([monthrange(m.year, m.month)[1] for m in months])
+        self.event_fraction = event_day / days_in_month[event_month]
+        self.event_after_payday = event_day >= np.minimum(payday, days_in_month[event_month])
+        cumulative = np.cumsum(event_amount)
+        month_first = np.searchsorted(event_month, event_month, side='left')
+        self.event_cumulative_debit = cumulative - (cumulative - event_amount)[month_first]
+
+    def sample(self, rng, paths):
+        """月ごとの収入・変動費を (paths, months) の配列でサンプリング"""
+        shape = (paths, len(self.months))
+        mean, std = self.variable_pay
+        pay = np.clip(rng.normal(mean, std, shape), 0, None) if std > 0 else np.full(shape, mean)
+        income = self.base_income + self.net_ratio * pay
+
+        log_mean, log_std = self.variable_expense
+        if log_mean is None:
+            variable = np.zeros(shape)
+        elif log_std > 0:
+            variable = rng.lognormal(log_mean, log_std, shape)
+        else:
+            variable = np.full(shape, np.exp(log_mean))
+        return income, variable
+
+    def simulate_chunk(self, seed, paths):
+        """
+        paths 本のパスを計算し、イベントごとに
+        (その引落後に残高がマイナスのパス数, それまでに一度でもマイナスになったパス数) を返す
+        """
+        rng = np.random.default_rng(seed)
+        income, variable = self.sample(rng, paths)
+
+        net = income - variable - self.month_debits
+        month_start_balance = self.opening_balance + np.cumsum(net, axis=1) - net
+
+        m = self.event_month
+        balance = (
+            month_start_balance[:, m] +
+            income[:, m] * self.event_after_payday -
+            variable[:, m] * self.event_fraction -
+            self.event_cumulative_debit
+        )
+        negative = balance < 0
+        ever_negative = np.logical_or.accumulate(negative, axis=1)
+        return negative.sum(axis=0), ever_negative.sum(axis=0)
+
+
+class SimulationResult:
+    """イベントごとのマイナス残高確率"""
+
+    def __init__(self, model, paths, negative, ever_negative):
+        self.model = model
+        self.paths = paths
+        self.negative_probability = negative / paths
+        self.cumulative_probability = ever_negative / paths
+
+    def rows(self):
+        for (debit_date, kind, name), amount, p, cumulative in zip(
+            self.model.events,
+            self.model.event_amount.tolist(),
+            self.negative_probability.tolist(),
+            self.cumulative_probability.tolist(),
+        ):
+            yield {
+                'date': debit_date,
+                'kind': kind,
+                'name': name,
+                'amount': amount,
+                'negative_probability': p,
+                'cumulative_probability': cumulative,
+            }
+
+
+def _simulate_chunk(args):
+    """ProcessPoolExecutor 用（モジュールレベル関数である必要がある）"""
+    model, seed, paths = args
+    return model.simulate_chunk(seed, paths)
+
+
+def simulate(model, paths, seed=None, workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    paths 本のパスをシミュレーション
+    chunk_size ごとに独立した乱数列（SeedSequence.spawn）を割り当てるので、
+    seed が同じなら workers の数によらず結果は同じになる
+    workers > 1 の場合はプロセスプールでチャンクを並列に計算する
+    """
+    require_numpy('リスクシミュレーション')
+    sizes = [chunk_size] * (paths // chunk_size)
+    if paths % chunk_size:
+        sizes.append(paths % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(model, s, n) for s, n in zip(seeds, sizes)]
+
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_simulate_chunk, tasks))
+    else:
+        results = [_simulate_chunk(task) for task in tasks]
+
+    negative = sum(r[0] for r in results)
+    ever_negative = sum(r[1] for r in results)
+    return SimulationResult(model, paths, negative, ever_negative)
+
+
+# ========================================
+# 履歴からのパラメータ推定
+# ========================================
+
+def _fit_variable_expense(start, history_months):
+    """直近の変動費月合計から対数正規分布の (平均, 標準偏差) を推定"""
+    from .models import CategoryRollup
+
+    totals = np.array(list(CategoryRollup.objects.filter(
+        source='variable',
+        year_month__gte=add_months(start, -history_months),
+        year_month__lt=start
+    ).values('year_month').annotate(total=Sum('total')).order_by().values_list('total', flat=True)),
+        dtype=float)
+    totals = totals[totals > 0]
+    if totals.size == 0:
+        return None, 0.0
+    logs = np.log(totals)
+    return float(logs.mean()), float(logs.std(ddof=1)) if logs.size > 1 else 0.0
+
+
+def _fit_salary(start, history_months):
+    """
+    直近の給与明細から (確定的な手取り, 手当の (平均, 標準偏差), 手取り比率) を推定
+    確定的な手取りは最新月の手取りから手当分を除いたもの
+    """
+    from salary.models import SalaryRecord
+
+    records = np.array(list(SalaryRecord.objects.filter(
+        year_month__gte=add_months(start, -history_months),
+        year_month__lt=start
+    ).order_by('-year_month').values_list(
+        'actual_payment', 'total_payment', 'overtime_pay', 'night_work_pay', 'holiday_work_pay'
+    )), dtype=float).reshape(-1, 5)
+    if records.shape[0] == 0:
+        return 0.0, (0.0, 0.0), 1.0
+
+    actual, total = records[:, 0], records[:, 1]
+    pay = records[:, 2:].sum(axis=1)
+    valid = total > 0
+    net_ratio = float((actual[valid] / total[valid]).mean()) if valid.any() else 1.0
+    base_income = float(actual[0] - net_ratio * pay[0])
+    std = float(pay.std(ddof=1)) if pay.size > 1 else 0.0
+    return base_income, (float(pay.mean()), std), net_ratio
+
+
+def _other_income(start, history_months):
+    """給与以外の収入（MonthlyCashFlow の収入合計 − 給与手取り）の月平均"""
+    from .models import MonthlyCashFlow
+
+    values = np.array(list(MonthlyCashFlow.objects.filter(
+        year_month__gte=add_months(start, -history_months),
+        year_month__lt=start
+    ).values_list('total_income', 'salary_net')), dtype=float).reshape(-1, 2)
+    if values.shape[0] == 0:
+        return 0.0
+    return float((values[:, 0] - values[:, 1]).mean())
+
+
+def _card_debits(start, months, history_months, ordinals):
+    """
+    カードごとの月別引落額 (カード数, 月数)
+    確定している引落予定と、過去の支払いスケジュールの平均の大きい方
+    """
+    from credit.models import CreditCard, CreditUsage, PaymentSchedule
+
+    cards = list(CreditCard.objects.filter(is_active=True).values_list('name', 'payment_date'))
+    index = {name: i for i, (name, day) in enumerate(cards)}
+    amounts = np.zeros((len(cards), months), dtype=np.int64)
+
+    baseline = np.zeros(len(cards))
+    history = list(PaymentSchedule.objects.filter(
+        year_month__gte=add_months(start, -history_months),
+        year_month__lt=start
+    ).values_list('credit_card_payments', flat=True))
+    for payments in history:
+        for name, amount in payments.items():
+            if name in index:
+                baseline[index[name]] += amount
+    if history:
+        baseline = np.rint(baseline / len(history)).astype(np.int64)
+
+    range_start, range_end = months_bounds(start, add_months(start, months - 1))
+    scheduled = CreditUsage.objects.filter(
+        credit_card__is_active=True,
+        payment_date__gte=range_start,
+        payment_date__lt=range_end,
+        is_paid=False
+    ).annotate(
+        payment_month=TruncMonth('payment_date')
+    ).values('payment_month', 'credit_card__name').annotate(
+        amount=Sum('amount')
+    ).order_by().values_list('credit_card__name', 'payment_month', 'amount')
+    for name, payment_month, amount in scheduled:
+        amounts[index[name], month_ordinal(payment_month) - ordinals[0]] = amount
+
+    amounts = np.maximum(amounts, np.asarray(baseline, dtype=np.int64)[:, None])
+    return [name for name, day in cards], np.array([day for name, day in cards], dtype=np.int64), amounts
+
+
+def fit_model(start, months, history_months=DEFAULT_HISTORY_MONTHS, payday=DEFAULT_PAYDAY,
+              opening_balance=None, today=None):
+    """
+    履歴からシミュレーションモデルを作成
+    opening_balance を省略した場合は start より前の最新の期末残高を使う
+    """
+    from credit.models import ShortTermLoan
+    from .models import FixedExpense, MonthlyCashFlow
+
+    require_numpy('リスクシミュレーション')
+    start = month_start(start)
+    base_month = month_start(today or timezone.localdate())
+    ordinals = month_ordinal(start) + np.arange(months)
+    month_dates = [date(o // 12, o % 12 + 1, 1) for o in ordinals.tolist()]
+
+    if opening_balance is None:
+        opening_balance = MonthlyCashFlow.objects.filter(
+            year_month__lt=start
+        ).order_by('-year_month').values_list('closing_balance', flat=True).first() or 0
+
+    base_income, variable_pay, net_ratio = _fit_salary(start, history_months)
+    base_income += _other_income(start, history_months)
+
+    # 引落イベント: (種別, 名前, 引落日, 月別の金額)
+    fixed = list(FixedExpense.objects.filter(is_active=True).values_list(
+        'name', 'payment_date', 'monthly_amount', 'remaining_months', 'start_date', 'end_date'
+    ))
+    loans = list(ShortTermLoan.objects.filter(is_active=True).values_list(
+        'name', 'payment_date', 'monthly_payment', 'remaining_months'
+    ))
+    fixed_columns = list(zip(*fixed)) or [()] * 6
+    loan_columns = list(zip(*loans)) or [()] * 4
+    card_names, card_days, card_amounts = _card_debits(start, months, history_months, ordinals)
+
+    fixed_amounts = np.array(fixed_columns[2], dtype=np.int64)[:, None] * active_mask(
+        ordinals, base_month, optional_counts(fixed_columns[3]),
+        date_ordinals(fixed_columns[4], -10 ** 9), date_ordinals(fixed_columns[5], 10 ** 9)
+    )
+    loan_amounts = np.array(loan_columns[2], dtype=np.int64)[:, None] * active_mask(
+        ordinals, base_month, np.array(loan_columns[3], dtype=np.int64)
+    )
+
+    kinds = ['fixed'] * len(fixed) + ['loan'] * len(loans) + ['card'] * len(card_names)
+    names = list(fixed_columns[0]) + list(loan_columns[0]) + card_names
+    days = np.concatenate([
+        np.array([d or DEFAULT_FIXED_PAYMENT_DAY for d in fixed_columns[1]], dtype=np.int64),
+        np.array(loan_columns[1], dtype=np.int64),
+        card_days,
+    ]).reshape(-1)
+    amounts = np.concatenate([
+        fixed_amounts.reshape(-1, months),
+        loan_amounts.reshape(-1, months),
+        card_amounts.reshape(-1, months),
+    ])
+
+    # (支払い先, 月) の組を、金額がある分だけ (月, 日) 順のイベント列にする
+    payer, month_index = np.nonzero(amounts)
+    days_in_month = np.array([monthrange(m.year, m.month)[1] for m in month_dates])
+    event_day = np.minimum(days[payer], days_in_month[month_index])
+    order = np.lexsort((event_day, month_index))
+    payer, month_index, event_day = payer[order], month_index[order], event_day[order]
+    event_amount = amounts[payer, month_index]
+
+    events = [
+        (month_dates[m].replace(day=int(d)), kinds[p], names[p])
+        for p, m, d in zip(payer.tolist(), month_index.tolist(), event_day.tolist())
+    ]
+    return SimulationModel(
+        months=month_dates,
+        opening_balance=opening_balance,
+        base_income=base_income,
+        variable_pay=variable_pay,
+        net_ratio=net_ratio,
+        variable_expense=_fit_variable_expense(start, history_months),
+        payday=payday,
+        events=events,
+        event_month=month_index,
+        event_day=event_day,
+        event_amount=event_amount,
+        month_debits=amounts.sum(axis=0),
+    )
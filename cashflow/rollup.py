@@ -0,0 +1,202 @@
+"""
+カテゴリ別月次集計（CategoryRollup）の更新・再構築
+明細の保存・削除時は差分だけを反映し、集計時は明細を走査しない
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from common.database import iterate
+from common.months import month_start, months_bounds
+
+from .models import CategoryRollup, Income, VariableExpense
+
+
+def rollup_sources():
+    """
+    集計元ごとの (モデル, 年月の元になる日付フィールド)
+    クレカ利用明細は利用日の月で集計する
+    """
+    from credit.models import CreditUsage
+    return {
+        'income': (Income, 'year_month'),
+        'variable': (VariableExpense, 'year_month'),
+        'credit': (CreditUsage, 'usage_date'),
+    }
+
+
+def source_for_model(model):
+    """モデルクラスから集計元の名前を取得（対象外なら None）"""
+    for source, (source_model, date_field) in rollup_sources().items():
+        if model is source_model:
+            return source
+    return None
+
+
+def rollup_key(source, year_month_or_date, category):
+    return (source, month_start(year_month_or_date), category)
+
+
+def instance_key(source, instance):
+    """明細インスタンスの集計キー"""
+    model, date_field = rollup_sources()[source]
+    return rollup_key(source, getattr(instance, date_field), instance.category)
+
+
+def apply_deltas(deltas):
+    """
+    差分を集計テーブルに反映
+    deltas: {(集計元, 年月, カテゴリ): (金額の差分, 件数の差分)}
+    """
+    now = timezone.now()
+    for (source, year_month, category), (amount, count) in deltas.items():
+        if amount == 0 and count == 0:
+            continue
+        rows = CategoryRollup.objects.filter(
+            source=source, year_month=year_month, category=category
+        )
+        if rows.update(total=F('total') + amount, count=F('count') + count, updated_at=now):
+            continue
+        try:
+            with transaction.atomic():
+                CategoryRollup.objects.create(
+                    source=source, year_month=year_month, category=category,
+                    total=amount, count=count
+                )
+        except IntegrityError:
+            # 同時に別の処理が行を作成した場合
+            rows.update(total=F('total') + amount, count=F('count') + count, updated_at=now)
+
+
+def add_instances(source, instances, sign=1):
+    """明細インスタンス群を集計に加算（sign=-1 で減算）。キーごとに1回だけ更新する"""
+    deltas = defaultdict(lambda: (0, 0))
+    for instance in instances:
+        key = instance_key(source, instance)
+        amount, count = deltas[key]
+        deltas[key] = (amount + sign * instance.amount, count + sign)
+    apply_deltas(deltas)
+
+
+def source_rows(source, pks):
+    """明細の集計に関わる列 [(日付, カテゴリ, 金額), ...] を pk で取得（1クエリ）"""
+    model, date_field = rollup_sources()[source]
+    return list(model._base_manager.filter(pk__in=pks).values_list(date_field, 'category', 'amount'))
+
+
+def apply_row_changes(source, before, after):
+    """
+    一括更新の前後の行 [(日付, カテゴリ, 金額), ...] の差分を集計に反映
+    変更のないキーは更新しない
+    """
+    deltas = defaultdict(lambda: (0, 0))
+    for rows, sign in ((before, -1), (after, 1)):
+        for date_value, category, amount in rows:
+            key = rollup_key(source, date_value, category)
+            total, count = deltas[key]
+            deltas[key] = (total + sign * amount, count + sign)
+    apply_deltas(deltas)
+
+
+# ========================================
+# 集計値の読み出し
+# ========================================
+
+def category_totals(year_month, sources):
+    """指定月のカテゴリ別合計を {集計元: {カテゴリ: 合計}} で取得（1クエリ）"""
+    totals = {source: {} for source in sources}
+    rows = CategoryRollup.objects.filter(
+        year_month=month_start(year_month),
+        source__in=sources
+    ).values_list('source', 'category', 'total')
+    for source, category, total in rows:
+        totals[source][category] = total
+    return totals
+
+
+def category_totals_by_month(start, end, sources):
+    """期間内のカテゴリ別合計を {集計元: {年月: {カテゴリ: 合計}}} で取得（1クエリ）"""
+    totals = {source: {} for source in sources}
+    range_start, range_end = months_bounds(start, end)
+    rows = CategoryRollup.objects.filter(
+        year_month__gte=range_start,
+        year_month__lt=range_end,
+        source__in=sources
+    ).values_list('source', 'year_month', 'category', 'total')
+    for source, year_month, category, total in rows:
+        totals[source].setdefault(year_month, {})[category] = total
+    return totals
+
+
+# ========================================
+# 全件再構築・検証
+# ========================================
+
+def compute_from_details(sources=None):
+    """
+    明細から集計値を計算（集計元ごとに1クエリ）
+    {(集計元, 年月, カテゴリ): (合計, 件数)} を返す
+    """
+    expected = {}
+    for source, (model, date_field) in rollup_sources().items():
+        if sources is not None and source not in sources:
+            continue
+        rows = model.objects.annotate(
+            rollup_month=TruncMonth(date_field)
+        ).values('rollup_month', 'category').annotate(
+            total=Sum('amount'),
+            count=Count('pk')
+        ).order_by()
+        for row in iterate(rows):
+            key = (source, row['rollup_month'], row['category'])
+            expected[key] = (row['total'], row['count'])
+    return expected
+
+
+def stored_rollups(sources=None):
+    """集計テーブルの内容を {(集計元, 年月, カテゴリ): (合計, 件数)} で取得"""
+    rows = CategoryRollup.objects.all()
+    if sources is not None:
+        rows = rows.filter(source__in=sources)
+    return {
+        (source, year_month, category): (total, count)
+        for source, year_month, category, total, count in iterate(rows.values_list(
+            'source', 'year_month', 'category', 'total', 'count'
+        ))
+        if count != 0 or total != 0
+    }
+
+
+def verify(sources=None):
+    """
+    集計テーブルと明細の突き合わせ
+    不一致を [(キー, 集計テーブルの値, 明細からの値), ...] で返す
+    """
+    expected = compute_from_details(sources)
+    stored = stored_rollups(sources)
+    mismatches = []
+    for key in sorted(set(expected) | set(stored)):
+        if expected.get(key) != stored.get(key):
+            mismatches.append((key, stored.get(key), expected.get(key)))
+    return mismatches
+
+
+def rebuild(sources=None):
+    """明細から集計テーブルを作り直す。作成した行数を返す"""
+    expected = compute_from_details(sources)
+    with transaction.atomic():
+        rows = CategoryRollup.objects.all()
+        if sources is not None:
+            rows = rows.filter(source__in=sources)
+        rows.delete()
+        CategoryRollup.objects.bulk_create([
+            CategoryRollup(
+                source=source, year_month=year_month, category=category,
+                total=total, count=count
+            )
+            for (source, year_month, category), (total, count) in expected.items()
+        ], batch_size=1000)
+    return len(expected)
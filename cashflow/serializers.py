@@ -0,0 +1,33 @@
+from rest_framework import serializers
+
+from .models import FixedExpense, Income, MonthlyCashFlow, VariableExpense
+
+
+class FixedExpenseSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = FixedExpense
+        fields = '__all__'
+
+
+class IncomeSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Income
+        fields = '__all__'
+
+
+class VariableExpenseSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = VariableExpense
+        fields = '__all__'
+
+
+class MonthlyCashFlowSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = MonthlyCashFlow
+        fields = '__all__'
+        # save() 時に calculate_all() で計算される
+        read_only_fields = MonthlyCashFlow.CALCULATED_FIELDS
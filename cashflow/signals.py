@@ -0,0 +1,43 @@
+"""
+明細の変更をカテゴリ別月次集計（CategoryRollup）へ反映するシグナルハンドラ
+CashflowConfig.ready() から connect() で対象モデルにだけ接続する
+update() / bulk_update() は models.RollupQuerySet が反映する
+"""
+from django.db.models.signals import post_delete, post_save
+
+from common.signals import post_bulk_create, track_previous
+
+from . import rollup
+
+
+def update_rollup_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    source = rollup.source_for_model(sender)
+    deltas = {rollup.instance_key(source, instance): (instance.amount, 1)}
+    # 更新前の行（common.signals.track_previous で控えたもの）の分を差し引く
+    previous = getattr(instance, '_previous_row', None)
+    if previous is not None:
+        model, date_field = rollup.rollup_sources()[source]
+        key = rollup.rollup_key(source, previous[date_field], previous['category'])
+        new_amount, new_count = deltas.get(key, (0, 0))
+        deltas[key] = (new_amount - previous['amount'], new_count - 1)
+    rollup.apply_deltas(deltas)
+
+
+def update_rollup_on_delete(sender, instance, **kwargs):
+    rollup.add_instances(rollup.source_for_model(sender), [instance], sign=-1)
+
+
+def update_rollup_on_bulk_create(sender, objs, **kwargs):
+    rollup.add_instances(rollup.source_for_model(sender), objs)
+
+
+def connect():
+    """集計対象のモデルにシグナルハンドラを接続"""
+    for source, (model, date_field) in rollup.rollup_sources().items():
+        uid = f'cashflow_rollup_{source}'
+        track_previous(model, [date_field, 'category', 'amount'])
+        post_save.connect(update_rollup_on_save, sender=model, dispatch_uid=uid)
+        post_delete.connect(update_rollup_on_delete, sender=model, dispatch_uid=uid)
+        post_bulk_create.connect(update_rollup_on_bulk_create, sender=model, dispatch_uid=uid)
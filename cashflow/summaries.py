@@ -0,0 +1,94 @@
+"""
+月次サマリー（月次キャッシュフロー＋支払いスケジュール）の条件付きGET
+ETag / Last-Modified は各テーブルの対象期間の行の件数と最大 updated_at から作る（1クエリ）
+描画済みのJSONは ETag をキーにキャッシュし、変更がなければシリアライザを通さない
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import CharField, Count, Max, Value
+from rest_framework.renderers import JSONRenderer
+
+from common.months import iter_months, months_bounds
+
+from .models import Income, MonthlyCashFlow, VariableExpense
+
+
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def dependent_querysets(start, end):
+    """
+    サマリーの内容に関係する行（名前: クエリセット）
+    明細の変更は dirty month の再計算でサマリーの行の updated_at に反映されるが、
+    再計算前の変更も検出できるよう明細も含める
+    """
+    from credit.models import CreditUsage, PaymentSchedule
+
+    range_start, range_end = months_bounds(start, end)
+    by_month = {'year_month__gte': range_start, 'year_month__lt': range_end}
+    return {
+        'cashflow': MonthlyCashFlow.objects.filter(**by_month),
+        'schedule': PaymentSchedule.objects.filter(**by_month),
+        'income': Income.objects.filter(**by_month),
+        'variable': VariableExpense.objects.filter(**by_month),
+        'credit': CreditUsage.objects.filter(payment_date__gte=range_start, payment_date__lt=range_end),
+    }
+
+
+def summary_version(start, end):
+    """
+    (ETag, 最終更新日時) を返す（UNION ALL で1クエリ）
+    行の削除も検出できるよう、最大 updated_at に加えて件数も ETag に含める
+    """
+    querysets = [
+        queryset.order_by().annotate(
+            table=Value(name, output_field=CharField())
+        ).values('table').annotate(
+            updated=Max('updated_at'), count=Count('pk')
+        ).values_list('table', 'updated', 'count')
+        for name, queryset in dependent_querysets(start, end).items()
+    ]
+    rows = sorted(querysets[0].union(*querysets[1:], all=True))
+
+    key = f"{start:%Y-%m}:{end:%Y-%m}:" + '|'.join(
+        f"{table}:{count}:{updated.isoformat() if updated else ''}" for table, updated, count in rows
+    )
+    last_modified = max((updated for table, updated, count in rows if updated), default=None)
+    return hashlib.sha1(key.encode()).hexdigest(), last_modified
+
+
+def build_summary(start, end):
+    """期間内の各月の月次キャッシュフローと支払いスケジュール（2クエリ）"""
+    from credit.models import PaymentSchedule
+    from credit.serializers import PaymentScheduleSerializer
+    from .serializers import MonthlyCashFlowSerializer
+
+    range_start, range_end = months_bounds(start, end)
+    cashflows = {
+        cashflow.year_month: cashflow
+        for cashflow in MonthlyCashFlow.objects.filter(year_month__gte=range_start, year_month__lt=range_end)
+    }
+    schedules = {
+        schedule.year_month: schedule
+        for schedule in PaymentSchedule.objects.filter(year_month__gte=range_start, year_month__lt=range_end)
+    }
+    months = []
+    for year_month in iter_months(start, end):
+        cashflow, schedule = cashflows.get(year_month), schedules.get(year_month)
+        months.append({
+            'year_month': year_month,
+            'cashflow': MonthlyCashFlowSerializer(cashflow).data if cashflow else None,
+            'payment_schedule': PaymentScheduleSerializer(schedule).data if schedule else None,
+        })
+    return {'start': start, 'end': end, 'months': months}
+
+
+def rendered_summary(start, end, etag):
+    """描画済みのJSON（ETag ごとにキャッシュ）"""
+    key = f'cashflow:summary:{etag}'
+    content = cache.get(key)
+    if content is None:
+        content = JSONRenderer().render(build_summary(start, end))
+        cache.set(key, content, CACHE_TIMEOUT)
+    return content
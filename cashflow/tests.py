@@ -1,3 +1,325 @@
-from django.test import TestCase
+import time
+from datetime import date
+from io import StringIO
+from unittest import mock, skipIf
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from common.concurrency import gather_queries
+from common.months import iter_months
+from common.signals import post_bulk_create
+from common.testing import capture_query_plans, full_table_scans, query_budget, requires_sqlite
+from credit.models import CreditCard, CreditUsage, PaymentSchedule
+from salary.models import SalaryRecord
+from . import forecast, montecarlo, rollup, summaries
+from .models import FixedExpense, Income, MonthlyCashFlow, VariableExpense
+
+
+class MonthlyCashFlowQueryPlanTests(TestCase):
+    """月次集計クエリがインデックスを使うことを確認"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Income.objects.bulk_create([
+            Income(year_month=date(2025, month, 1), category='side_business', amount=10000)
+            for month in range(1, 13)
+        ])
+        VariableExpense.objects.bulk_create([
+            VariableExpense(year_month=date(2025, month, 1), category=category, amount=3000)
+            for month in range(1, 13)
+            for category in ('food', 'daily_goods', 'other')
+        ])
+
+    @requires_sqlite
+    def test_calculate_all(self):
+        plans = capture_query_plans(MonthlyCashFlow(year_month=date(2025, 6, 1)).calculate_all)
+        tables = {'cashflow_income', 'cashflow_variableexpense', 'cashflow_categoryrollup'}
+        scans = full_table_scans(plans, tables)
+        self.assertEqual(scans, [], '収入・変動費の集計がフルスキャンになっています')
+
+    def test_calculate_all_query_budget(self):
+        with query_budget(4, allow_duplicates=False):
+            MonthlyCashFlow(year_month=date(2025, 6, 1)).calculate_all()
+
+
+class RecalculateMonthsTests(TestCase):
+    """期間の一括再計算が月ごとの calculate_all() と同じ結果になり、月数に関係なく同じクエリ数で済むことを確認"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.months = list(iter_months(date(2025, 1, 1), date(2025, 12, 1)))
+        FixedExpense.objects.create(name='住宅ローン', category='housing_loan', monthly_amount=80000)
+        FixedExpense.objects.create(name='Netflix', category='subscription', monthly_amount=1490)
+        card = CreditCard.objects.create(name='テストカード', closing_date=15, payment_date=10)
+        for month in cls.months[::2]:
+            SalaryRecord.objects.create(year_month=month, base_salary=300000 + month.month * 1000)
+        for month in cls.months:
+            Income.objects.create(year_month=month, category='side_business', amount=month.month * 500)
+            VariableExpense.objects.create(year_month=month, category='food', amount=30000 + month.month)
+        for month in cls.months:
+            CreditUsage.objects.create(credit_card=card, usage_date=date(2025, month.month, 5), amount=month.month * 1000)
+        PaymentSchedule.recalculate_months(cls.months)
+
+    def calculated(self, cashflow):
+        return {field: getattr(cashflow, field) for field in MonthlyCashFlow.CALCULATED_FIELDS}
+
+    def test_matches_calculate_all(self):
+        self.assertEqual(MonthlyCashFlow.recalculate_months(self.months), (0, 12))
+        for stored in MonthlyCashFlow.objects.order_by('year_month'):
+            expected = MonthlyCashFlow(year_month=stored.year_month)
+            expected.calculate_all()
+            self.assertEqual(self.calculated(stored), self.calculated(expected), stored.year_month)
+        self.assertEqual(
+            MonthlyCashFlow.objects.get(year_month=date(2025, 3, 1)).credit_card_payments, {'テストカード': 2000}
+        )
+
+    def test_create_flag(self):
+        MonthlyCashFlow.recalculate_months(self.months[:6])
+        self.assertEqual(MonthlyCashFlow.recalculate_months(self.months, create=False), (6, 0))
+        self.assertEqual(MonthlyCashFlow.objects.count(), 6)
+        self.assertEqual(MonthlyCashFlow.recalculate_months(self.months), (6, 6))
+
+    def test_query_count_does_not_depend_on_months(self):
+        MonthlyCashFlow.recalculate_months(self.months)
+        counts = []
+        for months in (self.months[:2], self.months):
+            with CaptureQueriesContext(connection) as context:
+                MonthlyCashFlow.recalculate_months(months)
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_command(self):
+        PaymentSchedule.objects.all().delete()
+        out = StringIO()
+        call_command('recalc-cashflow', '--from', '2025-01', '--to', '2025-03', '--with-schedules', stdout=out)
+        self.assertIn('支払いスケジュールを再計算しました（更新: 0件、作成: 3件）', out.getvalue())
+        self.assertIn('2025-01 〜 2025-03（3ヶ月）を再計算しました（更新: 0件、作成: 3件）', out.getvalue())
+        self.assertEqual(
+            MonthlyCashFlow.objects.get(year_month=date(2025, 2, 1)).total_credit_payment, 1000
+        )
+
+
+class CategoryRollupTests(TestCase):
+    """カテゴリ別月次集計が明細の変更に追従することを確認"""
+
+    def test_save_update_delete(self):
+        expense = VariableExpense.objects.create(year_month=date(2025, 1, 1), category='food', amount=3000)
+        VariableExpense.objects.create(year_month=date(2025, 1, 1), category='food', amount=2000)
+        expense.category = 'social'
+        expense.year_month = date(2025, 2, 1)
+        expense.save()
+        Income.objects.create(year_month=date(2025, 1, 1), category='refund', amount=700)
+        Income.objects.filter(category='refund').delete()
+
+        self.assertEqual(rollup.verify(), [])
+        cashflow = MonthlyCashFlow(year_month=date(2025, 1, 1))
+        cashflow.calculate_all()
+        self.assertEqual(cashflow.food, 2000)
+        self.assertEqual(cashflow.refund, 0)
+
+    def test_update_and_bulk_update(self):
+        Income.objects.create(year_month=date(2025, 1, 1), category='refund', amount=700)
+        Income.objects.create(year_month=date(2025, 1, 1), category='bonus', amount=300)
+        expenses = [
+            VariableExpense.objects.create(year_month=date(2025, 1, 1), category='food', amount=1000 * i)
+            for i in range(1, 4)
+        ]
+        Income.objects.update(amount=7)
+        Income.objects.filter(category='bonus').update(year_month=date(2025, 2, 1))
+        for expense in expenses:
+            expense.category = 'social'
+            expense.amount += 1
+        VariableExpense.objects.bulk_update(expenses[:2], ['category', 'amount'])
+        VariableExpense.objects.bulk_update(expenses, ['memo'])
+
+        self.assertEqual(rollup.verify(), [])
+        totals = rollup.category_totals_by_month(date(2025, 1, 1), date(2025, 2, 1), ['income', 'variable'])
+        self.assertEqual(totals['income'][date(2025, 1, 1)]['refund'], 7)
+        self.assertEqual(totals['income'][date(2025, 2, 1)], {'bonus': 7})
+        self.assertEqual(totals['variable'][date(2025, 1, 1)], {'food': 3000, 'social': 3002})
+
+    def test_bulk_create(self):
+        card = CreditCard.objects.create(name='テストカード', closing_date=15, payment_date=10)
+        usages = CreditUsage.objects.bulk_create([
+            CreditUsage(credit_card=card, usage_date=date(2025, 1, day), amount=1000)
+            for day in range(1, 11)
+        ])
+        post_bulk_create.send(sender=CreditUsage, objs=usages)
+
+        self.assertEqual(rollup.verify(), [])
+        self.assertEqual(rollup.stored_rollups(), {('credit', date(2025, 1, 1), 'other'): (10000, 10)})
+
+
+class DirtyMonthTests(TestCase):
+    """明細の変更で影響する月だけが再計算されることを確認"""
+
+    def setUp(self):
+        MonthlyCashFlow.recalculate_months([date(2025, 1, 1), date(2025, 2, 1)])
+
+    def test_recalculates_affected_month_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            VariableExpense.objects.create(year_month=date(2025, 1, 1), category='food', amount=3000)
+            VariableExpense.objects.create(year_month=date(2025, 1, 1), category='food', amount=2000)
+
+        self.assertEqual(MonthlyCashFlow.objects.get(year_month=date(2025, 1, 1)).food, 5000)
+        self.assertEqual(MonthlyCashFlow.objects.get(year_month=date(2025, 2, 1)).food, 0)
+
+    def test_month_change_recalculates_both_months(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            expense = VariableExpense.objects.create(year_month=date(2025, 1, 1), category='food', amount=3000)
+        with self.captureOnCommitCallbacks(execute=True):
+            expense.year_month = date(2025, 2, 1)
+            expense.save()
+
+        self.assertEqual(MonthlyCashFlow.objects.get(year_month=date(2025, 1, 1)).food, 0)
+        self.assertEqual(MonthlyCashFlow.objects.get(year_month=date(2025, 2, 1)).food, 3000)
+
+    def test_reads_previous_row_once(self):
+        card = CreditCard.objects.create(name='テストカード', closing_date=15, payment_date=10)
+        usage = CreditUsage.objects.create(credit_card=card, usage_date=date(2025, 1, 5), amount=1000)
+        PaymentSchedule.recalculate_months([date(2025, 2, 1), date(2025, 3, 1)])
+
+        usage.usage_date = date(2025, 2, 5)
+        usage.payment_date = date(2025, 3, 10)
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as context:
+                usage.save()
+        # 集計（CategoryRollup）と dirty month の両方が使う更新前の行は1回だけ読む
+        selects = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT') and 'FROM "credit_creditusage"' in query['sql']
+        ]
+        self.assertEqual(len(selects), 1, selects)
+
+        self.assertEqual(rollup.verify(), [])
+        self.assertEqual(PaymentSchedule.objects.get(year_month=date(2025, 2, 1)).total_credit_payment, 0)
+        self.assertEqual(PaymentSchedule.objects.get(year_month=date(2025, 3, 1)).total_credit_payment, 1000)
+
+    def test_does_not_create_missing_months(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            VariableExpense.objects.create(year_month=date(2025, 3, 1), category='food', amount=3000)
+
+        self.assertFalse(MonthlyCashFlow.objects.filter(year_month=date(2025, 3, 1)).exists())
+
+
+@skipIf(forecast.np is None, 'NumPy が必要です')
+class ForecastTests(TestCase):
+    """固定費の残回数・終了日が予測に反映されることを確認"""
+
+    def test_project(self):
+        MonthlyCashFlow.objects.create(year_month=date(2025, 3, 1), closing_balance=100000)
+        FixedExpense.objects.create(name='車ローン', category='loan', monthly_amount=10000, remaining_months=2)
+        FixedExpense.objects.create(name='家賃', category='rent', monthly_amount=50000, end_date=date(2025, 5, 31))
+
+        result = forecast.forecast(date(2025, 4, 1), 4, today=date(2025, 4, 1))
+
+        self.assertEqual(result.fixed_expense.tolist(), [60000, 60000, 0, 0])
+        self.assertEqual(result.balance.tolist(), [40000, -20000, -20000, -20000])
+        self.assertEqual(result.first_negative_month(), date(2025, 5, 1))
+
+
+@skipIf(forecast.np is None, 'NumPy が必要です')
+class MonteCarloTests(TestCase):
+    """引落日ごとのマイナス残高確率を確認"""
+
+    def setUp(self):
+        MonthlyCashFlow.objects.create(year_month=date(2025, 3, 1), closing_balance=100000)
+        FixedExpense.objects.create(
+            name='家賃', category='rent', monthly_amount=60000, payment_date=27, end_date=date(2025, 5, 31)
+        )
+
+    def test_fixed_expenses_only(self):
+        model = montecarlo.fit_model(date(2025, 4, 1), 3, today=date(2025, 4, 1))
+        result = montecarlo.simulate(model, 100, seed=1)
+
+        self.assertEqual([row['date'] for row in result.rows()], [date(2025, 4, 27), date(2025, 5, 27)])
+        self.assertEqual(result.negative_probability.tolist(), [0.0, 1.0])
+        self.assertEqual(result.cumulative_probability.tolist(), [0.0, 1.0])
+
+    def test_seed_is_reproducible_across_chunks(self):
+        for month in (1, 2, 3):
+            VariableExpense.objects.create(year_month=date(2025, month, 1), category='food', amount=month * 20000)
+        model = montecarlo.fit_model(date(2025, 4, 1), 3, today=date(2025, 4, 1))
+
+        first = montecarlo.simulate(model, 1000, seed=7, chunk_size=300)
+        second = montecarlo.simulate(model, 1000, seed=7, chunk_size=300)
+        self.assertEqual(first.negative_probability.tolist(), second.negative_probability.tolist())
+        self.assertTrue(0 < first.cumulative_probability[0] < 1)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class MonthlySummaryTests(TestCase):
+    """月次サマリーが ETag で 304 を返し、描画済みのJSONを再利用することを確認"""
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('api', password='api'))
+        MonthlyCashFlow.objects.create(year_month=date(2025, 1, 1), closing_balance=300000)
+
+    def test_not_modified(self):
+        url = '/api/monthly-summaries/?from=2025-01&to=2025-02'
+        with mock.patch.object(summaries, 'build_summary', wraps=summaries.build_summary) as build:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['months'][0]['cashflow']['closing_balance'], 300000)
+            self.assertIsNone(response.json()['months'][1]['cashflow'])
+            etag = response['ETag']
+            self.assertIn('Last-Modified', response)
+
+            with self.assertNumQueries(3):  # セッション・ユーザー・版
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(build.call_count, 1)
+
+            Income.objects.create(year_month=date(2025, 2, 1), category='refund', amount=1000)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_single_month_and_invalid(self):
+        response = self.client.get('/api/monthly-summaries/2025-01/')
+        self.assertEqual(len(response.json()['months']), 1)
+        self.assertEqual(self.client.get('/api/monthly-summaries/2025-13/').status_code, 400)
+
+
+class DashboardTests(TransactionTestCase):
+    """ダッシュボードの集計が別スレッド（別接続）で同時に実行されることを確認"""
+
+    def test_queries_run_concurrently(self):
+        def slow(value):
+            time.sleep(0.2)
+            return value
+
+        started = time.monotonic()
+        results = async_to_sync(gather_queries)(a=lambda: slow(1), b=lambda: slow(2), c=lambda: slow(3))
+        self.assertEqual(results, {'a': 1, 'b': 2, 'c': 3})
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_dashboards(self):
+        self.client.force_login(User.objects.create_user('api', password='api'))
+        VariableExpense.objects.create(year_month=date(2025, 1, 1), category='food', amount=3000)
+        FixedExpense.objects.create(name='住宅ローン', category='loan', monthly_amount=80000)
+        card = CreditCard.objects.create(name='テストカード', closing_date=15, payment_date=10, credit_limit=300000)
+        CreditUsage.objects.create(credit_card=card, usage_date=date(2025, 1, 5), amount=1200)
+
+        data = self.client.get('/api/dashboards/cashflow/2025-01/').json()
+        self.assertEqual(data['year_month'], '2025-01-01')
+        self.assertEqual(data['variable_expense'], {'food': 3000})
+        self.assertEqual(data['fixed_expense']['housing_loan'], 80000)
+        self.assertIsNone(data['salary'])
+
+        data = self.client.get('/api/dashboards/credit/2025-01/').json()
+        self.assertEqual(data['usage_by_card'], [{'credit_card__name': 'テストカード', 'total': 1200, 'count': 1}])
+        self.assertEqual(data['cards'][0]['unpaid'], 1200)
+
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/dashboards/credit/').status_code, 403)
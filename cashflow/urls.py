@@ -0,0 +1,18 @@
+from django.urls import path
+from rest_framework.routers import SimpleRouter
+
+from . import views
+
+
+router = SimpleRouter()
+router.register('fixed-expenses', views.FixedExpenseViewSet)
+router.register('incomes', views.IncomeViewSet)
+router.register('variable-expenses', views.VariableExpenseViewSet)
+router.register('monthly-cashflows', views.MonthlyCashFlowViewSet)
+
+urlpatterns = router.urls + [
+    path('dashboards/cashflow/', views.dashboard, name='cashflow-dashboard'),
+    path('dashboards/cashflow/<str:year_month>/', views.dashboard, name='cashflow-dashboard-month'),
+    path('monthly-summaries/', views.monthly_summary, name='monthly-summary-range'),
+    path('monthly-summaries/<str:year_month>/', views.monthly_summary, name='monthly-summary'),
+]
@@ -1,3 +1,95 @@
-from django.shortcuts import render
+from django.http import HttpResponse
+from django.utils import timezone
+from django.views.decorators.http import condition
+from rest_framework import viewsets
+from rest_framework.decorators import api_view
+from rest_framework.exceptions import ValidationError
 
-# Create your views here.
+from common.api import SparseFieldsetMixin, cursor_pagination
+from common.concurrency import dashboard_response
+from common.months import add_months, month_start, parse_year_month
+from . import dashboard as dashboard_queries, summaries
+from .models import FixedExpense, Income, MonthlyCashFlow, VariableExpense
+from .serializers import (
+    FixedExpenseSerializer, IncomeSerializer, MonthlyCashFlowSerializer, VariableExpenseSerializer,
+)
+
+
+class FixedExpenseViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
+    """固定費"""
+    queryset = FixedExpense.objects.all()
+    serializer_class = FixedExpenseSerializer
+    pagination_class = cursor_pagination('id')
+
+
+class IncomeViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
+    """収入"""
+    queryset = Income.objects.all()
+    serializer_class = IncomeSerializer
+    pagination_class = cursor_pagination('-year_month', '-id')
+
+
+class VariableExpenseViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
+    """変動費"""
+    queryset = VariableExpense.objects.all()
+    serializer_class = VariableExpenseSerializer
+    pagination_class = cursor_pagination('-year_month', '-id')
+
+
+class MonthlyCashFlowViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
+    """月次キャッシュフロー"""
+    queryset = MonthlyCashFlow.objects.all()
+    serializer_class = MonthlyCashFlowSerializer
+    pagination_class = cursor_pagination('-year_month')
+
+
+# 月次サマリーで一度に取得できる最大の月数
+SUMMARY_MAX_MONTHS = 120
+
+
+def _summary_range(request, year_month=None):
+    """URLの年月、または ?from=YYYY-MM&to=YYYY-MM（省略時は当月までの12ヶ月）"""
+    try:
+        if year_month is not None:
+            start = end = parse_year_month(year_month)
+        else:
+            params = request.query_params
+            end = parse_year_month(params['to']) if 'to' in params else month_start(timezone.localdate())
+            start = parse_year_month(params['from']) if 'from' in params else add_months(end, -11)
+    except ValueError as e:
+        raise ValidationError(str(e))
+    if start > end or add_months(start, SUMMARY_MAX_MONTHS) <= end:
+        raise ValidationError(f"期間は1～{SUMMARY_MAX_MONTHS}ヶ月で指定してください")
+    return start, end
+
+
+def _summary_version(request, year_month=None):
+    """ETag と最終更新日時（リクエストごとに1回だけ計算）"""
+    if not hasattr(request, '_summary_version'):
+        start, end = _summary_range(request, year_month)
+        request._summary_version = (start, end, *summaries.summary_version(start, end))
+    return request._summary_version
+
+
+def _summary_etag(request, year_month=None):
+    return _summary_version(request, year_month)[2]
+
+
+def _summary_last_modified(request, year_month=None):
+    return _summary_version(request, year_month)[3]
+
+
+@api_view(['GET'])
+@condition(etag_func=_summary_etag, last_modified_func=_summary_last_modified)
+def monthly_summary(request, year_month=None):
+    """
+    月次サマリー（月次キャッシュフロー＋支払いスケジュール）
+    If-None-Match / If-Modified-Since が一致すれば 304 を返し、シリアライザもキャッシュも使わない
+    """
+    start, end, etag, last_modified = _summary_version(request, year_month)
+    return HttpResponse(summaries.rendered_summary(start, end, etag), content_type='application/json')
+
+
+async def dashboard(request, year_month=None):
+    """キャッシュフローダッシュボード（ASGI で動かすと各集計が同時に実行される）"""
+    return await dashboard_response(request, dashboard_queries.queries, year_month)
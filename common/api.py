@@ -0,0 +1,110 @@
+"""
+REST API 共通部品
+- カーソル方式のページネーション（OFFSET を使わないため、古いページでも読み込み量が増えない）
+- ?fields= による返す項目の絞り込み（SELECT する列も絞る）
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+
+
+class DefaultCursorPagination(CursorPagination):
+    """既定のカーソルページネーション。モデルごとに ordering を上書きする"""
+    ordering = '-id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+def cursor_pagination(*ordering):
+    """ordering を指定したカーソルページネーションのクラスを作る"""
+    return type('CursorPagination', (DefaultCursorPagination,), {'ordering': ordering})
+
+
+class SparseFieldsetMixin:
+    """
+    ?fields=year_month,actual_payment で返す項目を絞る ViewSet 用の Mixin
+    GET のときはシリアライザの項目を削り、クエリも only() で必要な列だけ読み込む
+    """
+    fields_query_param = 'fields'
+
+    def sparse_fields(self):
+        """指定された項目名の集合（指定がなければ None）。存在しない項目は 400"""
+        if self.request is None or self.request.method != 'GET':
+            return None
+        value = self.request.query_params.get(self.fields_query_param)
+        if not value:
+            return None
+        if not hasattr(self, '_sparse_fields'):
+            fields = {name.strip() for name in value.split(',') if name.strip()}
+            unknown = fields - set(self.get_serializer_class()().fields)
+            if unknown:
+                raise ValidationError({
+                    self.fields_query_param: f"存在しない項目です: {', '.join(sorted(unknown))}"
+                })
+            self._sparse_fields = fields
+        return self._sparse_fields
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = self.sparse_fields()
+        if fields is not None:
+            target = getattr(serializer, 'child', serializer)
+            for name in set(target.fields) - fields:
+                target.fields.pop(name)
+        return serializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.sparse_fields()
+        if fields is None:
+            return queryset
+        return self.only_sparse_fields(queryset, fields)
+
+    def only_sparse_fields(self, queryset, fields):
+        """
+        返す項目の元になる列とページネーションの並び順の列だけを読み込む
+        モデルの列に対応しない項目（メソッド等）がある場合は絞らない
+        """
+        serializer_fields = self.get_serializer_class()().fields
+        columns = set()
+        for name in fields:
+            source = serializer_fields[name].source
+            if source == '*':
+                return queryset
+            column = source.replace('.', '__')
+            try:
+                queryset.model._meta.get_field(column.split('__')[0])
+            except FieldDoesNotExist:
+                return queryset
+            columns.add(column)
+        ordering = getattr(self.pagination_class, 'ordering', ())
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        columns |= {field.lstrip('-') for field in ordering}
+        return self.only_select_related(queryset, columns).only(*columns)
+
+    @staticmethod
+    def only_select_related(queryset, columns):
+        """
+        select_related のうち、読み込む列が参照しないものを外す
+        （only() で外部キーを読まないまま select_related すると FieldError になる）
+        """
+        select_related = queryset.query.select_related
+        if not select_related:
+            return queryset
+        relations = {column.split('__')[0] for column in columns if '__' in column}
+        if select_related is True:
+            return queryset if relations else queryset.select_related(None)
+        paths = [path for path in _related_paths(select_related) if path.split('__')[0] in relations]
+        queryset = queryset.select_related(None)
+        return queryset.select_related(*paths) if paths else queryset
+
+
+def _related_paths(tree, prefix=''):
+    """query.select_related の入れ子の辞書を 'a__b' 形式のパスの一覧にする"""
+    paths = []
+    for name, children in tree.items():
+        path = f'{prefix}{name}'
+        paths.extend(_related_paths(children, f'{path}__') if children else [path])
+    return paths
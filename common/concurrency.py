@@ -0,0 +1,54 @@
+"""
+非同期ビューから複数のクエリを同時に実行する
+Django の非同期ORM（aget / aaggregate など）は内部で thread_sensitive=True の sync_to_async を使うため、
+asyncio.gather しても1つのスレッドで順番に実行される
+ここではクエリごとに別スレッド（別のDB接続）で実行し、応答時間を最も遅いクエリに近づける
+ダッシュボード（cashflow.dashboard / credit.dashboard）の集計関数は、それぞれ1クエリになるようにしてある
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.utils import timezone
+
+from .months import month_start, parse_year_month
+
+
+def _in_worker(func):
+    """ワーカースレッドで実行し、終了時にそのスレッドの古い接続を閉じる（CONN_MAX_AGE に従う）"""
+    def run():
+        try:
+            return func()
+        finally:
+            close_old_connections()
+    return run
+
+
+async def gather_queries(**queries):
+    """
+    引数なしの関数を同時に実行し、{名前: 結果} を返す
+    例: await gather_queries(salary=lambda: ..., income=lambda: ...)
+    """
+    results = await asyncio.gather(*(
+        sync_to_async(_in_worker(func), thread_sensitive=False)()
+        for func in queries.values()
+    ))
+    return dict(zip(queries, results))
+
+
+async def dashboard_response(request, build_queries, year_month=None):
+    """
+    ダッシュボード用の非同期ビューの本体
+    build_queries(年月) が返す関数をすべて同時に実行し、結果をJSONで返す
+    year_month を省略した場合は当月
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'detail': '認証が必要です'}, status=403)
+    try:
+        month = parse_year_month(year_month) if year_month else month_start(timezone.localdate())
+    except ValueError as e:
+        return JsonResponse({'detail': str(e)}, status=400)
+    results = await gather_queries(**build_queries(month))
+    return JsonResponse({'year_month': month, **results})
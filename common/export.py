@@ -0,0 +1,198 @@
+"""
+履歴のエクスポート（CSV / Parquet / Arrow）
+values_list() の行をタプルのまま iterate() で読み、モデルのインスタンスを作らない
+出力は bytes のチャンクを返すジェネレータで、コマンドはファイルに、APIは StreamingHttpResponse で書き出す
+（どちらも ITERATOR_CHUNK_SIZE 行ずつ書き出すため、件数に関係なくメモリ使用量が一定）
+
+Parquet / Arrow は pyarrow が必要: pip install pyarrow
+ITERATOR_CHUNK_SIZE 行ごとに Parquet は1つの row group、Arrow は1つの record batch になる
+"""
+import csv
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.db import models
+
+from .database import iterate
+from .months import month_bounds
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = pq = None
+
+
+# 形式: (Content-Type, 拡張子, pyarrow が必要か)
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv', False),
+    'parquet': ('application/vnd.apache.parquet', 'parquet', True),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows', True),
+}
+
+
+def export_sources():
+    """データセット名: (モデル, 期間の絞り込みに使う日付フィールド)"""
+    from cashflow.models import MonthlyCashFlow
+    from credit.models import CreditUsage
+    from salary.models import SalaryRecord
+    return {
+        'credit-usages': (CreditUsage, 'usage_date'),
+        'monthly-cashflows': (MonthlyCashFlow, 'year_month'),
+        'salary-records': (SalaryRecord, 'year_month'),
+    }
+
+
+def require_pyarrow(file_format):
+    if FORMATS[file_format][2] and pa is None:
+        raise ImportError(f"{file_format} 形式の出力には pyarrow が必要です: pip install pyarrow")
+
+
+def columns(model):
+    """
+    出力する列 [(列名, values_list の参照, フィールド), ...]
+    外部キーは参照先の名前（name）を出力する
+    """
+    result = []
+    for field in model._meta.concrete_fields:
+        if field.is_relation:
+            target = field.related_model._meta.get_field('name')
+            result.append((field.name, f'{field.name}__name', target))
+        else:
+            result.append((field.name, field.name, field))
+    return result
+
+
+def export_rows(dataset, start=None, end=None):
+    """
+    (列, 行のイテレータ) を返す。期間は年月（start, end を含む）
+    JSON の列は文字列にする
+    """
+    model, date_field = export_sources()[dataset]
+    export_columns = columns(model)
+    queryset = model.objects.order_by(date_field, 'pk')
+    if start is not None:
+        queryset = queryset.filter(**{f'{date_field}__gte': month_bounds(start)[0]})
+    if end is not None:
+        queryset = queryset.filter(**{f'{date_field}__lt': month_bounds(end)[1]})
+    rows = iterate(queryset.values_list(*[lookup for name, lookup, field in export_columns]))
+
+    json_indexes = [
+        i for i, (name, lookup, field) in enumerate(export_columns) if isinstance(field, models.JSONField)
+    ]
+    if json_indexes:
+        rows = (_dump_json(row, json_indexes) for row in rows)
+    return export_columns, rows
+
+
+def _dump_json(row, indexes):
+    row = list(row)
+    for i in indexes:
+        if row[i] is not None:
+            row[i] = json.dumps(row[i], ensure_ascii=False)
+    return row
+
+
+def _batches(rows):
+    while True:
+        batch = list(islice(rows, settings.ITERATOR_CHUNK_SIZE))
+        if not batch:
+            return
+        yield batch
+
+
+class _Echo:
+    """csv.writer の1行分の文字列をそのまま返す"""
+
+    def write(self, value):
+        return value
+
+
+def csv_chunks(export_columns, rows):
+    """BOM付きUTF-8（Excel で文字化けしない）"""
+    writer = csv.writer(_Echo())
+    yield ('\ufeff' + writer.writerow([name for name, lookup, field in export_columns])).encode()
+    for batch in _batches(rows):
+        yield ''.join(writer.writerow(row) for row in batch).encode()
+
+
+def arrow_type(field):
+    if isinstance(field, (models.AutoField, models.IntegerField)):
+        return pa.int64()
+    if isinstance(field, models.DateTimeField):
+        return pa.timestamp('us', tz='UTC' if settings.USE_TZ else None)
+    if isinstance(field, models.DateField):
+        return pa.date32()
+    if isinstance(field, models.BooleanField):
+        return pa.bool_()
+    if isinstance(field, models.DecimalField):
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    return pa.string()
+
+
+class _Buffer:
+    """pyarrow の書き込み先。書き込まれた bytes を溜め、take() で取り出す"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def arrow_chunks(export_columns, rows, file_format):
+    """Parquet（row group ごと）または Arrow IPC ストリーム（record batch ごと）"""
+    schema = pa.schema([(name, arrow_type(field)) for name, lookup, field in export_columns])
+    buffer = _Buffer()
+    sink = pa.PythonFile(buffer, mode='w')
+    if file_format == 'parquet':
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    for batch in _batches(rows):
+        arrays = [pa.array(values, type=column.type) for values, column in zip(zip(*batch), schema)]
+        writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+        yield buffer.take()
+    writer.close()
+    yield buffer.take()
+
+
+def export(dataset, file_format='csv', start=None, end=None):
+    """
+    データセットを指定形式の bytes のチャンクで返すイテレータ
+    データセット名・形式・pyarrow の有無は呼び出し時に検証する（ValueError / ImportError）
+    """
+    if dataset not in export_sources():
+        raise ValueError(f"データセットが不正です: {dataset}（{', '.join(export_sources())}）")
+    if file_format not in FORMATS:
+        raise ValueError(f"形式が不正です: {file_format}（{', '.join(FORMATS)}）")
+    require_pyarrow(file_format)
+
+    export_columns, rows = export_rows(dataset, start, end)
+    if file_format == 'csv':
+        return csv_chunks(export_columns, rows)
+    return arrow_chunks(export_columns, rows, file_format)
+
+
+def filename(dataset, file_format):
+    return f"{dataset}.{FORMATS[file_format][1]}"
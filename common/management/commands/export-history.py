@@ -0,0 +1,60 @@
+"""
+履歴のエクスポート（CSV / Parquet / Arrow）
+
+使い方:
+    python manage.py export-history credit-usages
+    python manage.py export-history monthly-cashflows --format parquet --output cashflows.parquet
+    python manage.py export-history salary-records --from 2025-01 --to 2025-12   # 確定申告用に1年分
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from common import export
+from common.months import parse_year_month
+
+
+class Command(BaseCommand):
+    help = 'クレカ利用明細・月次キャッシュフロー・給与明細の履歴をファイルに書き出します（行数に関係なく一定のメモリで出力）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'dataset',
+            choices=list(export.export_sources()),
+            help='出力するデータ'
+        )
+        parser.add_argument(
+            '--format',
+            dest='file_format',
+            choices=list(export.FORMATS),
+            default='csv',
+            help='出力形式（parquet / arrow は pyarrow が必要）'
+        )
+        parser.add_argument(
+            '--output',
+            help='出力ファイル（省略時は <データ名>.<拡張子>）'
+        )
+        parser.add_argument(
+            '--from',
+            dest='from_month',
+            help='開始年月（YYYY-MM）'
+        )
+        parser.add_argument(
+            '--to',
+            dest='to_month',
+            help='終了年月（YYYY-MM、この月を含む）'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start = parse_year_month(options['from_month']) if options['from_month'] else None
+            end = parse_year_month(options['to_month']) if options['to_month'] else None
+            chunks = export.export(options['dataset'], options['file_format'], start, end)
+        except (ValueError, ImportError) as e:
+            raise CommandError(str(e))
+
+        output = options['output'] or export.filename(options['dataset'], options['file_format'])
+        size = 0
+        with open(output, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                size += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f"{output} に出力しました（{size:,}バイト）"))
@@ -0,0 +1,28 @@
+"""
+リクエストごとのSQLプロファイル
+settings.QUERY_PROFILING が True のときだけ有効（環境変数 QUERY_PROFILING で切り替え）
+"""
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .profiling import log_profile, profile_queries
+
+
+class QueryProfilingMiddleware:
+    """
+    クエリ数・合計時間・重複クエリを X-Query-Profile ヘッダーで返し、詳細をログに出力する
+    非同期ビューのワーカースレッドで実行されたクエリは含まれない
+    """
+    header = 'X-Query-Profile'
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with profile_queries() as profile:
+            response = self.get_response(request)
+        response[self.header] = profile.header()
+        log_profile(profile, method=request.method, path=request.path, status=response.status_code)
+        return response
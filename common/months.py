@@ -0,0 +1,60 @@
+"""
+年月（YYYY-MM-01形式のDateField）を扱うユーティリティ
+"""
+from datetime import date, datetime
+
+from dateutil.relativedelta import relativedelta
+
+
+def parse_year_month(value):
+    """'YYYY-MM' 形式の文字列を月初日の date に変換"""
+    try:
+        return datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise ValueError(f"年月は YYYY-MM 形式で指定してください: {value}")
+
+
+def month_start(value):
+    """日付を月初日に丸める"""
+    return date(value.year, value.month, 1)
+
+
+def add_months(year_month, months):
+    """月初日に月数を加算"""
+    return month_start(year_month) + relativedelta(months=months)
+
+
+def month_bounds(year_month):
+    """
+    年月を半開区間 [月初日, 翌月初日) の日付範囲に変換
+    __year / __month ルックアップと違い、インデックスの範囲検索が使える
+
+    例: start, end = month_bounds(year_month)
+        queryset.filter(usage_date__gte=start, usage_date__lt=end)
+    """
+    start = month_start(year_month)
+    return start, start + relativedelta(months=1)
+
+
+def months_bounds(start, end):
+    """start の月初日から end の翌月初日までの半開区間（両端の月を含む）"""
+    return month_bounds(start)[0], month_bounds(end)[1]
+
+
+def iter_months(start, end):
+    """start から end までの月初日を順に返す（両端を含む）"""
+    current = month_start(start)
+    end = month_start(end)
+    while current <= end:
+        yield current
+        current += relativedelta(months=1)
+
+
+def month_ordinal(value):
+    """年月を通し番号（年×12＋月−1）に変換。月数の差やNumPyでの計算に使う"""
+    return value.year * 12 + value.month - 1
+
+
+def months_between(start, end):
+    """start の月から end の月までの月数（end が前なら負）"""
+    return month_ordinal(end) - month_ordinal(start)
@@ -0,0 +1,14 @@
+"""
+任意の依存パッケージ
+NumPy がなくてもアプリは動き、NumPy を使う計算を呼んだときだけ ImportError にする
+"""
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+def require_numpy(purpose):
+    """NumPy がなければ ImportError（purpose はメッセージに出す計算の名前）"""
+    if np is None:
+        raise ImportError(f"{purpose}には NumPy が必要です: pip install numpy")
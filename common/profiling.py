@@ -0,0 +1,86 @@
+"""
+SQLのプロファイル
+connection.execute_wrapper で実行されたクエリを記録するため、DEBUG=False でも使える
+
+例:
+    with profile_queries() as profile:
+        cashflow.calculate_all()
+    profile.count, profile.total_ms, profile.duplicates(), profile.slowest()
+"""
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+logger = logging.getLogger(__name__)
+
+# slowest() / as_dict() で返す遅いクエリの件数
+SLOWEST_COUNT = 5
+
+
+class QueryProfile:
+    """実行されたクエリ [(SQL, 実行時間ミリ秒), ...] を記録する execute_wrapper"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, (time.perf_counter() - started) * 1000))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_ms(self):
+        return sum(ms for sql, ms in self.queries)
+
+    def duplicates(self):
+        """
+        同じSQL（パラメータ違いを含む）が2回以上実行されたもの {SQL: 回数}
+        ループ内で1件ずつ引く N+1 はここに現れる
+        """
+        counts = Counter(sql for sql, ms in self.queries)
+        return {sql: count for sql, count in counts.most_common() if count > 1}
+
+    def slowest(self, count=SLOWEST_COUNT):
+        return sorted(self.queries, key=lambda query: query[1], reverse=True)[:count]
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total_ms': round(self.total_ms, 3),
+            'duplicates': [{'sql': sql, 'count': count} for sql, count in self.duplicates().items()],
+            'slowest': [{'sql': sql, 'ms': round(ms, 3)} for sql, ms in self.slowest()],
+        }
+
+    def header(self):
+        """レスポンスヘッダー用の要約"""
+        duplicated = sum(count - 1 for count in self.duplicates().values())
+        return f"count={self.count}; time={self.total_ms:.1f}ms; duplicates={duplicated}"
+
+
+@contextmanager
+def profile_queries(using=DEFAULT_DB_ALIAS):
+    """ブロック内で実行されたクエリを QueryProfile に記録する"""
+    profile = QueryProfile()
+    with connections[using].execute_wrapper(profile):
+        yield profile
+
+
+def log_profile(profile, **fields):
+    """
+    プロファイルを1行のJSONでログに出力
+    重複クエリがあれば（N+1 の可能性）WARNING、なければ INFO
+    """
+    level = logging.WARNING if profile.duplicates() else logging.INFO
+    payload = {**fields, **profile.as_dict()}
+    logger.log(level, json.dumps(payload, ensure_ascii=False, default=str), extra={'query_profile': payload})
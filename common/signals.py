@@ -0,0 +1,35 @@
+"""
+アプリ共通のカスタムシグナル
+"""
+from django.db.models.signals import pre_save
+from django.dispatch import Signal
+
+
+# bulk_create は post_save を送らないため、一括登録した側が送信する
+# sender: モデルクラス, objs: 登録したインスタンスのリスト
+post_bulk_create = Signal()
+
+
+# 保存前に控える更新前のフィールド {モデル: {フィールド名, ...}}
+_previous_fields = {}
+
+
+def track_previous(model, fields):
+    """
+    model の保存前に更新前の fields を読み、instance._previous_row（辞書。新規作成時は None）に控える
+    複数のハンドラが登録しても、読み込みは pre_save で1回（全フィールドを1クエリ）にまとめる
+    post_save のハンドラから参照する
+    """
+    _previous_fields.setdefault(model, set()).update(fields)
+    pre_save.connect(
+        remember_previous_row, sender=model, dispatch_uid=f'common_previous_{model._meta.label_lower}'
+    )
+
+
+def remember_previous_row(sender, instance, raw=False, **kwargs):
+    instance._previous_row = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_row = sender.objects.filter(pk=instance.pk).values(
+        *sorted(_previous_fields[sender])
+    ).first()
@@ -0,0 +1,23 @@
+"""
+SQLite の本番向け設定
+settings.SQLITE_TUNING が True のとき、接続ごとに settings.SQLITE_PRAGMAS を適用する
+
+- journal_mode=WAL: 書き込み中も読み込みがロック待ちにならない（再計算中に管理画面が止まらない）
+- synchronous=NORMAL: WAL ではコミットごとの fsync を省いても壊れない（電源断時は直前のコミットが失われうる）
+- cache_size / mmap_size: ページキャッシュを大きくし、読み込みをメモリマップで行う
+- busy_timeout: 書き込みロックの待ち時間（ミリ秒）。超えると database is locked になる
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite' or not getattr(settings, 'SQLITE_TUNING', False):
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def connect():
+    connection_created.connect(apply_pragmas, dispatch_uid='common.sqlite.apply_pragmas')
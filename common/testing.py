@@ -0,0 +1,73 @@
+"""
+テスト用ヘルパー
+"""
+from contextlib import contextmanager
+from unittest import skipUnless
+
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.test.utils import CaptureQueriesContext
+
+from .profiling import profile_queries
+
+
+# データベースに依存するテスト（DATABASE_URL で PostgreSQL を指定して実行すると切り替わる）
+requires_sqlite = skipUnless(connection.vendor == 'sqlite', 'SQLite でのみ実行')
+requires_postgresql = skipUnless(connection.vendor == 'postgresql', 'PostgreSQL でのみ実行')
+
+
+def capture_query_plans(func, *args, **kwargs):
+    """
+    func 実行中に発行されたSELECT文ごとに EXPLAIN QUERY PLAN（SQLite）を取得
+    [(SQL, [プランの各行]), ...] を返す
+    """
+    with CaptureQueriesContext(connection) as context:
+        func(*args, **kwargs)
+
+    plans = []
+    with connection.cursor() as cursor:
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            plans.append((sql, [row[-1] for row in cursor.fetchall()]))
+    return plans
+
+
+def full_table_scans(plans, tables):
+    """
+    プランの中から、指定テーブルを全件走査している行を抽出
+    'SCAN <table> ...' はインデックス経由でも全件走査、'SEARCH <table> USING ...' は範囲検索
+    """
+    scans = []
+    for sql, details in plans:
+        for detail in details:
+            words = detail.split()
+            if len(words) >= 2 and words[0] == 'SCAN' and words[1] in tables:
+                scans.append((detail, sql))
+    return scans
+
+
+@contextmanager
+def query_budget(budget, using=DEFAULT_DB_ALIAS, allow_duplicates=True):
+    """
+    ブロック内のクエリ数が budget を超えたら失敗させる（デコレータとしても使える）
+    allow_duplicates=False の場合、同じSQLが2回以上実行されても失敗させる（N+1 の検出）
+
+    例: with query_budget(2, allow_duplicates=False):
+            PaymentSchedule(year_month=month).calculate_all()
+    """
+    with profile_queries(using) as profile:
+        yield profile
+
+    problems = []
+    if profile.count > budget:
+        problems.append(f"クエリ数が予算を超えました: {profile.count} > {budget}")
+    duplicates = profile.duplicates()
+    if duplicates and not allow_duplicates:
+        problems.append("同じクエリが繰り返し実行されました（N+1 の可能性）:")
+        problems += [f"  {count}回: {sql}" for sql, count in duplicates.items()]
+    if problems:
+        problems.append("実行されたクエリ:")
+        problems += [f"  {i}. {sql}" for i, (sql, ms) in enumerate(profile.queries, 1)]
+        raise AssertionError('\n'.join(problems))
@@ -0,0 +1,8 @@
+from django.urls import path
+
+from . import views
+
+
+urlpatterns = [
+    path('exports/<slug:dataset>.<slug:file_format>', views.export, name='export'),
+]
@@ -0,0 +1,27 @@
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import api_view
+from rest_framework.exceptions import NotFound, ValidationError
+
+from . import export as exports
+from .months import parse_year_month
+
+
+@api_view(['GET'])
+def export(request, dataset, file_format):
+    """
+    履歴のエクスポート（/api/exports/credit-usages.csv?from=2025-01&to=2025-12）
+    行を読みながら書き出すため、件数に関係なく一定のメモリで返す
+    """
+    if dataset not in exports.export_sources():
+        raise NotFound(f"データセットが不正です: {dataset}")
+    params = request.query_params
+    try:
+        start = parse_year_month(params['from']) if 'from' in params else None
+        end = parse_year_month(params['to']) if 'to' in params else None
+        chunks = exports.export(dataset, file_format, start, end)
+    except (ValueError, ImportError) as e:
+        raise ValidationError(str(e))
+
+    response = StreamingHttpResponse(chunks, content_type=exports.FORMATS[file_format][0])
+    response['Content-Disposition'] = f'attachment; filename="{exports.filename(dataset, file_format)}"'
+    return response
@@ -15,8 +15,12 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/', include('salary.urls')),
+    path('api/', include('credit.urls')),
+    path('api/', include('cashflow.urls')),
+    path('api/', include('common.urls')),
 ]
@@ -0,0 +1,61 @@
+"""クレジット・ローンダッシュボードの集計（views.dashboard が common.concurrency.gather_queries で同時に実行する）"""
+from django.db.models import Count, Q, Sum
+
+from common.months import add_months, month_bounds
+
+from .models import CreditCard, CreditUsage, PaymentSchedule, ShortTermLoan
+
+
+# 今後の引落予定を表示する月数
+UPCOMING_MONTHS = 3
+
+
+def usage_by_card(year_month):
+    """利用月のカード別利用額・件数"""
+    start, end = month_bounds(year_month)
+    return list(
+        CreditUsage.objects.filter(usage_date__gte=start, usage_date__lt=end)
+        .values('credit_card__name')
+        .annotate(total=Sum('amount'), count=Count('pk'))
+        .order_by('credit_card__name')
+    )
+
+
+def cards():
+    """有効なカードの限度額と未払い残高"""
+    return list(
+        CreditCard.objects.filter(is_active=True)
+        .values('name', 'credit_limit')
+        .annotate(unpaid=Sum('creditusage__amount', filter=Q(creditusage__is_paid=False)))
+        .order_by('name')
+    )
+
+
+def upcoming_schedules(year_month):
+    """year_month からの引落予定"""
+    return list(
+        PaymentSchedule.objects.filter(
+            year_month__gte=year_month, year_month__lt=add_months(year_month, UPCOMING_MONTHS)
+        ).order_by('year_month').values(
+            'year_month', 'total_credit_payment', 'total_loan_payment', 'total_payment', 'risk_level'
+        )
+    )
+
+
+def loans():
+    """有効な短期ローン"""
+    return list(
+        ShortTermLoan.objects.filter(is_active=True)
+        .order_by('start_date')
+        .values('name', 'monthly_payment', 'remaining_months')
+    )
+
+
+def queries(year_month):
+    """ダッシュボードの各項目を集計する関数 {名前: 引数なしの関数}"""
+    return {
+        'usage_by_card': lambda: usage_by_card(year_month),
+        'cards': cards,
+        'upcoming_schedules': lambda: upcoming_schedules(year_month),
+        'loans': loans,
+    }
@@ -0,0 +1,199 @@
+"""
+クレジットカード利用明細の一括取込
+CSVをチャンク単位で読み込み、bulk_create で登録する
+"""
+import csv
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from common.signals import post_bulk_create
+
+from .models import CreditCard, CreditUsage, compute_payment_date
+
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# CSVの列名 -> CreditUsage のフィールド名（英語・日本語どちらの見出しでも可）
+COLUMN_ALIASES = {
+    'card': 'card',
+    'カード名': 'card',
+    'usage_date': 'usage_date',
+    '利用日': 'usage_date',
+    'amount': 'amount',
+    '利用金額': 'amount',
+    'merchant': 'merchant',
+    '利用店舗': 'merchant',
+    'category': 'category',
+    'カテゴリ': 'category',
+    'memo': 'memo',
+    'メモ': 'memo',
+}
+
+DATE_FORMATS = ['%Y-%m-%d', '%Y/%m/%d', '%Y.%m.%d']
+
+# カテゴリは値（food）・表示名（食費）どちらでも可
+CATEGORY_LOOKUP = {
+    **{value: value for value, label in CreditUsage.CATEGORY_CHOICES},
+    **{label: value for value, label in CreditUsage.CATEGORY_CHOICES},
+}
+
+
+class ImportRowError(ValueError):
+    """取込できない行"""
+
+
+def _parse_date(value):
+    value = (value or '').strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ImportRowError(f"利用日を解釈できません: {value!r}")
+
+
+def _parse_amount(value):
+    cleaned = (value or '').strip().replace(',', '').replace('円', '').replace('¥', '').replace('￥', '')
+    try:
+        amount = int(cleaned)
+    except ValueError:
+        raise ImportRowError(f"利用金額を解釈できません: {value!r}")
+    if amount < 0:
+        raise ImportRowError(f"利用金額が負の値です: {value!r}")
+    return amount
+
+
+@lru_cache(maxsize=4096)
+def _cached_payment_date(usage_date, closing_date, payment_day):
+    """同じ (利用日, 締め日, 引落日) の計算結果を使い回す"""
+    return compute_payment_date(usage_date, closing_date, payment_day)
+
+
+class CreditUsageImporter:
+    """
+    利用明細CSVの取込
+    - カードの締め日・引落日は最初に1回だけ読み込んでキャッシュ
+    - 既存明細との重複（カード・利用日・金額・店舗が同じ）は件数単位で除外
+    - チャンクごとに1トランザクションで bulk_create（post_bulk_create を送信）
+    """
+
+    def __init__(self, card=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        card: CSVにカード列がない場合に使うカード名
+        """
+        self.default_card = card
+        self.chunk_size = chunk_size
+        self.cards = {
+            c.name: (c.pk, c.closing_date, c.payment_date)
+            for c in CreditCard.objects.all()
+        }
+        if card is not None and card not in self.cards:
+            raise ValueError(f"カードが登録されていません: {card}")
+
+        self.created = 0
+        self.skipped = 0
+        self.errors = []  # [(ファイル, 行番号, メッセージ), ...]
+        self._started_at = None
+        self._path = None
+
+    def import_file(self, path, encoding='utf-8-sig'):
+        """CSVファイルを取込"""
+        with open(path, newline='', encoding=encoding) as f:
+            return self.import_rows(csv.DictReader(f), path=path)
+
+    def import_rows(self, rows, path=None):
+        """
+        辞書のイテラブル（csv.DictReader など）を取込
+        メモリ使用量はチャンクサイズ分に抑える
+        path: エラーに記録する取込元（複数ファイルを取込むときの区別用）
+        """
+        self._path = path
+        # 同じファイル内の同一明細を重複扱いしないよう、取込開始前の明細とだけ照合する
+        self._started_at = timezone.now()
+        rows = iter(enumerate(rows, start=2))  # 1行目は見出し
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self._import_chunk(chunk)
+        return self
+
+    def _build_usage(self, row):
+        values = {}
+        for column, value in row.items():
+            field = COLUMN_ALIASES.get((column or '').strip())
+            if field:
+                values[field] = (value or '').strip()
+
+        card_name = values.get('card') or self.default_card
+        if not card_name:
+            raise ImportRowError("カード名がありません")
+        try:
+            card_id, closing_date, payment_day = self.cards[card_name]
+        except KeyError:
+            raise ImportRowError(f"カードが登録されていません: {card_name}")
+
+        category = values.get('category') or 'other'
+        if category not in CATEGORY_LOOKUP:
+            raise ImportRowError(f"カテゴリが不正です: {category}")
+
+        usage_date = _parse_date(values.get('usage_date'))
+        return CreditUsage(
+            credit_card_id=card_id,
+            usage_date=usage_date,
+            amount=_parse_amount(values.get('amount')),
+            merchant=values.get('merchant', ''),
+            category=CATEGORY_LOOKUP[category],
+            payment_date=_cached_payment_date(usage_date, closing_date, payment_day),
+            memo=values.get('memo', ''),
+        )
+
+    @staticmethod
+    def _dedup_key(usage):
+        return (usage.credit_card_id, usage.usage_date, usage.amount, usage.merchant)
+
+    def _existing_keys(self, usages):
+        """チャンクと重なる既存明細のキーを件数付きで取得（1クエリ）"""
+        existing = CreditUsage.objects.filter(
+            created_at__lt=self._started_at,
+            credit_card_id__in={u.credit_card_id for u in usages},
+            usage_date__gte=min(u.usage_date for u in usages),
+            usage_date__lte=max(u.usage_date for u in usages),
+        ).values_list('credit_card_id', 'usage_date', 'amount', 'merchant')
+        return Counter(existing)
+
+    def _import_chunk(self, chunk):
+        usages = []
+        for line_number, row in chunk:
+            try:
+                usages.append(self._build_usage(row))
+            except ImportRowError as e:
+                self.errors.append((self._path, line_number, str(e)))
+        if not usages:
+            return
+
+        with transaction.atomic():
+            existing = self._existing_keys(usages)
+            new_usages = []
+            for usage in usages:
+                key = self._dedup_key(usage)
+                if existing[key] > 0:
+                    # 同じ内容の明細が既にある分だけスキップ
+                    existing[key] -= 1
+                    self.skipped += 1
+                else:
+                    new_usages.append(usage)
+            CreditUsage.objects.bulk_create(new_usages, batch_size=self.chunk_size)
+            post_bulk_create.send(sender=CreditUsage, objs=new_usages)
+
+        self.created += len(new_usages)
+
+
+def import_credit_usages(path, card=None, chunk_size=DEFAULT_CHUNK_SIZE, encoding='utf-8-sig'):
+    """利用明細CSVを取込み、取込結果（CreditUsageImporter）を返す"""
+    return CreditUsageImporter(card=card, chunk_size=chunk_size).import_file(path, encoding=encoding)
@@ -0,0 +1,63 @@
+"""
+クレジットカード利用明細CSVの一括取込
+
+使い方:
+    python manage.py import-credit statement.csv
+    python manage.py import-credit statement.csv --card 楽天カード --encoding cp932
+
+CSVの見出し（英語・日本語どちらでも可）:
+    card/カード名, usage_date/利用日, amount/利用金額,
+    merchant/利用店舗, category/カテゴリ, memo/メモ
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from credit.importers import DEFAULT_CHUNK_SIZE, CreditUsageImporter
+
+
+class Command(BaseCommand):
+    help = 'クレジットカード利用明細をCSVから一括で取り込みます'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='+',
+            help='取込むCSVファイル'
+        )
+        parser.add_argument(
+            '--card',
+            help='CSVにカード名の列がない場合のカード名'
+        )
+        parser.add_argument(
+            '--encoding',
+            default='utf-8-sig',
+            help='CSVの文字コード（カード会社の明細は cp932 が多い）'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='1トランザクションで登録する件数'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            importer = CreditUsageImporter(
+                card=options['card'],
+                chunk_size=options['chunk_size']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for path in options['paths']:
+            try:
+                importer.import_file(path, encoding=options['encoding'])
+            except (OSError, UnicodeDecodeError) as e:
+                raise CommandError(f"{path} を読み込めません: {e}")
+
+        for path, line_number, message in importer.errors:
+            self.stderr.write(f"{path}: {line_number}行目: {message}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"取込: {importer.created}件、重複スキップ: {importer.skipped}件、"
+            f"エラー: {len(importer.errors)}件"
+        ))
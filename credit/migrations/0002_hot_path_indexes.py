@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='creditusage',
+            index=models.Index(fields=['credit_card', 'usage_date', 'is_paid', 'amount'], name='credit_usage_card_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='creditusage',
+            index=models.Index(fields=['payment_date', 'is_paid', 'credit_card', 'amount'], name='credit_usage_payment_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='creditusage',
+            index=models.Index(fields=['usage_date'], name='credit_usage_date_idx'),
+        ),
+    ]
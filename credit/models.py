@@ -1,7 +1,34 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import TruncMonth
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 from datetime import date
 from dateutil.relativedelta import relativedelta
+from calendar import monthrange
+
+from cashflow.models import RollupQuerySet
+from common.months import month_bounds, months_bounds
+
+
+def compute_payment_date(usage_date, closing_date, payment_day):
+    """
+    利用日・締め日・引落日から引落予定日を計算
+    CreditCard を引かずに計算できるよう、一括取込でも共用する
+    """
+    # 締め日を過ぎているかチェック
+    if usage_date.day > closing_date:
+        # 翌々月の引落
+        payment_month = usage_date + relativedelta(months=2)
+    else:
+        # 翌月の引落
+        payment_month = usage_date + relativedelta(months=1)
+
+    # 月末日を超える場合は月末に調整
+    max_day = monthrange(payment_month.year, payment_month.month)[1]
+    if payment_day > max_day:
+        payment_day = max_day
+
+    return date(payment_month.year, payment_month.month, payment_day)
 
 
 class CreditCard(models.Model):
@@ -72,9 +99,10 @@ class CreditCard(models.Model):
         if year_month is None:
             year_month = date.today().replace(day=1)
 
+        start, end = month_bounds(year_month)
         total = self.creditusage_set.filter(
-            usage_date__year=year_month.year,
-            usage_date__month=year_month.month
+            usage_date__gte=start,
+            usage_date__lt=end
         ).aggregate(models.Sum('amount'))['amount__sum']
 
         return total or 0
@@ -238,34 +266,38 @@ class CreditUsage(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     memo = models.TextField(blank=True, verbose_name="メモ")
 
+    objects = RollupQuerySet.as_manager()
+
     class Meta:
         verbose_name = "クレジットカード利用明細"
         verbose_name_plural = "クレジットカード利用明細一覧"
         ordering = ['-usage_date']
+        indexes = [
+            # get_current_month_usage / get_next_payment_amount（カード別・利用日範囲）
+            models.Index(
+                fields=['credit_card', 'usage_date', 'is_paid', 'amount'],
+                name='credit_usage_card_date_idx'
+            ),
+            # PaymentSchedule.calculate_all（引落日範囲の未払い分をカード別に集計）
+            # SQLite では is_paid=False が NOT is_paid になり等価検索できないため引落日を先頭にする
+            models.Index(
+                fields=['payment_date', 'is_paid', 'credit_card', 'amount'],
+                name='credit_usage_payment_idx'
+            ),
+            # 全カード横断の利用日範囲
+            models.Index(fields=['usage_date'], name='credit_usage_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.usage_date} {self.credit_card.name} {self.amount:,}円 {self.merchant}"
 
     def calculate_payment_date(self):
         """引落予定日を計算"""
-        # 締め日を過ぎているかチェック
-        if self.usage_date.day > self.credit_card.closing_date:
-            # 翌々月の引落
-            payment_month = self.usage_date + relativedelta(months=2)
-        else:
-            # 翌月の引落
-            payment_month = self.usage_date + relativedelta(months=1)
-
-        # 引落日を設定
-        payment_day = self.credit_card.payment_date
-
-        # 月末日を超える場合は月末に調整
-        from calendar import monthrange
-        max_day = monthrange(payment_month.year, payment_month.month)[1]
-        if payment_day > max_day:
-            payment_day = max_day
-
-        return date(payment_month.year, payment_month.month, payment_day)
+        return compute_payment_date(
+            self.usage_date,
+            self.credit_card.closing_date,
+            self.credit_card.payment_date
+        )
 
     def save(self, *args, **kwargs):
         """保存時に引落予定日を自動計算"""
@@ -332,6 +364,13 @@ class PaymentSchedule(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     memo = models.TextField(blank=True, verbose_name="メモ")
 
+    # calculate_all() で自動計算されるフィールド
+    CALCULATED_FIELDS = [
+        'credit_card_payments', 'total_credit_payment',
+        'loan_payments', 'total_loan_payment',
+        'total_payment', 'risk_level',
+    ]
+
     class Meta:
         verbose_name = "支払いスケジュール"
         verbose_name_plural = "支払いスケジュール一覧"
@@ -343,31 +382,42 @@ class PaymentSchedule(models.Model):
     def calculate_all(self):
         """
         クレカ・ローンの引落予定を集計
+        カード別の合計は1クエリ（カード名でGROUP BY）で取得する
         """
-        # クレジットカード集計
-        credit_payments = {}
-        for card in CreditCard.objects.filter(is_active=True):
-            # 該当月に引落がある利用明細を取得
-            amount = CreditUsage.objects.filter(
-                credit_card=card,
-                payment_date__year=self.year_month.year,
-                payment_date__month=self.year_month.month,
-                is_paid=False
-            ).aggregate(models.Sum('amount'))['amount__sum'] or 0
-
-            if amount > 0:
-                credit_payments[card.name] = amount
+        # クレジットカード集計（該当月に引落がある未払いの利用明細）
+        start, end = month_bounds(self.year_month)
+        rows = CreditUsage.objects.filter(
+            credit_card__is_active=True,
+            payment_date__gte=start,
+            payment_date__lt=end,
+            is_paid=False
+        ).values('credit_card__name').annotate(
+            amount=models.Sum('amount')
+        ).order_by('credit_card__name')
+
+        credit_payments = {
+            row['credit_card__name']: row['amount']
+            for row in rows
+            if row['amount'] > 0
+        }
+
+        self.apply_payments(credit_payments, self.active_loan_payments())
+
+    @staticmethod
+    def active_loan_payments():
+        """有効なローンの月額支払いを {'ローン名': 金額} で取得"""
+        # （簡易版：毎月支払いがある前提）
+        return dict(
+            ShortTermLoan.objects.filter(is_active=True).values_list('name', 'monthly_payment')
+        )
 
+    def apply_payments(self, credit_payments, loan_payments):
+        """
+        集計済みの引落予定を反映し、合計・リスクを計算（DBアクセスなし）
+        """
         self.credit_card_payments = credit_payments
         self.total_credit_payment = sum(credit_payments.values())
 
-        # ローン集計
-        loan_payments = {}
-        for loan in ShortTermLoan.objects.filter(is_active=True):
-            # 該当月に支払いがあるか判定
-            # （簡易版：毎月支払いがある前提）
-            loan_payments[loan.name] = loan.monthly_payment
-
         self.loan_payments = loan_payments
         self.total_loan_payment = sum(loan_payments.values())
 
@@ -399,10 +449,79 @@ class PaymentSchedule(models.Model):
         """
         指定月のスケジュールを作成/更新
         """
-        schedule, created = cls.objects.update_or_create(
-            year_month=year_month,
-            defaults={}
-        )
-        schedule.calculate_all()
+        schedule = cls.objects.filter(year_month=year_month).first()
+        if schedule is None:
+            schedule = cls(year_month=year_month)
         schedule.save()
         return schedule
+
+    @classmethod
+    def credit_payments_by_month(cls, start, end):
+        """
+        期間内のクレカ引落予定を (引落月, カード名) でGROUP BYして取得（1クエリ）
+        {年月: {'カード名': 金額}} を返す
+        """
+        range_start, range_end = months_bounds(start, end)
+        rows = CreditUsage.objects.filter(
+            credit_card__is_active=True,
+            payment_date__gte=range_start,
+            payment_date__lt=range_end,
+            is_paid=False
+        ).annotate(
+            payment_month=TruncMonth('payment_date')
+        ).values('payment_month', 'credit_card__name').annotate(
+            amount=models.Sum('amount')
+        ).order_by('payment_month', 'credit_card__name')
+
+        payments = {}
+        for row in rows:
+            if row['amount'] > 0:
+                month = payments.setdefault(row['payment_month'], {})
+                month[row['credit_card__name']] = row['amount']
+        return payments
+
+    @classmethod
+    def recalculate_months(cls, year_months, create=True):
+        """
+        複数月のスケジュールを一括で作成/更新
+        集計は月数・カード数に関係なく数クエリで行い、書き込みは
+        1トランザクションで bulk_update / bulk_create する（save() は呼ばない）
+        create=False の場合は既存の月だけを更新する
+        (更新件数, 作成件数) を返す
+        """
+        months = sorted(year_months)
+        if not months:
+            return 0, 0
+
+        range_start, range_end = months_bounds(months[0], months[-1])
+        credit_payments = cls.credit_payments_by_month(months[0], months[-1])
+        loan_payments = cls.active_loan_payments()
+        existing = {
+            schedule.year_month: schedule
+            for schedule in cls.objects.filter(
+                year_month__gte=range_start,
+                year_month__lt=range_end
+            )
+        }
+
+        now = timezone.now()
+        to_update = []
+        to_create = []
+        for year_month in months:
+            schedule = existing.get(year_month)
+            if schedule is None:
+                if not create:
+                    continue
+                schedule = cls(year_month=year_month)
+                to_create.append(schedule)
+            else:
+                # bulk_update では auto_now が効かないため明示的に設定
+                schedule.updated_at = now
+                to_update.append(schedule)
+            schedule.apply_payments(credit_payments.get(year_month, {}), dict(loan_payments))
+
+        with transaction.atomic():
+            cls.objects.bulk_update(to_update, cls.CALCULATED_FIELDS + ['updated_at'], batch_size=500)
+            cls.objects.bulk_create(to_create, batch_size=500)
+
+        return len(to_update), len(to_create)
@@ -0,0 +1,20 @@
+from rest_framework import serializers
+
+from .models import CreditUsage, PaymentSchedule
+
+
+class CreditUsageSerializer(serializers.ModelSerializer):
+    credit_card_name = serializers.CharField(source='credit_card.name', read_only=True)
+
+    class Meta:
+        model = CreditUsage
+        fields = '__all__'
+
+
+class PaymentScheduleSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = PaymentSchedule
+        fields = '__all__'
+        # save() 時に calculate_all() で計算される
+        read_only_fields = PaymentSchedule.CALCULATED_FIELDS
@@ -1,3 +1,347 @@
-from django.test import TestCase
+import os
+import tempfile
+from datetime import date
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from common.database import iterate
+from common.months import iter_months
+from common.testing import (
+    capture_query_plans, full_table_scans, query_budget, requires_postgresql, requires_sqlite
+)
+from cashflow import aggregation, rollup
+from .importers import CreditUsageImporter
+from .models import CreditCard, CreditUsage, PaymentSchedule, ShortTermLoan, compute_payment_date
+
+
+class CreditUsageImportTests(TestCase):
+    """利用明細CSVの取込（解釈・重複除外・チャンク・集計への反映）を確認"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.card = CreditCard.objects.create(name='楽天カード', closing_date=15, payment_date=27)
+        CreditCard.objects.create(name='イオンカード', closing_date=10, payment_date=2)
+
+    def write_csv(self, name, text, encoding='utf-8-sig'):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding=encoding, newline='') as f:
+            f.write(text)
+        return path
+
+    def import_file(self, path, card=None, chunk_size=2):
+        return CreditUsageImporter(card=card, chunk_size=chunk_size).import_file(path)
+
+    def test_parse_japanese_headers(self):
+        path = self.write_csv('ja.csv', (
+            "カード名,利用日,利用金額,利用店舗,カテゴリ,メモ\n"
+            "楽天カード,2025-01-15,\"1,200\",スーパー,食費,週末\n"
+            "楽天カード,2025/01/16,¥3000,駅,transport,\n"
+            "イオンカード,2025.01.31,4500円,書店,,\n"
+        ))
+        importer = self.import_file(path)
+        self.assertEqual((importer.created, importer.skipped, importer.errors), (3, 0, []))
+
+        usages = list(CreditUsage.objects.select_related('credit_card').order_by('usage_date'))
+        self.assertEqual([u.amount for u in usages], [1200, 3000, 4500])
+        self.assertEqual([u.category for u in usages], ['food', 'transport', 'other'])
+        self.assertEqual(usages[0].memo, '週末')
+        for usage in usages:
+            card = usage.credit_card
+            self.assertEqual(
+                usage.payment_date, compute_payment_date(usage.usage_date, card.closing_date, card.payment_date)
+            )
+        self.assertEqual(usages[0].payment_date, date(2025, 2, 27))  # 締め日当日は翌月
+        self.assertEqual(usages[1].payment_date, date(2025, 3, 27))
+        self.assertEqual(usages[2].payment_date, date(2025, 3, 2))
+
+    def test_english_headers_and_default_card(self):
+        path = self.write_csv('en.csv', (
+            "usage_date,amount,merchant,category,memo\n"
+            "2025-02-01,500,Cafe,食費,\n"
+        ))
+        self.assertEqual(self.import_file(path, card='イオンカード').created, 1)
+        self.assertEqual(CreditUsage.objects.get().credit_card.name, 'イオンカード')
+        with self.assertRaises(ValueError):
+            CreditUsageImporter(card='未登録カード')
+
+    def test_dedup_and_chunks(self):
+        text = "card,usage_date,amount,merchant\n" + "".join(
+            f"楽天カード,2025-01-{day:02d},1000,店\n" for day in (1, 2, 2, 3, 3)
+        )
+        path = self.write_csv('usages.csv', text)
+
+        # 同じファイル内の同一明細はチャンクをまたいでも別の利用として取り込む
+        importer = self.import_file(path, chunk_size=2)
+        self.assertEqual((importer.created, importer.skipped), (5, 0))
+
+        # 同じファイルを取り込み直すと、既存の件数分だけすべてスキップされる
+        importer = self.import_file(path, chunk_size=2)
+        self.assertEqual((importer.created, importer.skipped), (0, 5))
+
+        # 既存より1件多ければ、多い分だけ取り込む
+        path = self.write_csv('more.csv', text + "楽天カード,2025-01-03,1000,店\n")
+        importer = self.import_file(path, chunk_size=3)
+        self.assertEqual((importer.created, importer.skipped), (1, 5))
+        self.assertEqual(CreditUsage.objects.count(), 6)
+
+    def test_errors_have_line_numbers(self):
+        path = self.write_csv('bad.csv', (
+            "card,usage_date,amount,category\n"
+            "楽天カード,2025-01-01,1000,\n"
+            "楽天カード,01-02-2025,1000,\n"
+            "楽天カード,2025-01-03,-500,\n"
+            "未登録カード,2025-01-04,1000,\n"
+            "楽天カード,2025-01-05,abc,\n"
+            "楽天カード,2025-01-06,1000,不明\n"
+        ))
+        importer = self.import_file(path)
+        self.assertEqual(importer.created, 1)
+        self.assertEqual([(line, message.split(':')[0]) for p, line, message in importer.errors], [
+            (3, '利用日を解釈できません'),
+            (4, '利用金額が負の値です'),
+            (5, 'カードが登録されていません'),
+            (6, '利用金額を解釈できません'),
+            (7, 'カテゴリが不正です'),
+        ])
+        self.assertEqual({p for p, line, message in importer.errors}, {path})
+
+    def test_updates_rollups_and_dirty_months(self):
+        PaymentSchedule.recalculate_months([date(2025, 2, 1)])
+        path = self.write_csv('usages.csv', (
+            "card,usage_date,amount,category\n"
+            "楽天カード,2025-01-10,1000,food\n"
+            "楽天カード,2025-01-12,2000,food\n"
+            "楽天カード,2025-01-14,3000,shopping\n"
+        ))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.import_file(path)
+
+        self.assertEqual(rollup.verify(), [])
+        self.assertEqual(rollup.stored_rollups(['credit'])[('credit', date(2025, 1, 1), 'food')], (3000, 2))
+        schedule = PaymentSchedule.objects.get(year_month=date(2025, 2, 1))
+        self.assertEqual(schedule.credit_card_payments, {'楽天カード': 6000})
+
+    def test_command_reports_errors_per_file(self):
+        first = self.write_csv('first.csv', "card,usage_date,amount\n楽天カード,2025-01-01,x\n", encoding='cp932')
+        second = self.write_csv('second.csv', "利用日,利用金額\n2025-01-02,800\n2025/13/01,800\n", encoding='cp932')
+        out, err = StringIO(), StringIO()
+        call_command(
+            'import-credit', first, second, '--card', '楽天カード', '--encoding', 'cp932', stdout=out, stderr=err
+        )
+        self.assertIn('取込: 1件', out.getvalue())
+        self.assertIn(f"{first}: 2行目: 利用金額を解釈できません", err.getvalue())
+        self.assertIn(f"{second}: 3行目: 利用日を解釈できません", err.getvalue())
+
+
+@requires_sqlite
+class CreditUsageQueryPlanTests(TestCase):
+    """利用明細の集計クエリがインデックスを使うことを確認"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.card = CreditCard.objects.create(name='テストカード', closing_date=15, payment_date=10)
+        CreditUsage.objects.bulk_create([
+            CreditUsage(
+                credit_card=cls.card,
+                usage_date=date(2025, month, day),
+                amount=1000,
+                payment_date=date(2025, month + 1, 10),
+            )
+            for month in range(1, 12)
+            for day in (1, 10, 20)
+        ])
+
+    def assertNoFullScan(self, func, *args):
+        plans = capture_query_plans(func, *args)
+        self.assertTrue(plans)
+        scans = full_table_scans(plans, {'credit_creditusage'})
+        self.assertEqual(scans, [], '利用明細テーブルがフルスキャンされています')
+
+    def test_get_current_month_usage(self):
+        self.assertNoFullScan(self.card.get_current_month_usage, date(2025, 3, 1))
+
+    def test_get_next_payment_amount(self):
+        self.assertNoFullScan(self.card.get_next_payment_amount)
+
+    def test_payment_schedule_calculate_all(self):
+        self.assertNoFullScan(PaymentSchedule(year_month=date(2025, 4, 1)).calculate_all)
+
+
+class QueryBudgetTests(TestCase):
+    """カード数が増えてもクエリ数が増えない（カードごとのループで引かない）ことを確認"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cards = [
+            CreditCard.objects.create(name=f'カード{i}', closing_date=15, payment_date=10)
+            for i in range(5)
+        ]
+        CreditUsage.objects.bulk_create([
+            CreditUsage(credit_card=card, usage_date=date(2025, 3, 1), amount=1000, payment_date=date(2025, 4, 10))
+            for card in cards
+        ])
+
+    def test_payment_schedule_calculate_all(self):
+        schedule = PaymentSchedule(year_month=date(2025, 4, 1))
+        with query_budget(2, allow_duplicates=False):
+            schedule.calculate_all()
+        self.assertEqual(schedule.total_credit_payment, 5000)
+
+    def test_detects_per_card_loop(self):
+        with self.assertRaisesMessage(AssertionError, 'N+1'):
+            with query_budget(10, allow_duplicates=False):
+                for card in CreditCard.objects.all():
+                    card.get_current_month_usage(date(2025, 3, 1))
+
+
+class RecalculateMonthsTests(TestCase):
+    """期間の一括再計算が月ごとの calculate_all() と同じ結果になり、月数に関係なく同じクエリ数で済むことを確認"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.months = list(iter_months(date(2025, 1, 1), date(2025, 12, 1)))
+        cards = [
+            CreditCard.objects.create(name='楽天カード', closing_date=15, payment_date=27),
+            CreditCard.objects.create(name='イオンカード', closing_date=10, payment_date=2),
+            CreditCard.objects.create(name='解約済みカード', closing_date=15, payment_date=10, is_active=False),
+        ]
+        for month in cls.months:
+            for i, card in enumerate(cards):
+                for day in (1, 20):
+                    CreditUsage.objects.create(
+                        credit_card=card,
+                        usage_date=date(2025, month.month, day),
+                        amount=(i + 1) * month.month * 10000,
+                        is_paid=day == 20 and month.month % 3 == 0,
+                    )
+        ShortTermLoan.objects.create(
+            name='iPhone 分割', monthly_payment=5000, remaining_months=24, payment_date=27, start_date=date(2024, 10, 1)
+        )
+        ShortTermLoan.objects.create(
+            name='完済済み', monthly_payment=3000, remaining_months=0, payment_date=27,
+            start_date=date(2023, 1, 1), is_active=False
+        )
+
+    def calculated(self, schedule):
+        return {field: getattr(schedule, field) for field in PaymentSchedule.CALCULATED_FIELDS}
+
+    def test_matches_calculate_all(self):
+        self.assertEqual(PaymentSchedule.recalculate_months(self.months), (0, 12))
+        for stored in PaymentSchedule.objects.order_by('year_month'):
+            expected = PaymentSchedule(year_month=stored.year_month)
+            expected.calculate_all()
+            self.assertEqual(self.calculated(stored), self.calculated(expected), stored.year_month)
+        self.assertEqual(
+            {schedule.risk_level for schedule in PaymentSchedule.objects.all()}, {'safe', 'warning', 'danger'}
+        )
+        self.assertEqual(
+            PaymentSchedule.objects.get(year_month=self.months[0]).loan_payments, {'iPhone 分割': 5000}
+        )
+
+    def test_cashflow_range_matches_per_month(self):
+        PaymentSchedule.recalculate_months(self.months[:8])
+        ranged = aggregation.credit_payments_by_month(self.months[0], self.months[-1])
+        empty = {'credit_card_payments': {}, 'total_credit_payment': 0}
+        for month in self.months:
+            self.assertEqual(ranged.get(month, empty), aggregation.credit_payments(month), month)
+
+    def test_create_flag(self):
+        PaymentSchedule.recalculate_months(self.months[:6])
+        self.assertEqual(PaymentSchedule.recalculate_months(self.months, create=False), (6, 0))
+        self.assertEqual(PaymentSchedule.objects.count(), 6)
+        self.assertEqual(PaymentSchedule.recalculate_months(self.months), (6, 6))
+
+    def test_query_count_does_not_depend_on_months(self):
+        PaymentSchedule.recalculate_months(self.months)
+        counts = []
+        for months in (self.months[:3], self.months):
+            with CaptureQueriesContext(connection) as context:
+                PaymentSchedule.recalculate_months(months)
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+@requires_postgresql
+class ServerSideCursorTests(TestCase):
+    """大量の明細を読む処理がサーバーサイドカーソルで ITERATOR_CHUNK_SIZE 件ずつ読み込むことを確認"""
+
+    def open_cursors(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM pg_cursors')
+            return cursor.fetchone()[0]
+
+    @override_settings(ITERATOR_CHUNK_SIZE=10)
+    def test_iterate(self):
+        card = CreditCard.objects.create(name='テストカード', closing_date=15, payment_date=10)
+        CreditUsage.objects.bulk_create([
+            CreditUsage(credit_card=card, usage_date=date(2025, 1, 1), amount=i) for i in range(1, 101)
+        ])
+        rows = iterate(CreditUsage.objects.order_by('amount').values_list('amount', flat=True))
+        self.assertEqual(next(rows), 1)
+        self.assertEqual(self.open_cursors(), 1)
+        self.assertEqual(sum(rows), sum(range(2, 101)))
+        self.assertEqual(self.open_cursors(), 0)
+
+
+class CreditUsageApiTests(TestCase):
+    """利用明細APIのカーソルページネーションとカード名の取得がN+1にならないことを確認"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('api', password='api')
+        cards = [
+            CreditCard.objects.create(name=f'カード{i}', closing_date=15, payment_date=10)
+            for i in range(3)
+        ]
+        CreditUsage.objects.bulk_create([
+            CreditUsage(credit_card=cards[day % 3], usage_date=date(2025, 1, day), amount=day * 100)
+            for day in range(1, 31)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_cursor_pages(self):
+        with self.assertNumQueries(3):  # セッション・ユーザー・明細
+            response = self.client.get('/api/credit-usages/', {'page_size': 20})
+        page = response.json()
+        self.assertEqual(len(page['results']), 20)
+        self.assertEqual(page['results'][0]['usage_date'], '2025-01-30')
+        self.assertEqual(page['results'][0]['credit_card_name'], 'カード0')
+
+        page = self.client.get(page['next']).json()
+        self.assertEqual([row['usage_date'] for row in page['results']][-1], '2025-01-01')
+        self.assertIsNone(page['next'])
+
+    def test_sparse_fields(self):
+        response = self.client.get('/api/credit-usages/', {'fields': 'amount,credit_card_name'})
+        self.assertEqual(response.json()['results'][0], {'amount': 3000, 'credit_card_name': 'カード0'})
+
+    def test_sparse_fields_without_card(self):
+        for fields, expected in (
+            ('amount', {'amount': 3000}),
+            ('id,usage_date,payment_date', {'usage_date': '2025-01-30'}),
+        ):
+            with self.subTest(fields=fields):
+                response = self.client.get('/api/credit-usages/', {'fields': fields})
+                self.assertEqual(response.status_code, 200)
+                row = response.json()['results'][0]
+                self.assertEqual(set(row), set(fields.split(',')))
+                self.assertEqual({name: row[name] for name in expected}, expected)
+
+    def test_requires_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/credit-usages/').status_code, 403)
+
+    @override_settings(QUERY_PROFILING=True)
+    def test_query_profile_header(self):
+        with self.assertLogs('common.profiling', 'INFO') as logs:
+            response = self.client.get('/api/credit-usages/')
+        self.assertTrue(response['X-Query-Profile'].startswith('count=3;'))
+        self.assertIn('"path": "/api/credit-usages/"', logs.output[0])
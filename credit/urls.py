@@ -0,0 +1,14 @@
+from django.urls import path
+from rest_framework.routers import SimpleRouter
+
+from . import views
+
+
+router = SimpleRouter()
+router.register('credit-usages', views.CreditUsageViewSet)
+router.register('payment-schedules', views.PaymentScheduleViewSet)
+
+urlpatterns = router.urls + [
+    path('dashboards/credit/', views.dashboard, name='credit-dashboard'),
+    path('dashboards/credit/<str:year_month>/', views.dashboard, name='credit-dashboard-month'),
+]
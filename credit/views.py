@@ -1,3 +1,26 @@
-from django.shortcuts import render
+from rest_framework import viewsets
 
-# Create your views here.
+from common.api import SparseFieldsetMixin, cursor_pagination
+from common.concurrency import dashboard_response
+from . import dashboard as dashboard_queries
+from .models import CreditUsage, PaymentSchedule
+from .serializers import CreditUsageSerializer, PaymentScheduleSerializer
+
+
+class CreditUsageViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
+    """クレジットカード利用明細（カード名は select_related で同じクエリで取得）"""
+    queryset = CreditUsage.objects.select_related('credit_card')
+    serializer_class = CreditUsageSerializer
+    pagination_class = cursor_pagination('-usage_date', '-id')
+
+
+class PaymentScheduleViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
+    """支払いスケジュール"""
+    queryset = PaymentSchedule.objects.all()
+    serializer_class = PaymentScheduleSerializer
+    pagination_class = cursor_pagination('-year_month')
+
+
+async def dashboard(request, year_month=None):
+    """クレジット・ローンダッシュボード（ASGI で動かすと各集計が同時に実行される）"""
+    return await dashboard_response(request, dashboard_queries.queries, year_month)
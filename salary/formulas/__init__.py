@@ -0,0 +1,17 @@
+"""
+Excel数式 → Python のコンパイラ
+給与計算Excelの数式を依存グラフ付きの Python 関数に変換し、
+SalaryRecord の計算をスプレッドシートと同じ結果にする
+
+    workbook = FormulaWorkbook.load('給与計算用エクセル202510.xlsm')
+    workbook.verify()                      # キャッシュ値との照合
+    workbook.set_values({key: value})      # 下流の数式だけを再計算
+
+openpyxl が必要: pip install openpyxl
+"""
+from .compiler import CompiledFormula, compile_formula
+from .functions import ExcelError
+from .parser import FormulaError, parse
+from .payroll import PayrollCalculator
+from .workbook import FormulaWorkbook, coordinate
+
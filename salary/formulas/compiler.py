@@ -0,0 +1,129 @@
+"""
+構文木から Python の関数へのコンパイル
+セルの値の辞書 {(シート名, 行, 列): 値} を受け取って数式の結果を返す関数を作る
+"""
+from . import functions
+from .parser import ErrorLiteral, FormulaError, parse
+
+
+ARITHMETIC_OPERATORS = {'+', '-', '*'}
+COMPARISON_OPERATORS = {'=', '<>', '<', '>', '<=', '>='}
+
+
+class CompiledFormula:
+    """
+    コンパイル済みの数式
+    precedents: 参照しているセルのキー（範囲は展開済み）
+    """
+
+    def __init__(self, formula, source, function, precedents):
+        self.formula = formula
+        self.source = source
+        self.function = function
+        self.precedents = precedents
+
+    def __call__(self, values):
+        try:
+            return self.function(values)
+        except functions.ExcelError as e:
+            return e
+
+    def __repr__(self):
+        return f"CompiledFormula({self.formula!r})"
+
+
+class Compiler:
+    """
+    resolve(参照文字列) は ('cell', キー) または ('range', キーの2次元リスト) を返す
+    """
+
+    def __init__(self, resolve):
+        self.resolve = resolve
+        self.constants = []
+        self.precedents = set()
+
+    def constant(self, value):
+        self.constants.append(value)
+        return f"_k[{len(self.constants) - 1}]"
+
+    def compile(self, node):
+        method = getattr(self, f"compile_{type(node).__name__.lower()}")
+        return method(node)
+
+    def compile_constant(self, node):
+        return repr(node.value)
+
+    def compile_errorliteral(self, node):
+        return f"_f.error({node.code!r})"
+
+    def compile_array(self, node):
+        rows = [
+            [functions.ExcelError(x.code) if isinstance(x, ErrorLiteral) else x for x in row]
+            for row in node.rows
+        ]
+        return self.constant(rows)
+
+    def compile_reference(self, node):
+        kind, keys = self.resolve(node.text)
+        if kind == 'cell':
+            self.precedents.add(keys)
+            return f"_f.value(v, {self.constant(keys)})"
+        for row in keys:
+            self.precedents.update(row)
+        return f"_f.cells(v, {self.constant(keys)})"
+
+    def compile_unary(self, node):
+        operand = self.compile(node.operand)
+        if node.op == '-':
+            return f"(-_f.number({operand}))"
+        if node.op == '+':
+            return operand
+        if node.op == '%':
+            return f"(_f.number({operand}) / 100)"
+        raise FormulaError(f"未対応の演算子: {node.op}")
+
+    def compile_binary(self, node):
+        left, right = self.compile(node.left), self.compile(node.right)
+        if node.op in ARITHMETIC_OPERATORS:
+            return f"(_f.number({left}) {node.op} _f.number({right}))"
+        if node.op == '/':
+            return f"_f.divide({left}, {right})"
+        if node.op == '^':
+            return f"_f.power({left}, {right})"
+        if node.op == '&':
+            return f"(_f.text({left}) + _f.text({right}))"
+        if node.op in COMPARISON_OPERATORS:
+            return f"_f.compare({left}, {right}, {node.op!r})"
+        raise FormulaError(f"未対応の演算子: {node.op}")
+
+    def compile_argument(self, node):
+        return 'None' if node is None else self.compile(node)
+
+    def compile_call(self, node):
+        args = [self.compile_argument(arg) for arg in node.args]
+        if node.name == 'IF':
+            # 選ばれなかった側は評価しない（エラーにならない）
+            if not 2 <= len(args) <= 3:
+                raise FormulaError("IF の引数の数が不正です")
+            otherwise = args[2] if len(args) == 3 else 'False'
+            then = '0' if args[1] == 'None' else args[1]
+            otherwise = '0' if otherwise == 'None' else otherwise
+            return f"({then} if _f.truth({args[0]}) else {otherwise})"
+        if node.name not in functions.FUNCTIONS:
+            raise FormulaError(f"未対応の関数: {node.name}")
+        if node.name in functions.LAZY_FUNCTIONS:
+            args = [f"(lambda: {arg})" for arg in args]
+        return f"_fn[{node.name!r}]({', '.join(args)})"
+
+
+def compile_formula(formula, resolve):
+    """
+    数式を CompiledFormula に変換
+    resolve は参照文字列をセルのキーに変換する関数（Compiler を参照）
+    """
+    compiler = Compiler(resolve)
+    expression = compiler.compile(parse(formula))
+    source = f"def _cell(v):\n    return _f.result({expression})\n"
+    namespace = {'_f': functions, '_fn': functions.FUNCTIONS, '_k': compiler.constants}
+    exec(compile(source, f"<{formula}>", 'exec'), namespace)
+    return CompiledFormula(formula, source, namespace['_cell'], frozenset(compiler.precedents))
@@ -0,0 +1,447 @@
+"""
+コンパイル済みの数式から呼び出すExcel互換の実行時関数
+- 空白セルは None（数値としては 0、文字列としては ""）
+- 範囲は2次元リスト（行のリスト）
+- エラー値は ExcelError 例外として伝播し、セルには ExcelError のインスタンスが入る
+"""
+import math
+from decimal import ROUND_DOWN, ROUND_HALF_UP, ROUND_UP, Decimal
+
+
+class ExcelError(Exception):
+    """#DIV/0! などのExcelのエラー値"""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+    def __eq__(self, other):
+        return isinstance(other, ExcelError) and other.code == self.code
+
+    def __hash__(self):
+        return hash(self.code)
+
+    def __str__(self):
+        return self.code
+
+
+def value(values, key):
+    """セルの値（エラーが入っていれば送出）"""
+    result = values.get(key)
+    if isinstance(result, ExcelError):
+        raise result
+    return result
+
+
+def error(code):
+    raise ExcelError(code)
+
+
+def result(x):
+    """セルに入る値（空白参照は 0、1セルの範囲は値）"""
+    x = scalar(x)
+    return 0 if x is None else x
+
+
+def cells(values, keys):
+    """範囲の値を2次元リストで返す（エラーはそのまま含める）"""
+    return [[values.get(key) for key in row] for row in keys]
+
+
+def scalar(x):
+    """1セルの範囲を値として扱う（Excelの暗黙の共通部分は未対応）"""
+    if isinstance(x, list):
+        if len(x) == 1 and len(x[0]) == 1:
+            x = x[0][0]
+        else:
+            raise ExcelError('#VALUE!')
+    if isinstance(x, ExcelError):
+        raise x
+    return x
+
+
+def number(x):
+    x = scalar(x)
+    if x is None:
+        return 0
+    if isinstance(x, bool):
+        return int(x)
+    if isinstance(x, (int, float)):
+        return x
+    try:
+        return float(x.replace(',', ''))
+    except (AttributeError, ValueError):
+        raise ExcelError('#VALUE!')
+
+
+def text(x):
+    x = scalar(x)
+    if x is None:
+        return ''
+    if isinstance(x, bool):
+        return 'TRUE' if x else 'FALSE'
+    if isinstance(x, float) and x.is_integer():
+        return str(int(x))
+    return str(x)
+
+
+def truth(x):
+    x = scalar(x)
+    if isinstance(x, str):
+        if x.upper() in ('TRUE', 'FALSE'):
+            return x.upper() == 'TRUE'
+        raise ExcelError('#VALUE!')
+    return bool(number(x))
+
+
+def _flatten(args):
+    """引数を1列に展開（範囲内の文字列・論理値・空白は除く）"""
+    for arg in args:
+        if isinstance(arg, list):
+            for row in arg:
+                for x in row:
+                    if isinstance(x, ExcelError):
+                        raise x
+                    if isinstance(x, (int, float)) and not isinstance(x, bool):
+                        yield x
+        elif arg is not None:
+            yield number(arg)
+
+
+# ========================================
+# 演算子
+# ========================================
+
+def divide(a, b):
+    b = number(b)
+    if b == 0:
+        raise ExcelError('#DIV/0!')
+    return number(a) / b
+
+
+def power(a, b):
+    try:
+        result = number(a) ** number(b)
+    except ZeroDivisionError:
+        raise ExcelError('#DIV/0!')
+    if isinstance(result, complex):
+        raise ExcelError('#NUM!')
+    return result
+
+
+def _sort_key(x):
+    # Excel の比較順: 数値 < 文字列 < 論理値（空白は相手の型の空値）
+    if isinstance(x, bool):
+        return (2, x)
+    if isinstance(x, str):
+        return (1, x.lower())
+    return (0, x)
+
+
+def compare(a, b, op):
+    a, b = scalar(a), scalar(b)
+    if a is None:
+        a = '' if isinstance(b, str) else (False if isinstance(b, bool) else 0)
+    if b is None:
+        b = '' if isinstance(a, str) else (False if isinstance(a, bool) else 0)
+    a, b = _sort_key(a), _sort_key(b)
+    if op == '=':
+        return a == b
+    if op == '<>':
+        return a != b
+    if op == '<':
+        return a < b
+    if op == '>':
+        return a > b
+    if op == '<=':
+        return a <= b
+    return a >= b
+
+
+# ========================================
+# 数学関数
+# ========================================
+
+def _round(x, digits, rounding):
+    # Excelと同じく有効桁15桁に丸めてから10進数で丸める（0.1*3 などの誤差対策）
+    digits = int(number(digits)) if digits is not None else 0
+    d = Decimal(format(number(x), '.15g'))
+    result = d.quantize(Decimal(1).scaleb(-digits), rounding=rounding)
+    return int(result) if digits <= 0 else float(result)
+
+
+def ROUND(x, digits=None):
+    return _round(x, digits, ROUND_HALF_UP)
+
+
+def ROUNDDOWN(x, digits=None):
+    return _round(x, digits, ROUND_DOWN)
+
+
+def ROUNDUP(x, digits=None):
+    return _round(x, digits, ROUND_UP)
+
+
+def TRUNC(x, digits=None):
+    return _round(x, digits, ROUND_DOWN)
+
+
+def INT(x):
+    return math.floor(number(x))
+
+
+def ABS(x):
+    return abs(number(x))
+
+
+def MOD(x, y):
+    y = number(y)
+    if y == 0:
+        raise ExcelError('#DIV/0!')
+    return number(x) % y
+
+
+def _multiple(x, significance, rounder):
+    significance = number(significance) if significance is not None else 1
+    if significance == 0:
+        return 0
+    return rounder(number(x) / significance) * significance
+
+
+def FLOOR(x, significance=None):
+    return _multiple(x, significance, math.floor)
+
+
+def CEILING(x, significance=None):
+    return _multiple(x, significance, math.ceil)
+
+
+def SUM(*args):
+    return sum(_flatten(args))
+
+
+def PRODUCT(*args):
+    return math.prod(_flatten(args))
+
+
+def MAX(*args):
+    return max(_flatten(args), default=0)
+
+
+def MIN(*args):
+    return min(_flatten(args), default=0)
+
+
+def AVERAGE(*args):
+    numbers = list(_flatten(args))
+    if not numbers:
+        raise ExcelError('#DIV/0!')
+    return sum(numbers) / len(numbers)
+
+
+def COUNT(*args):
+    return sum(1 for _ in _flatten(args))
+
+
+def COUNTA(*args):
+    count = 0
+    for arg in args:
+        if isinstance(arg, list):
+            count += sum(1 for row in arg for x in row if x is not None and x != '')
+        else:
+            count += 1
+    return count
+
+
+def SUMPRODUCT(*arrays):
+    rows = [[number(x) if isinstance(x, (int, float)) else 0 for row in a for x in row] for a in arrays]
+    if len({len(r) for r in rows}) > 1:
+        raise ExcelError('#VALUE!')
+    return sum(math.prod(values) for values in zip(*rows))
+
+
+# ========================================
+# 論理関数
+# ========================================
+
+def AND(*args):
+    return all(truth(x) for x in _logical_values(args))
+
+
+def OR(*args):
+    return any(truth(x) for x in _logical_values(args))
+
+
+def NOT(x):
+    return not truth(x)
+
+
+def _logical_values(args):
+    for arg in args:
+        if isinstance(arg, list):
+            for row in arg:
+                for x in row:
+                    if isinstance(x, ExcelError):
+                        raise x
+                    if isinstance(x, (bool, int, float)):
+                        yield x
+        else:
+            yield arg
+
+
+def IFERROR(value_thunk, fallback_thunk):
+    """引数は遅延評価（コンパイラが lambda で渡す）"""
+    try:
+        return scalar(value_thunk())
+    except ExcelError:
+        return fallback_thunk()
+
+
+def ISBLANK(x):
+    return scalar(x) is None
+
+
+def ISERROR(value_thunk):
+    try:
+        scalar(value_thunk())
+    except ExcelError:
+        return True
+    return False
+
+
+def ISNUMBER(x):
+    x = scalar(x)
+    return isinstance(x, (int, float)) and not isinstance(x, bool)
+
+
+def CHOOSE(index, *choices):
+    index = int(number(index))
+    if not 1 <= index <= len(choices):
+        raise ExcelError('#VALUE!')
+    return choices[index - 1]
+
+
+# ========================================
+# 検索関数
+# ========================================
+
+def _match_position(lookup, values, match_type):
+    """MATCH と同じ規則で 0 始まりの位置を返す"""
+    lookup = scalar(lookup)
+    match_type = 1 if match_type is None else int(number(match_type))
+    if match_type == 0:
+        key = _sort_key(lookup)
+        for i, x in enumerate(values):
+            if x is not None and _sort_key(x) == key:
+                return i
+        raise ExcelError('#N/A')
+
+    # 近似一致: 昇順（match_type=1）なら lookup 以下の最後、降順（-1）なら lookup 以上の最後
+    key = _sort_key(lookup)
+    found = None
+    for i, x in enumerate(values):
+        if x is None or _sort_key(x)[0] != key[0]:
+            continue
+        if (match_type > 0 and _sort_key(x) <= key) or (match_type < 0 and _sort_key(x) >= key):
+            found = i
+        else:
+            break
+    if found is None:
+        raise ExcelError('#N/A')
+    return found
+
+
+def _range(table):
+    if not isinstance(table, list):
+        return [[table]]
+    return table
+
+
+def VLOOKUP(lookup, table, column, approximate=None):
+    table = _range(table)
+    column = int(number(column))
+    if not 1 <= column <= len(table[0]):
+        raise ExcelError('#REF!')
+    exact = approximate is not None and not truth(approximate)
+    row = _match_position(lookup, [r[0] for r in table], 0 if exact else 1)
+    return scalar(table[row][column - 1])
+
+
+def HLOOKUP(lookup, table, row, approximate=None):
+    table = _range(table)
+    row = int(number(row))
+    if not 1 <= row <= len(table):
+        raise ExcelError('#REF!')
+    exact = approximate is not None and not truth(approximate)
+    column = _match_position(lookup, table[0], 0 if exact else 1)
+    return scalar(table[row - 1][column])
+
+
+def MATCH(lookup, values, match_type=None):
+    values = _range(values)
+    flat = [r[0] for r in values] if len(values[0]) == 1 else values[0]
+    return _match_position(lookup, flat, match_type) + 1
+
+
+def INDEX(table, row, column=None):
+    table = _range(table)
+    row = int(number(row))
+    column = int(number(column)) if column is not None else 1
+    if len(table) == 1 and column == 1 and row > 1:
+        # 1行の範囲は INDEX(範囲, 列番号) と書ける
+        row, column = 1, row
+    if not (1 <= row <= len(table) and 1 <= column <= len(table[0])):
+        raise ExcelError('#REF!')
+    return scalar(table[row - 1][column - 1])
+
+
+def LOOKUP(lookup, values, results=None):
+    values = _range(values)
+    flat = [r[0] for r in values] if len(values[0]) == 1 else values[0]
+    position = _match_position(lookup, flat, 1)
+    if results is None:
+        return scalar(flat[position])
+    results = _range(results)
+    flat_results = [r[0] for r in results] if len(results[0]) == 1 else results[0]
+    return scalar(flat_results[position])
+
+
+# ========================================
+# 文字列関数
+# ========================================
+
+def CONCATENATE(*args):
+    return ''.join(text(x) for x in args)
+
+
+def LEN(x):
+    return len(text(x))
+
+
+def LEFT(x, count=None):
+    return text(x)[:int(number(count)) if count is not None else 1]
+
+
+def RIGHT(x, count=None):
+    count = int(number(count)) if count is not None else 1
+    return text(x)[-count:] if count else ''
+
+
+def VALUE(x):
+    x = scalar(x)
+    if isinstance(x, str):
+        try:
+            return float(x.replace(',', ''))
+        except ValueError:
+            raise ExcelError('#VALUE!')
+    return number(x)
+
+
+# 数式から呼び出せる関数（IF は条件式としてコンパイルする）
+FUNCTIONS = {
+    name: function for name, function in globals().items()
+    if name.isupper() and callable(function)
+}
+
+# 引数を lambda で遅延評価する関数
+LAZY_FUNCTIONS = {'IFERROR', 'ISERROR'}
@@ -0,0 +1,231 @@
+"""
+Excel数式の構文解析
+openpyxl のトークナイザでトークンに分け、演算子の優先順位に従って構文木を作る
+"""
+from openpyxl.formula.tokenizer import Token, Tokenizer, TokenizerError
+
+
+class FormulaError(ValueError):
+    """解釈・コンパイルできない数式"""
+
+
+# ========================================
+# 構文木
+# ========================================
+
+class Node:
+    __slots__ = ()
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def __repr__(self):
+        values = ', '.join(repr(getattr(self, name)) for name in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+
+class Constant(Node):
+    """数値・文字列・論理値"""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class ErrorLiteral(Node):
+    """#N/A などのエラー値"""
+    __slots__ = ('code',)
+
+    def __init__(self, code):
+        self.code = code
+
+
+class Array(Node):
+    """配列定数 {1,2;3,4}"""
+    __slots__ = ('rows',)
+
+    def __init__(self, rows):
+        self.rows = rows
+
+
+class Reference(Node):
+    """セル・範囲・名前の参照（A1, $A$1:$B$3, Sheet1!A1, 名前）"""
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+
+class Unary(Node):
+    __slots__ = ('op', 'operand')
+
+    def __init__(self, op, operand):
+        self.op = op
+        self.operand = operand
+
+
+class Binary(Node):
+    __slots__ = ('op', 'left', 'right')
+
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+
+class Call(Node):
+    __slots__ = ('name', 'args')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+
+# ========================================
+# 構文解析
+# ========================================
+
+# 二項演算子の優先順位（大きいほど先に結合する）
+BINARY_PRECEDENCE = {
+    '=': 1, '<>': 1, '<': 1, '>': 1, '<=': 1, '>=': 1,
+    '&': 2,
+    '+': 3, '-': 3,
+    '*': 4, '/': 4,
+    '^': 5,
+}
+
+
+def _operand(token):
+    if token.subtype == Token.NUMBER:
+        value = float(token.value)
+        return Constant(int(value) if value.is_integer() and 'E' not in token.value.upper() else value)
+    if token.subtype == Token.TEXT:
+        return Constant(token.value[1:-1].replace('""', '"'))
+    if token.subtype == Token.LOGICAL:
+        return Constant(token.value.upper() == 'TRUE')
+    if token.subtype == Token.ERROR:
+        return ErrorLiteral(token.value.upper())
+    return Reference(token.value)
+
+
+class Parser:
+    def __init__(self, formula):
+        self.formula = formula
+        try:
+            tokens = Tokenizer(formula if formula.startswith('=') else '=' + formula).items
+        except TokenizerError as e:
+            raise FormulaError(f"数式を解釈できません: {formula}: {e}")
+        self.tokens = [t for t in tokens if t.type != Token.WSPACE]
+        self.position = 0
+
+    def error(self, message):
+        return FormulaError(f"{message}: {self.formula}")
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def next(self):
+        token = self.peek()
+        if token is None:
+            raise self.error("数式が途中で終わっています")
+        self.position += 1
+        return token
+
+    def parse(self):
+        node = self.expression(0)
+        if self.peek() is not None:
+            raise self.error(f"予期しないトークン {self.peek().value!r}")
+        return node
+
+    def expression(self, min_precedence):
+        left = self.unary()
+        while True:
+            token = self.peek()
+            if token is None or token.type != Token.OP_IN:
+                return left
+            precedence = BINARY_PRECEDENCE.get(token.value)
+            if precedence is None:
+                raise self.error(f"未対応の演算子 {token.value!r}")
+            if precedence < min_precedence:
+                return left
+            self.next()
+            # すべて左結合（Excel では ^ も左結合）
+            left = Binary(token.value, left, self.expression(precedence + 1))
+
+    def unary(self):
+        # Excel では単項マイナスが ^ より先に結合する（-2^2 = 4）
+        token = self.peek()
+        if token is not None and token.type == Token.OP_PRE:
+            self.next()
+            return Unary(token.value, self.unary())
+        node = self.primary()
+        while self.peek() is not None and self.peek().type == Token.OP_POST:
+            self.next()
+            node = Unary('%', node)
+        return node
+
+    def primary(self):
+        token = self.next()
+        if token.type == Token.OPERAND:
+            return _operand(token)
+        if token.type == Token.PAREN and token.subtype == Token.OPEN:
+            node = self.expression(0)
+            self.expect(Token.PAREN)
+            return node
+        if token.type == Token.FUNC and token.subtype == Token.OPEN:
+            return Call(token.value[:-1].upper(), self.arguments())
+        if token.type == Token.ARRAY and token.subtype == Token.OPEN:
+            return self.array()
+        raise self.error(f"予期しないトークン {token.value!r}")
+
+    def expect(self, token_type):
+        token = self.next()
+        if token.type != token_type or token.subtype != Token.CLOSE:
+            raise self.error(f"閉じ括弧がありません（{token.value!r}）")
+
+    def arguments(self):
+        args = []
+        token = self.peek()
+        if token is not None and token.type == Token.FUNC and token.subtype == Token.CLOSE:
+            self.next()
+            return args
+        while True:
+            token = self.peek()
+            if token is not None and (token.type == Token.SEP or token.type == Token.FUNC and token.subtype == Token.CLOSE):
+                # 省略された引数（ROUND(A1,) など）
+                args.append(None)
+            else:
+                args.append(self.expression(0))
+            token = self.next()
+            if token.type == Token.FUNC and token.subtype == Token.CLOSE:
+                return args
+            if token.type != Token.SEP or token.subtype != Token.ARG:
+                raise self.error(f"引数の区切りがありません（{token.value!r}）")
+
+    def array(self):
+        rows = [[]]
+        while True:
+            token = self.next()
+            if token.type == Token.ARRAY and token.subtype == Token.CLOSE:
+                return Array(rows)
+            if token.type == Token.SEP:
+                if token.subtype == Token.ROW:
+                    rows.append([])
+                continue
+            if token.type == Token.OP_PRE and token.value == '-':
+                token = self.next()
+                rows[-1].append(-_operand(token).value)
+                continue
+            if token.type != Token.OPERAND or token.subtype == Token.RANGE:
+                raise self.error(f"配列定数に使えない値 {token.value!r}")
+            node = _operand(token)
+            rows[-1].append(node.value if isinstance(node, Constant) else node)
+
+
+def parse(formula):
+    """数式（先頭の = は省略可）を構文木に変換"""
+    return Parser(formula).parse()
@@ -0,0 +1,111 @@
+"""
+給与計算Excelの数式で SalaryRecord を計算する
+ブックの月の列に SalaryRecord の入力項目を書き込み、下流の数式だけを再計算して
+数式セルの結果（所得税・社会保険料・合計など）をレコードに反映する
+"""
+from decimal import Decimal
+
+from django.db import models
+
+from ..importers import ROW_ALIASES, month_columns, row_field
+from ..models import SalaryRecord
+from . import functions
+from .functions import ExcelError
+from .workbook import FormulaWorkbook, coordinate
+
+
+# 取込と違い、計算項目（支給総額など）の行も結果の読み出しに使う
+ROW_LABELS = {
+    **{
+        field.verbose_name: field.name
+        for field in SalaryRecord._meta.concrete_fields
+        if field.name not in ('id', 'year_month', 'created_at', 'updated_at', 'memo')
+    },
+    **ROW_ALIASES,
+}
+
+
+class PayrollCalculator:
+    """
+    workbook: FormulaWorkbook
+    sheet を省略した場合は、月の見出し行がある最初のシートを使う
+    """
+
+    def __init__(self, workbook, sheet=None):
+        self.workbook = workbook
+        sheets = [sheet] if sheet is not None else list(workbook.dimensions)
+        for name in sheets:
+            layout = self._find_layout(name)
+            if layout is not None:
+                self.sheet, self.columns, self.rows = name, *layout
+                break
+        else:
+            raise ValueError("月の見出し行（例: 2025年1月）が見つかりません")
+
+    @classmethod
+    def load(cls, path, sheet=None):
+        return cls(FormulaWorkbook.load(path), sheet=sheet)
+
+    def _find_layout(self, sheet):
+        """{年月: 列}, {フィールド名: 行} を返す（見出し行がなければ None）"""
+        max_row, max_column = self.workbook.dimensions[sheet]
+        values = self.workbook.values
+        columns, rows = None, {}
+        for r in range(1, max_row + 1):
+            row = [values.get((sheet, r, c)) for c in range(1, max_column + 1)]
+            if columns is None:
+                header = month_columns(row)
+                if header:
+                    columns = {year_month: i + 1 for i, year_month in header.items()}
+                    label_end = min(header)
+                continue
+            field_name = row_field(row, label_end, ROW_LABELS)
+            if field_name is not None and field_name not in rows:
+                rows[field_name] = r
+        if columns is None:
+            return None
+        return columns, rows
+
+    def column_for(self, year_month):
+        """年月の列（ブックにない月は、それより前の最後の列を雛形として使う）"""
+        if year_month in self.columns:
+            return self.columns[year_month]
+        earlier = [m for m in self.columns if m < year_month]
+        return self.columns[max(earlier) if earlier else min(self.columns)]
+
+    def calculate(self, record):
+        """
+        record の入力項目をブックに書き込み、数式セルの結果を record に反映して返す
+        save() は calculate_all() で合計を計算し直すため、結果をそのまま保存する場合は
+        bulk_update / update を使う
+        """
+        column = self.column_for(record.year_month)
+        fields = {field.name: field for field in SalaryRecord._meta.concrete_fields}
+
+        inputs, outputs = {}, {}
+        for name, row in self.rows.items():
+            key = (self.sheet, row, column)
+            if key in self.workbook.compiled:
+                outputs[name] = key
+            elif key not in self.workbook.uncompiled:
+                value = getattr(record, name)
+                inputs[key] = float(value) if isinstance(value, Decimal) else value
+        self.workbook.set_values(inputs)
+
+        for name, key in outputs.items():
+            value = self.workbook.values[key]
+            if isinstance(value, ExcelError):
+                raise ValueError(f"{coordinate(key)} がエラーになりました: {value}")
+            # IF(x="","",...) の空文字列は空欄として 0、それ以外は Excel と同じ規則で数値にする
+            if value == '':
+                value = None
+            try:
+                value = functions.number(value)
+            except ExcelError:
+                raise ValueError(f"{coordinate(key)} を数値に変換できません: {value!r}")
+            if isinstance(fields[name], models.DecimalField):
+                value = Decimal(str(value)).quantize(Decimal(1).scaleb(-fields[name].decimal_places))
+            else:
+                value = int(round(value))
+            setattr(record, name, value)
+        return record
@@ -0,0 +1,248 @@
+"""
+ブック全体の数式の依存グラフと再計算
+- 数式セルをコンパイルし、参照関係から依存グラフとトポロジカル順序を作る
+- 入力セルを変更したときは、その下流の数式セルだけを順序どおりに再計算する
+- ブックに保存されている計算結果（キャッシュ値）との照合ができる
+"""
+import re
+from collections import defaultdict, deque
+
+from openpyxl.utils.cell import get_column_letter, range_boundaries
+
+from .compiler import compile_formula
+from .functions import ExcelError
+from .parser import FormulaError
+
+
+# セル値の比較の許容誤差（Excelは有効桁15桁）
+RELATIVE_TOLERANCE = 1e-9
+
+EXCEL_ERRORS = {'#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#N/A'}
+
+SHEET_PATTERN = re.compile(r"^(?:'((?:[^']|'')+)'|([^'!]+))!(.+)$")
+
+
+def coordinate(key):
+    """キー (シート名, 行, 列) を 'シート名!A1' 形式にする"""
+    sheet, row, column = key
+    return f"{sheet}!{get_column_letter(column)}{row}"
+
+
+def values_equal(expected, actual):
+    """キャッシュ値と計算結果が一致するか（数値は許容誤差つき）"""
+    if isinstance(actual, ExcelError) or isinstance(expected, ExcelError):
+        return str(expected) == str(actual)
+    if expected is None:
+        expected = 0 if isinstance(actual, (int, float)) else ''
+    if isinstance(expected, bool) or isinstance(actual, bool):
+        return expected is actual or expected == actual and type(expected) is type(actual)
+    if isinstance(expected, (int, float)) and isinstance(actual, (int, float)):
+        return abs(expected - actual) <= RELATIVE_TOLERANCE * max(1, abs(expected))
+    return expected == actual
+
+
+class FormulaWorkbook:
+    """
+    ブックの値と数式
+    values: {(シート名, 行, 列): 値}（数式セルは計算結果）
+    """
+
+    def __init__(self, dimensions, defined_names=None):
+        self.dimensions = dimensions            # {シート名: (最大行, 最大列)}
+        self.defined_names = defined_names or {}  # {名前: 'シート名!$A$1:$B$3'}
+        self.values = {}
+        self.formulas = {}                      # {キー: 数式文字列}
+        self.compiled = {}                      # {キー: CompiledFormula}
+        self.uncompiled = {}                    # {キー: エラーメッセージ}（キャッシュ値を定数として扱う）
+        self.dependents = defaultdict(set)
+        self.order = {}                         # {キー: トポロジカル順序}
+
+    # ----------------------------------------
+    # 読み込み
+    # ----------------------------------------
+
+    @classmethod
+    def load(cls, path):
+        """
+        ブックを読み込む（数式とキャッシュ値でそれぞれ1回ずつ順に走査）
+        数式セルの初期値はブックに保存されている計算結果
+        """
+        from openpyxl import load_workbook
+
+        formulas = load_workbook(path, read_only=True, data_only=False, keep_vba=False)
+        cached = load_workbook(path, read_only=True, data_only=True, keep_vba=False)
+        try:
+            workbook = cls(
+                dimensions={},
+                defined_names={
+                    name: definition.attr_text
+                    for name, definition in formulas.defined_names.items()
+                },
+            )
+            for sheet in formulas.sheetnames:
+                max_row, max_column = 0, 0
+                for row in formulas[sheet].iter_rows():
+                    for cell in row:
+                        if cell.value is None or not hasattr(cell, 'column'):
+                            continue
+                        key = (sheet, cell.row, cell.column)
+                        max_row, max_column = max(max_row, cell.row), max(max_column, cell.column)
+                        text = getattr(cell.value, 'text', cell.value)  # 配列数式
+                        if isinstance(text, str) and text.startswith('=') and len(text) > 1:
+                            workbook.formulas[key] = text
+                        else:
+                            workbook.values[key] = cell.value
+                workbook.dimensions[sheet] = (max_row, max_column)
+
+                for row in cached[sheet].iter_rows():
+                    for cell in row:
+                        if not hasattr(cell, 'column'):
+                            continue
+                        key = (sheet, cell.row, cell.column)
+                        if key in workbook.formulas:
+                            workbook.values[key] = _cached_value(cell.value)
+        finally:
+            formulas.close()
+            cached.close()
+
+        workbook.compile()
+        return workbook
+
+    # ----------------------------------------
+    # 参照の解決・コンパイル
+    # ----------------------------------------
+
+    def resolver(self, sheet):
+        """sheet 上の数式の参照文字列をキーに変換する関数"""
+
+        def resolve(text):
+            target = self.defined_names.get(text, text)
+            match = SHEET_PATTERN.match(target)
+            if match:
+                target_sheet = (match.group(1) or '').replace("''", "'") or match.group(2)
+                reference = match.group(3)
+            elif text in self.defined_names:
+                raise FormulaError(f"名前の参照先を解釈できません: {text}")
+            else:
+                target_sheet, reference = sheet, target
+            if target_sheet not in self.dimensions:
+                raise FormulaError(f"シートが見つかりません: {target_sheet}")
+
+            try:
+                min_column, min_row, max_column, max_row = range_boundaries(reference.replace('$', ''))
+            except (ValueError, TypeError):
+                raise FormulaError(f"参照を解釈できません: {text}")
+            # 列全体（A:A）・行全体（1:1）は使用範囲までに限定する
+            sheet_rows, sheet_columns = self.dimensions[target_sheet]
+            min_row, min_column = min_row or 1, min_column or 1
+            max_row = max_row or max(sheet_rows, min_row)
+            max_column = max_column or max(sheet_columns, min_column)
+
+            if (min_row, min_column) == (max_row, max_column) and ':' not in reference:
+                return 'cell', (target_sheet, min_row, min_column)
+            return 'range', tuple(
+                tuple((target_sheet, r, c) for c in range(min_column, max_column + 1))
+                for r in range(min_row, max_row + 1)
+            )
+
+        return resolve
+
+    def compile(self):
+        """全数式をコンパイルし、依存グラフとトポロジカル順序を作る"""
+        self.compiled, self.uncompiled = {}, {}
+        for key, formula in self.formulas.items():
+            try:
+                self.compiled[key] = compile_formula(formula, self.resolver(key[0]))
+            except FormulaError as e:
+                self.uncompiled[key] = str(e)
+
+        self.dependents = defaultdict(set)
+        for key, compiled in self.compiled.items():
+            for precedent in compiled.precedents:
+                self.dependents[precedent].add(key)
+        self.order = self._topological_order()
+
+    def _topological_order(self):
+        """数式セルの計算順（循環参照があれば FormulaError）"""
+        remaining = {
+            key: sum(1 for p in compiled.precedents if p in self.compiled)
+            for key, compiled in self.compiled.items()
+        }
+        queue = deque(key for key, count in remaining.items() if count == 0)
+        order = {}
+        while queue:
+            key = queue.popleft()
+            order[key] = len(order)
+            for dependent in self.dependents.get(key, ()):
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    queue.append(dependent)
+        if len(order) != len(self.compiled):
+            cycle = sorted(coordinate(key) for key in self.compiled if key not in order)
+            raise FormulaError(f"循環参照があります: {', '.join(cycle[:10])}")
+        return order
+
+    # ----------------------------------------
+    # 再計算
+    # ----------------------------------------
+
+    def downstream(self, keys):
+        """keys に依存する数式セル（間接的なものを含む）を計算順に返す"""
+        found = set()
+        queue = deque(keys)
+        while queue:
+            for dependent in self.dependents.get(queue.popleft(), ()):
+                if dependent not in found:
+                    found.add(dependent)
+                    queue.append(dependent)
+        return sorted(found, key=self.order.__getitem__)
+
+    def recalculate(self, keys=None):
+        """
+        keys の下流の数式セルを再計算（省略時はすべて）
+        値が変わったセルのキーの集合を返す
+        """
+        targets = sorted(self.compiled, key=self.order.__getitem__) if keys is None else self.downstream(keys)
+        changed = set()
+        values = self.values
+        for key in targets:
+            value = self.compiled[key](values)
+            if key not in values or not values_equal(values[key], value):
+                changed.add(key)
+            values[key] = value
+        return changed
+
+    def set_values(self, inputs):
+        """
+        入力セルの値を変更し、影響する数式セルだけを再計算する
+        inputs: {キー: 値}、戻り値: 値が変わったセルのキーの集合
+        """
+        for key in inputs:
+            if key in self.compiled:
+                raise ValueError(f"数式セルには値を設定できません: {coordinate(key)}")
+        changed = {key for key, value in inputs.items() if self.values.get(key) != value}
+        self.values.update(inputs)
+        return changed | self.recalculate(changed)
+
+    # ----------------------------------------
+    # キャッシュ値との照合
+    # ----------------------------------------
+
+    def verify(self):
+        """
+        入力セルの値だけから全数式を計算し直し、ブックのキャッシュ値と照合する
+        戻り値: [(キー, 数式, キャッシュ値, 計算結果), ...]
+        """
+        cached = {key: self.values.get(key) for key in self.compiled}
+        self.recalculate()
+        return [
+            (key, self.formulas[key], cached[key], self.values[key])
+            for key in sorted(self.compiled, key=self.order.__getitem__)
+            if not values_equal(cached[key], self.values[key])
+        ]
+
+
+def _cached_value(value):
+    if isinstance(value, str) and value in EXCEL_ERRORS:
+        return ExcelError(value)
+    return value
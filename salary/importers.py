@@ -0,0 +1,207 @@
+"""
+給与計算Excel（月ごとに1列のレイアウト）の取込
+ブックを read_only / data_only で開いて行を1回だけ順に読み、
+全月を1回の bulk_create(update_conflicts=True) で登録・更新する
+
+想定レイアウト:
+    |          | 2025年1月 | 2025年2月 | ...
+    | 基本給   |   300000  |   300000  | ...
+    | 時間外手当 |   12000  |    8000   | ...
+"""
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import models, transaction
+
+from common.months import month_start
+from common.signals import post_bulk_create
+
+from .models import SalaryRecord
+
+
+# 見出し行を探す範囲（先頭からの行数）
+HEADER_SEARCH_ROWS = 30
+
+# 取込まない項目（計算項目・メタデータ）
+EXCLUDED_FIELDS = set(SalaryRecord.CALCULATED_FIELDS) | {'id', 'year_month', 'created_at', 'updated_at', 'memo'}
+
+# 行の見出し -> SalaryRecord のフィールド名
+# モデルの verbose_name に加えて、Excel側の表記ゆれを登録する
+ROW_ALIASES = {
+    **{
+        field.verbose_name: field.name
+        for field in SalaryRecord._meta.concrete_fields
+        if field.name not in EXCLUDED_FIELDS
+    },
+    '所得税': 'monthly_income_tax',
+    '源泉所得税': 'monthly_income_tax',
+    '扶養人数': 'dependent_family_count',
+    '標準報酬月額': 'insurance_standard_salary',
+}
+
+MONTH_PATTERN = re.compile(r'^(\d{4})\s*[年/\-.]\s*(\d{1,2})\s*月?$')
+
+
+class ImportCellError(ValueError):
+    """取込できないセル"""
+
+
+def _parse_month(value):
+    """見出しセルを月初日に変換（月でなければ None）"""
+    if isinstance(value, (datetime, date)):
+        return month_start(value)
+    if isinstance(value, str):
+        match = MONTH_PATTERN.match(value.strip())
+        if match:
+            year, month = int(match.group(1)), int(match.group(2))
+            if 1 <= month <= 12:
+                return date(year, month, 1)
+    return None
+
+
+def _parse_number(field, value):
+    """セルの値をフィールドの型に変換（空欄は None）"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip().replace(',', '').replace('円', '')
+        if not value:
+            return None
+    try:
+        number = Decimal(str(value))
+    except InvalidOperation:
+        raise ImportCellError(f"{field.verbose_name}を数値に変換できません: {value!r}")
+    if isinstance(field, models.DecimalField):
+        return number.quantize(Decimal(1).scaleb(-field.decimal_places))
+    return int(number.to_integral_value())
+
+
+def month_columns(row):
+    """見出し行の {列インデックス: 年月}（月の見出しがなければ空）"""
+    return {i: m for i, m in enumerate(map(_parse_month, row)) if m is not None}
+
+
+def row_field(row, label_end, aliases=ROW_ALIASES):
+    """月の列より左にある見出しから行の項目（フィールド名）を特定"""
+    return next((
+        aliases[cell.strip()] for cell in row[:label_end]
+        if isinstance(cell, str) and cell.strip() in aliases
+    ), None)
+
+
+class SalaryWorkbookImporter:
+    """
+    給与計算Excelの取込
+    - 見出し行の月ごとの列を SalaryRecord 1件に対応させる
+    - 既存の月は取込んだ項目だけを上書きし、計算項目を再計算する
+    """
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+
+    def import_file(self, path, sheet=None):
+        """
+        ブックを取込
+        sheet を省略した場合は、月の見出し行がある最初のシートを使う
+        """
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True, keep_vba=False)
+        try:
+            if sheet is not None:
+                worksheets = [workbook[sheet]]
+            else:
+                worksheets = workbook.worksheets
+            for worksheet in worksheets:
+                values = self._read_sheet(worksheet)
+                if values is not None:
+                    self._save(values)
+                    return self
+        finally:
+            workbook.close()
+        raise ValueError("月の見出し行（例: 2025年1月）が見つかりません")
+
+    def _read_sheet(self, worksheet):
+        """
+        シートを1回だけ走査して {年月: {フィールド名: 値}} を返す
+        見出し行がなければ None
+        """
+        from openpyxl.utils import get_column_letter
+
+        fields = {field.name: field for field in SalaryRecord._meta.concrete_fields}
+        header = None
+        values = {}
+        seen = set()
+
+        for row_number, row in enumerate(worksheet.iter_rows(values_only=True), start=1):
+            if header is None:
+                columns = month_columns(row)
+                if columns:
+                    header = columns
+                    values = {m: {} for m in columns.values()}
+                    label_end = min(columns)
+                elif row_number >= HEADER_SEARCH_ROWS:
+                    return None
+                continue
+
+            # 同じ項目が複数あれば最初の行
+            field_name = row_field(row, label_end)
+            if field_name is None or field_name in seen:
+                continue
+            seen.add(field_name)
+
+            for column, year_month in header.items():
+                if column >= len(row):
+                    continue
+                try:
+                    number = _parse_number(fields[field_name], row[column])
+                except ImportCellError as e:
+                    self.errors.append((f"{get_column_letter(column + 1)}{row_number}", str(e)))
+                    continue
+                if number is not None:
+                    values[year_month][field_name] = number
+
+        if header is None:
+            return None
+        # 値が1つもない月（未入力の列）は取込まない
+        return {year_month: v for year_month, v in values.items() if v}
+
+    def _save(self, values):
+        """全月を1回の bulk_create で登録・更新（既存の月は取込んだ項目だけを上書き）"""
+        if not values:
+            return
+        existing = SalaryRecord.objects.in_bulk(list(values), field_name='year_month')
+
+        records = []
+        for year_month, fields in sorted(values.items()):
+            record = existing.get(year_month) or SalaryRecord(year_month=year_month)
+            # 主キーの有無で INSERT が2回に分かれないよう、year_month の衝突だけで更新する
+            record.pk = None
+            for name, value in fields.items():
+                setattr(record, name, value)
+            record.calculate_all()
+            records.append(record)
+
+        update_fields = [
+            field.name for field in SalaryRecord._meta.concrete_fields
+            if field.name not in ('id', 'year_month', 'created_at')
+        ]
+        with transaction.atomic():
+            SalaryRecord.objects.bulk_create(
+                records,
+                update_conflicts=True,
+                unique_fields=['year_month'],
+                update_fields=update_fields,
+            )
+            post_bulk_create.send(sender=SalaryRecord, objs=records)
+
+        self.updated += len(existing)
+        self.created += len(records) - len(existing)
+
+
+def import_salary_workbook(path, sheet=None):
+    """給与計算Excelを取込み、取込結果（SalaryWorkbookImporter）を返す"""
+    return SalaryWorkbookImporter().import_file(path, sheet=sheet)
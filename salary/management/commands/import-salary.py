@@ -0,0 +1,48 @@
+"""
+給与計算Excelの取込
+
+使い方:
+    python manage.py import-salary 給与計算用エクセル202510.xlsm
+    python manage.py import-salary payroll.xlsx --sheet 給与明細
+
+見出し行に月（2025年1月 / 2025/1 / 日付セル）が並び、
+左端の列に項目名（基本給、時間外手当 など）が並ぶレイアウトを想定
+"""
+from zipfile import BadZipFile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from salary.importers import SalaryWorkbookImporter
+
+
+class Command(BaseCommand):
+    help = '給与計算Excelから給与明細を一括で取り込みます（既存の月は上書き）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='取込むExcelファイル（.xlsx / .xlsm）'
+        )
+        parser.add_argument(
+            '--sheet',
+            help='シート名（省略時は月の見出し行がある最初のシート）'
+        )
+
+    def handle(self, *args, **options):
+        importer = SalaryWorkbookImporter()
+        try:
+            importer.import_file(options['path'], sheet=options['sheet'])
+        except ImportError:
+            raise CommandError("Excelの取込には openpyxl が必要です: pip install openpyxl")
+        except KeyError:
+            raise CommandError(f"シートが見つかりません: {options['sheet']}")
+        except (OSError, ValueError, BadZipFile) as e:
+            raise CommandError(f"{options['path']} を読み込めません: {e}")
+
+        for coordinate, message in importer.errors:
+            self.stderr.write(f"{coordinate}: {message}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"新規: {importer.created}件、更新: {importer.updated}件、"
+            f"エラー: {len(importer.errors)}件"
+        ))
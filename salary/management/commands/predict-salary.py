@@ -0,0 +1,59 @@
+"""
+手取り給与の予測
+
+使い方:
+    python manage.py predict-salary 2025-01
+    python manage.py predict-salary 2025-01 --months 12 --history 36
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from common.months import parse_year_month
+from salary import prediction
+
+
+class Command(BaseCommand):
+    help = '給与明細の履歴から将来の月の手取り給与を予測します'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'start',
+            help='予測開始年月（YYYY-MM）'
+        )
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=1,
+            help='予測する月数'
+        )
+        parser.add_argument(
+            '--history',
+            type=int,
+            default=prediction.DEFAULT_HISTORY_MONTHS,
+            help='傾向を推定する過去の月数'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start = parse_year_month(options['start'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if options['months'] < 1:
+            raise CommandError('--months は1以上を指定してください')
+
+        try:
+            rows = prediction.predict_months(start, options['months'], options['history'])
+        except ImportError as e:
+            raise CommandError(str(e))
+        if not rows:
+            raise CommandError('給与明細が登録されていないため予測できません')
+
+        self.stdout.write(
+            f"{'年月':<8} {'残業(分)':>8} {'残業代':>9} {'深夜':>8} {'休日':>8} "
+            f"{'支給総額':>10} {'所得税':>8} {'控除合計':>10} {'手取り':>10}"
+        )
+        for row in rows:
+            self.stdout.write(
+                f"{row['year_month']:%Y-%m}  {row['overtime_quantity']:>10,.0f} {row['overtime_pay']:>12,} "
+                f"{row['night_work_pay']:>10,} {row['holiday_work_pay']:>10,} {row['total_payment']:>13,} "
+                f"{row['monthly_income_tax']:>11,} {row['total_deduction']:>13,} {row['actual_payment']:>13,}"
+            )
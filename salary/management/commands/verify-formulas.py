@@ -0,0 +1,51 @@
+"""
+給与計算Excelの数式をPythonにコンパイルし、ブックに保存されている計算結果と照合
+
+使い方:
+    python manage.py verify-formulas 給与計算用エクセル202510.xlsm
+    python manage.py verify-formulas payroll.xlsm --show-unsupported
+"""
+from zipfile import BadZipFile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from salary.formulas import FormulaError, FormulaWorkbook, coordinate
+
+
+class Command(BaseCommand):
+    help = '給与計算Excelの数式を再計算し、ブックのキャッシュ値と一致するか検証します'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='検証するExcelファイル（.xlsx / .xlsm）'
+        )
+        parser.add_argument(
+            '--show-unsupported',
+            action='store_true',
+            help='コンパイルできなかった数式を表示する'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            workbook = FormulaWorkbook.load(options['path'])
+        except FormulaError as e:
+            raise CommandError(str(e))
+        except (OSError, ValueError, BadZipFile) as e:
+            raise CommandError(f"{options['path']} を読み込めません: {e}")
+
+        if options['show_unsupported']:
+            for key, message in sorted(workbook.uncompiled.items()):
+                self.stderr.write(f"{coordinate(key)}: {message}")
+
+        mismatches = workbook.verify()
+        for key, formula, expected, actual in mismatches:
+            self.stderr.write(f"{coordinate(key)} {formula}: ブック={expected!r} 計算結果={actual!r}")
+
+        summary = (
+            f"数式: {len(workbook.formulas)}個（コンパイル済み {len(workbook.compiled)}個、"
+            f"未対応 {len(workbook.uncompiled)}個）"
+        )
+        if mismatches:
+            raise CommandError(f"{summary}、不一致: {len(mismatches)}個")
+        self.stdout.write(self.style.SUCCESS(f"{summary}、すべてブックの計算結果と一致しました"))
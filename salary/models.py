@@ -1,7 +1,58 @@
 from django.db import models
+from django.db.models import F, Window
+from django.db.models.functions import Lag, Lead
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
+from common.months import add_months, month_start
+
+
+# with_neighbors() で前月・翌月の値を付ける既定の項目
+NEIGHBOR_FIELDS = ['total_payment', 'total_deduction', 'actual_payment']
+
+
+class SalaryRecordQuerySet(models.QuerySet):
+
+    def month_index(self):
+        """{年月: レコード} の辞書（1クエリ）"""
+        return {record.year_month: record for record in self}
+
+    def with_neighbors(self, fields=NEIGHBOR_FIELDS):
+        """
+        前後の行の値をウィンドウ関数（Lag / Lead）で付ける（1クエリ）
+        previous_year_month / next_year_month と previous_<項目> / next_<項目>
+        前後の行はクエリセットの絞り込み後の行なので、月が抜けている場合は
+        previous_year_month が前月と一致するか確認すること
+        """
+        window = {'order_by': F('year_month').asc()}
+        annotations = {}
+        for field in ['year_month', *fields]:
+            annotations[f'previous_{field}'] = Window(Lag(field), **window)
+            annotations[f'next_{field}'] = Window(Lead(field), **window)
+        return self.annotate(**annotations).order_by('year_month')
+
+    def between_with_neighbors(self, start, end):
+        """
+        start～end の月のレコードを、前月・翌月のレコードを付けて返す（1クエリ）
+        範囲を前後1ヶ月広げて読み込み、get_previous_month / get_next_month が
+        クエリを発行せずに返せるようにする
+        """
+        start, end = month_start(start), month_start(end)
+        index = self.filter(
+            year_month__gte=add_months(start, -1),
+            year_month__lte=add_months(end, 1)
+        ).month_index()
+        records = []
+        for year_month in sorted(index):
+            if start <= year_month <= end:
+                record = index[year_month]
+                record._neighbor_cache = {
+                    'previous': index.get(add_months(year_month, -1)),
+                    'next': index.get(add_months(year_month, 1)),
+                }
+                records.append(record)
+        return records
+
 
 class SalaryRecord(models.Model):
     """
@@ -274,6 +325,14 @@ class SalaryRecord(models.Model):
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
     memo = models.TextField(blank=True, verbose_name="メモ")
 
+    objects = SalaryRecordQuerySet.as_manager()
+
+    # calculate_all() で計算される項目
+    CALCULATED_FIELDS = [
+        'total_payment', 'taxable_amount', 'total_deduction',
+        'actual_payment', 'net_payment', 'difference',
+    ]
+
     class Meta:
         ordering = ['-year_month']
         verbose_name = "給与明細"
@@ -343,20 +402,19 @@ class SalaryRecord(models.Model):
         self.calculate_all()
         super().save(*args, **kwargs)
 
+    def _neighbor(self, direction, months):
+        """前月・翌月のレコード（インスタンスごとにメモ化）"""
+        cache = self.__dict__.setdefault('_neighbor_cache', {})
+        if direction not in cache:
+            cache[direction] = SalaryRecord.objects.filter(
+                year_month=add_months(self.year_month, months)
+            ).first()
+        return cache[direction]
+
     def get_previous_month(self):
         """前月の給与レコードを取得"""
-        from dateutil.relativedelta import relativedelta
-        previous_month = self.year_month - relativedelta(months=1)
-        try:
-            return SalaryRecord.objects.get(year_month=previous_month)
-        except SalaryRecord.DoesNotExist:
-            return None
+        return self._neighbor('previous', -1)
 
     def get_next_month(self):
         """翌月の給与レコードを取得"""
-        from dateutil.relativedelta import relativedelta
-        next_month = self.year_month + relativedelta(months=1)
-        try:
-            return SalaryRecord.objects.get(year_month=next_month)
-        except SalaryRecord.DoesNotExist:
-            return None
+        return self._neighbor('next', 1)
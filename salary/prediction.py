@@ -0,0 +1,175 @@
+"""
+手取り給与の予測
+給与明細の履歴から残業・深夜・休日出勤の月別傾向と単価を推定し、将来の月の実支給額を予測する
+
+推定したパラメータは、給与明細の件数と最終更新日時（data_version()）をキーに Django のキャッシュに保存する
+キャッシュがあれば集計1クエリだけで済み、履歴は読み込まない
+（update() / bulk_update() で変更する場合は updated_at も更新すること）
+"""
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from common.months import add_months, month_start
+
+
+DEFAULT_HISTORY_MONTHS = 24
+CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+# 月別平均を全体平均に寄せる強さ（観測が少ない月ほど全体平均に近づく）
+SEASONAL_PRIOR = 1
+
+# 予測で変動させる項目: (時間のフィールド, 手当のフィールド)
+VARIABLE_ITEMS = {
+    'overtime': ('overtime_minutes', 'overtime_pay'),
+    'night_work': ('night_work_minutes', 'night_work_pay'),
+    'holiday_work': ('holiday_work_hours', 'holiday_work_pay'),
+}
+
+# 月によって変わらないとみなす控除（最新月の値を使う）
+FIXED_DEDUCTION_FIELDS = [
+    'health_insurance', 'fire_insurance', 'pension_insurance', 'matching_contribution',
+    'resident_tax', 'mutual_aid', 'union_fee', 'damage_insurance', 'ltd_insurance',
+    'company_housing_deduction',
+]
+
+HISTORY_FIELDS = [
+    'year_month', 'total_payment', 'taxable_amount', 'employment_insurance', 'monthly_income_tax',
+    'dependent_family_count',
+    *[field for item in VARIABLE_ITEMS.values() for field in item],
+    *FIXED_DEDUCTION_FIELDS,
+]
+
+
+def _withholding_tax(amount, dependents):
+    from . import tax_tables
+    return int(tax_tables.computed_withholding_tax(amount, dependents))
+
+
+def load_history(history_months=DEFAULT_HISTORY_MONTHS):
+    """直近 history_months ヶ月の給与明細（新しい順、1クエリ）"""
+    from .models import SalaryRecord
+    return list(SalaryRecord.objects.order_by('-year_month').values_list(*HISTORY_FIELDS)[:history_months])
+
+
+def fit(history_months=DEFAULT_HISTORY_MONTHS):
+    """
+    直近 history_months ヶ月の給与明細から予測パラメータを推定（1クエリ）
+    履歴がなければ None
+    """
+    history = [dict(zip(HISTORY_FIELDS, row)) for row in load_history(history_months)]
+    if not history:
+        return None
+    latest = history[0]
+
+    rates, overall, seasonal = {}, {}, {}
+    for name, (quantity_field, pay_field) in VARIABLE_ITEMS.items():
+        quantities = [float(r[quantity_field]) for r in history]
+        total_quantity = sum(quantities)
+        # 単価（時間あたりの手当）は履歴全体の合計の比
+        rates[name] = sum(r[pay_field] for r in history) / total_quantity if total_quantity else 0.0
+        overall[name] = total_quantity / len(history)
+
+        by_month = {}
+        for record, quantity in zip(history, quantities):
+            by_month.setdefault(record['year_month'].month, []).append(quantity)
+        seasonal[name] = {
+            month: (sum(values) + SEASONAL_PRIOR * overall[name]) / (len(values) + SEASONAL_PRIOR)
+            for month, values in by_month.items()
+        }
+
+    variable_pay = sum(latest[pay_field] for quantity_field, pay_field in VARIABLE_ITEMS.values())
+    total_payment = latest['total_payment']
+    fixed_deduction = sum(latest[field] for field in FIXED_DEDUCTION_FIELDS)
+    employment_rate = latest['employment_insurance'] / total_payment if total_payment else 0.0
+    dependents = latest['dependent_family_count']
+    non_taxable = total_payment - latest['taxable_amount']
+
+    # 実際の所得税と電子計算機による計算との差（月額表との差など）を補正として使う
+    # 所得税が未入力（0）の明細では補正しない
+    tax_adjustment = 0
+    if latest['monthly_income_tax']:
+        social_insurance = latest['health_insurance'] + latest['pension_insurance'] + latest['employment_insurance']
+        tax_adjustment = latest['monthly_income_tax'] - _withholding_tax(
+            latest['taxable_amount'] - social_insurance, dependents
+        )
+
+    return {
+        'history_months': len(history),
+        'latest_month': latest['year_month'],
+        'fixed_payment': total_payment - variable_pay,
+        'rates': rates,
+        'overall': overall,
+        'seasonal': seasonal,
+        'fixed_deduction': fixed_deduction,
+        'social_insurance': latest['health_insurance'] + latest['pension_insurance'],
+        'employment_rate': employment_rate,
+        'non_taxable': non_taxable,
+        'dependents': dependents,
+        'tax_adjustment': tax_adjustment,
+    }
+
+
+def data_version():
+    """給与明細の件数と最終更新日時から作ったデータの版（1クエリ）"""
+    from .models import SalaryRecord
+    stats = SalaryRecord.objects.aggregate(count=Count('pk'), updated=Max('updated_at'))
+    updated = stats['updated'].isoformat() if stats['updated'] else ''
+    return f"{stats['count']}:{updated}"
+
+
+def get_model(history_months=DEFAULT_HISTORY_MONTHS):
+    """
+    キャッシュ済みの予測パラメータ（なければ推定してキャッシュ）
+    給与明細が追加・変更・削除されていれば data_version() が変わり、別のキーになる
+    """
+    key = f'salary:prediction:{data_version()}:{history_months}'
+    model = cache.get(key)
+    if model is None:
+        model = fit(history_months)
+        if model is not None:
+            cache.set(key, model, CACHE_TIMEOUT)
+    return model
+
+
+def predict_with(model, year_month):
+    """予測パラメータから year_month の給与を予測"""
+    year_month = month_start(year_month)
+    result = {'year_month': year_month}
+    variable_pay = 0
+    for name in VARIABLE_ITEMS:
+        quantity = model['seasonal'][name].get(year_month.month, model['overall'][name])
+        pay = round(quantity * model['rates'][name])
+        result[f'{name}_quantity'] = round(quantity, 2)
+        result[f'{name}_pay'] = pay
+        variable_pay += pay
+
+    total_payment = model['fixed_payment'] + variable_pay
+    employment_insurance = round(total_payment * model['employment_rate'])
+    taxable = total_payment - model['non_taxable'] - model['social_insurance'] - employment_insurance
+    income_tax = max(_withholding_tax(taxable, model['dependents']) + model['tax_adjustment'], 0)
+    total_deduction = model['fixed_deduction'] + employment_insurance + income_tax
+
+    result.update({
+        'total_payment': total_payment,
+        'employment_insurance': employment_insurance,
+        'monthly_income_tax': income_tax,
+        'total_deduction': total_deduction,
+        'actual_payment': total_payment - total_deduction,
+    })
+    return result
+
+
+def predict(year_month, history_months=DEFAULT_HISTORY_MONTHS):
+    """year_month の給与を予測（履歴がなければ None）"""
+    model = get_model(history_months)
+    if model is None:
+        return None
+    return predict_with(model, year_month)
+
+
+def predict_months(start, months, history_months=DEFAULT_HISTORY_MONTHS):
+    """start から months ヶ月分の予測（履歴がなければ空）"""
+    model = get_model(history_months)
+    if model is None:
+        return []
+    return [predict_with(model, add_months(start, i)) for i in range(months)]
@@ -0,0 +1,12 @@
+from rest_framework import serializers
+
+from .models import SalaryRecord
+
+
+class SalaryRecordSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = SalaryRecord
+        fields = '__all__'
+        # save() 時に calculate_all() で計算される
+        read_only_fields = SalaryRecord.CALCULATED_FIELDS + ['overtime_hours']
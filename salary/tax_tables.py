@@ -0,0 +1,271 @@
+"""
+源泉所得税・社会保険料の料率表エンジン
+等級表・税額表をソート済みの配列として持ち、np.searchsorted で区分を引く
+（1件あたり O(log n)、行ごとの Python の分岐なし）
+スカラーでも配列でも同じ関数で計算できるので、多数の給与シナリオを一度に試算できる
+
+- 標準報酬月額: 健康保険 50等級 / 厚生年金 32等級（令和2年9月～）
+- 源泉所得税: 月額表甲欄の電子計算機による計算の特例（令和2年分以降）
+  国税庁の月額表（CSV）を読み込んで表引きすることもできる
+- 被保険者負担分の端数: 50銭以下切捨て・50銭超切上げ
+
+金額の計算はすべて整数演算（料率は10万分率）で行い、浮動小数点の誤差を避ける
+
+NumPy が必要: pip install numpy
+"""
+import copy
+import csv
+from decimal import Decimal
+
+from common.optional import np, require_numpy
+
+
+# 料率の単位（10万分率: 9.98% -> 9980）
+RATE_SCALE = 100000
+
+
+def rate_units(percent):
+    """パーセント表記の料率（'9.98'）を10万分率の整数にする"""
+    return int(Decimal(str(percent)) * RATE_SCALE / 100)
+
+
+def employee_share(numerator, denominator):
+    """
+    numerator / denominator 円を被保険者負担分の規則で円単位にする
+    50銭以下は切捨て、50銭を超える場合は切上げ
+    """
+    return (2 * numerator + denominator - 1) // (2 * denominator)
+
+
+# ========================================
+# 標準報酬月額
+# ========================================
+
+class GradeTable:
+    """
+    標準報酬月額の等級表
+    lower_bounds: 各等級の報酬月額の下限（昇順、先頭は0）
+    """
+
+    def __init__(self, lower_bounds, standard_amounts):
+        require_numpy('料率表の計算')
+        self.lower_bounds = np.asarray(lower_bounds, dtype=np.int64)
+        self.standard_amounts = np.asarray(standard_amounts, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.standard_amounts)
+
+    def index(self, remuneration):
+        return np.searchsorted(self.lower_bounds, np.asarray(remuneration), side='right') - 1
+
+    def grade(self, remuneration):
+        """報酬月額の等級（1始まり）"""
+        return self.index(remuneration) + 1
+
+    def standard(self, remuneration):
+        """報酬月額に対応する標準報酬月額"""
+        return self.standard_amounts[self.index(remuneration)]
+
+
+HEALTH_STANDARD_AMOUNTS = [
+    58000, 68000, 78000, 88000, 98000, 104000, 110000, 118000, 126000, 134000,
+    142000, 150000, 160000, 170000, 180000, 190000, 200000, 220000, 240000, 260000,
+    280000, 300000, 320000, 340000, 360000, 380000, 410000, 440000, 470000, 500000,
+    530000, 560000, 590000, 620000, 650000, 680000, 710000, 750000, 790000, 830000,
+    880000, 930000, 980000, 1030000, 1090000, 1150000, 1210000, 1270000, 1330000, 1390000,
+]
+
+# 各等級の報酬月額の下限（1等級は0円から）
+HEALTH_LOWER_BOUNDS = [
+    0, 63000, 73000, 83000, 93000, 101000, 107000, 114000, 122000, 130000,
+    138000, 146000, 155000, 165000, 175000, 185000, 195000, 210000, 230000, 250000,
+    270000, 290000, 310000, 330000, 350000, 370000, 395000, 425000, 455000, 485000,
+    515000, 545000, 575000, 605000, 635000, 665000, 695000, 730000, 770000, 810000,
+    855000, 905000, 955000, 1005000, 1055000, 1115000, 1175000, 1235000, 1295000, 1355000,
+]
+
+# 厚生年金は健康保険の4等級（88,000円）～35等級（650,000円）に対応
+PENSION_STANDARD_AMOUNTS = HEALTH_STANDARD_AMOUNTS[3:35]
+PENSION_LOWER_BOUNDS = [0] + HEALTH_LOWER_BOUNDS[4:35]
+
+
+class InsuranceRates:
+    """
+    社会保険料率（パーセント、労使合計。雇用保険のみ被保険者負担分）
+    既定値は協会けんぽ東京支部・一般の事業（令和6年度）
+    """
+
+    def __init__(self, health='9.98', care='1.60', pension='18.300', employment='0.6'):
+        self.health = rate_units(health)
+        self.care = rate_units(care)
+        self.pension = rate_units(pension)
+        self.employment = rate_units(employment)
+
+
+DEFAULT_RATES = InsuranceRates()
+
+
+# ========================================
+# 源泉所得税（月額表甲欄・電子計算機による計算の特例）
+# ========================================
+
+# 給与所得控除: A以上の区分ごとに ceil(A × 率%) + 定額
+EMPLOYMENT_DEDUCTION_BOUNDS = [0, 135417, 150000, 300000, 550000, 708331]
+EMPLOYMENT_DEDUCTION_PERCENT = [0, 40, 30, 20, 10, 0]
+EMPLOYMENT_DEDUCTION_FIXED = [45834, -8333, 6667, 36667, 91667, 162500]
+
+# 配偶者（特別）控除・扶養控除（1人あたり）
+DEPENDENT_DEDUCTION = 31667
+
+# 基礎控除
+BASIC_DEDUCTION_BOUNDS = [0, 2162500, 2204167, 2245834]
+BASIC_DEDUCTION_AMOUNTS = [40000, 26667, 13334, 0]
+
+# 税額: 課税給与所得金額B以上の区分ごとに B × 税率 − 控除額（10円未満四捨五入）
+TAX_BOUNDS = [0, 162501, 275001, 579167, 750001, 1500001, 3333334]
+TAX_RATES = [5105, 10210, 20420, 23483, 33693, 40840, 45945]  # 10万分率（復興特別所得税込み）
+TAX_SUBTRACTIONS = [0, 8296, 36374, 54113, 130688, 237893, 408061]
+
+
+def _lookup(bounds, values, amounts):
+    return np.asarray(values, dtype=np.int64)[
+        np.searchsorted(np.asarray(bounds, dtype=np.int64), amounts, side='right') - 1
+    ]
+
+
+def computed_withholding_tax(amount, dependents=0):
+    """
+    電子計算機による計算の特例で月額の源泉所得税を計算
+    amount: 社会保険料等控除後の給与等の金額、dependents: 扶養親族等の数
+    """
+    require_numpy('料率表の計算')
+    amount = np.asarray(amount, dtype=np.int64)
+    dependents = np.asarray(dependents, dtype=np.int64)
+
+    percent = _lookup(EMPLOYMENT_DEDUCTION_BOUNDS, EMPLOYMENT_DEDUCTION_PERCENT, amount)
+    fixed = _lookup(EMPLOYMENT_DEDUCTION_BOUNDS, EMPLOYMENT_DEDUCTION_FIXED, amount)
+    employment_deduction = -(-(amount * percent) // 100) + fixed  # 1円未満切上げ
+
+    taxable = np.maximum(
+        amount - employment_deduction - DEPENDENT_DEDUCTION * dependents
+        - _lookup(BASIC_DEDUCTION_BOUNDS, BASIC_DEDUCTION_AMOUNTS, amount),
+        0
+    )
+    rate = _lookup(TAX_BOUNDS, TAX_RATES, taxable)
+    subtraction = _lookup(TAX_BOUNDS, TAX_SUBTRACTIONS, taxable)
+    # (B × 税率 − 控除額) を10円未満四捨五入
+    tax = (taxable * rate - subtraction * RATE_SCALE + 5 * RATE_SCALE) // (10 * RATE_SCALE) * 10
+    return np.maximum(tax, 0)
+
+
+class WithholdingTable:
+    """
+    国税庁の月額表（甲欄）
+    CSVの各行: 以上, 未満, 扶養0人, 1人, ..., 7人 の税額
+    表の範囲を超える金額は電子計算機による計算の特例で計算する
+    """
+
+    # 扶養親族等が7人を超える場合の1人あたりの控除額
+    EXTRA_DEPENDENT_DEDUCTION = 1610
+
+    def __init__(self, lower_bounds, upper_bound, taxes):
+        require_numpy('料率表の計算')
+        self.lower_bounds = np.asarray(lower_bounds, dtype=np.int64)
+        self.upper_bound = upper_bound
+        self.taxes = np.asarray(taxes, dtype=np.int64)  # (行数, 8)
+
+    @classmethod
+    def from_csv(cls, path, encoding='utf-8-sig'):
+        lower_bounds, taxes, upper_bound = [], [], 0
+        with open(path, newline='', encoding=encoding) as f:
+            for row in csv.reader(f):
+                cells = [cell.replace(',', '').strip() for cell in row]
+                if not cells or not cells[0].isdigit():
+                    continue  # 見出し行
+                lower_bounds.append(int(cells[0]))
+                upper_bound = max(upper_bound, int(cells[1]))
+                taxes.append([int(cell or 0) for cell in cells[2:10]])
+        if not lower_bounds:
+            raise ValueError(f"月額表の行がありません: {path}")
+        return cls(lower_bounds, upper_bound, taxes)
+
+    def tax(self, amount, dependents=0):
+        amount = np.asarray(amount, dtype=np.int64)
+        dependents = np.asarray(dependents, dtype=np.int64)
+        row = np.clip(np.searchsorted(self.lower_bounds, amount, side='right') - 1, 0, None)
+        column = np.minimum(dependents, 7)
+        tax = self.taxes[row, column] - self.EXTRA_DEPENDENT_DEDUCTION * np.maximum(dependents - 7, 0)
+        tax = np.where(amount < self.lower_bounds[0], 0, np.maximum(tax, 0))
+        return np.where(amount >= self.upper_bound, computed_withholding_tax(amount, dependents), tax)
+
+
+# ========================================
+# 控除額の計算
+# ========================================
+
+def deductions(total_payment, taxable_payment=None, dependents=0, standard=None,
+               rates=DEFAULT_RATES, care=False, withholding_table=None):
+    """
+    給与から控除する社会保険料・源泉所得税を計算（引数はスカラーでも配列でもよい）
+    - total_payment: 支給総額（雇用保険料の対象、標準報酬月額を省略したときの報酬月額）
+    - taxable_payment: 課税支給額（省略時は支給総額）
+    - standard: 標準報酬月額（省略時は支給総額から等級表で決める）
+    - care: 介護保険第2号被保険者（40～64歳）か
+    - withholding_table: 月額表（省略時は電子計算機による計算の特例）
+    戻り値: {'health_insurance', 'pension_insurance', 'employment_insurance', 'monthly_income_tax'}
+    """
+    require_numpy('料率表の計算')
+    total_payment = np.asarray(total_payment, dtype=np.int64)
+    taxable_payment = total_payment if taxable_payment is None else np.asarray(taxable_payment, dtype=np.int64)
+    if standard is None:
+        health_standard = HEALTH_GRADES.standard(total_payment)
+        pension_standard = PENSION_GRADES.standard(total_payment)
+    else:
+        health_standard = HEALTH_GRADES.standard(standard)
+        pension_standard = PENSION_GRADES.standard(standard)
+
+    # 労使折半: 標準報酬月額 × 料率 ÷ 2
+    health_rate = rates.health + (rates.care if care else 0)
+    health = employee_share(health_standard * health_rate, 2 * RATE_SCALE)
+    pension = employee_share(pension_standard * rates.pension, 2 * RATE_SCALE)
+    employment = employee_share(total_payment * rates.employment, RATE_SCALE)
+
+    after_insurance = taxable_payment - health - pension - employment
+    if withholding_table is None:
+        tax = computed_withholding_tax(after_insurance, dependents)
+    else:
+        tax = withholding_table.tax(after_insurance, dependents)
+
+    return {
+        'health_insurance': health,
+        'pension_insurance': pension,
+        'employment_insurance': employment,
+        'monthly_income_tax': tax,
+    }
+
+
+def record_deductions(record, rates=DEFAULT_RATES, care=False, withholding_table=None):
+    """
+    SalaryRecord 1件の控除額を計算（record は変更しない）
+    保険標準報酬額・扶養家族が入力されていればそれを使う
+    支給総額・課税対象額はコピーで calculate_all() して求める
+    """
+    record = copy.copy(record)
+    record.calculate_all()
+    result = deductions(
+        record.total_payment,
+        taxable_payment=record.taxable_amount,
+        dependents=record.dependent_family_count,
+        standard=record.insurance_standard_salary or None,
+        rates=rates,
+        care=care,
+        withholding_table=withholding_table,
+    )
+    return {name: int(value) for name, value in result.items()}
+
+
+if np is not None:
+    HEALTH_GRADES = GradeTable(HEALTH_LOWER_BOUNDS, HEALTH_STANDARD_AMOUNTS)
+    PENSION_GRADES = GradeTable(PENSION_LOWER_BOUNDS, PENSION_STANDARD_AMOUNTS)
+else:  # pragma: no cover
+    HEALTH_GRADES = PENSION_GRADES = None
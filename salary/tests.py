@@ -1,3 +1,352 @@
-from django.test import TestCase
+import os
+import re
+import tempfile
+import zipfile
+from datetime import date, datetime
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import SalaryRecord
+
+from . import prediction, tax_tables
+
+try:
+    import openpyxl
+except ImportError:  # pragma: no cover
+    openpyxl = None
+
+
+@skipIf(openpyxl is None, 'openpyxl が必要です')
+class SalaryWorkbookImporterTests(TestCase):
+    """月ごとに1列のレイアウトのExcelを取込めることを確認"""
+
+    def setUp(self):
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(['給与計算'])
+        sheet.append(['区分', '項目', datetime(2025, 1, 1), '2025年2月', '2025/3'])
+        sheet.append(['支給', '基本給', 300000, 300000, None])
+        sheet.append([None, '時間外手当', 12000, '8,000', None])
+        sheet.append(['控除', '健康保険', 15000, 15000, None])
+        sheet.append([None, '所得税', 7000, 'x', None])
+
+        fd, self.path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        workbook.save(self.path)
+        self.addCleanup(os.remove, self.path)
+
+    def test_import_file(self):
+        from .importers import import_salary_workbook
+
+        SalaryRecord.objects.create(year_month=date(2025, 1, 1), resident_tax=10000)
+
+        with self.assertNumQueries(4):
+            importer = import_salary_workbook(self.path)
+
+        self.assertEqual((importer.created, importer.updated), (1, 1))
+        self.assertEqual(importer.errors, [('D6', "月次所得税を数値に変換できません: 'x'")])
+        # 未入力の列（3月）は取込まない
+        self.assertEqual(SalaryRecord.objects.count(), 2)
+
+        january = SalaryRecord.objects.get(year_month=date(2025, 1, 1))
+        self.assertEqual(january.resident_tax, 10000)  # Excelにない項目はそのまま
+        self.assertEqual(january.total_payment, 312000)
+        self.assertEqual(january.actual_payment, 312000 - 15000 - 7000 - 10000)
+
+        february = SalaryRecord.objects.get(year_month=date(2025, 2, 1))
+        self.assertEqual(february.overtime_pay, 8000)
+        self.assertEqual(february.actual_payment, 308000 - 15000)
+
+
+def _save_with_cached_values(workbook, path, cached):
+    """
+    数式セルにキャッシュ値を書き込んで保存（openpyxl は計算結果を保存しないため）
+    cached: {(シート番号, 'B5'): 値}
+    """
+    workbook.save(path)
+    with zipfile.ZipFile(path) as source:
+        contents = {name: source.read(name) for name in source.namelist()}
+    for (index, cell), value in cached.items():
+        name = f'xl/worksheets/sheet{index}.xml'
+        xml = contents[name].decode()
+        pattern = re.compile(rf'(<c r="{cell}"[^>]*>)(<f>.*?</f>)<v\s*/>')
+        if isinstance(value, str):
+            replacement = rf'<c r="{cell}" t="str">\2<v>{value}</v>'
+        else:
+            replacement = rf'\1\2<v>{value}</v>'
+        xml, count = pattern.subn(replacement, xml)
+        assert count == 1, cell
+        contents[name] = xml.encode()
+    with zipfile.ZipFile(path, 'w') as target:
+        for name, data in contents.items():
+            target.writestr(name, data)
+
+
+@skipIf(openpyxl is None, 'openpyxl が必要です')
+class FormulaWorkbookTests(TestCase):
+    """数式のコンパイル結果がブックのキャッシュ値と一致することを確認"""
+
+    def setUp(self):
+        from openpyxl.workbook.defined_name import DefinedName
+
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.title = '給与'
+        sheet.append(['項目', datetime(2025, 1, 1), datetime(2025, 2, 1)])
+        sheet.append(['基本給', 300000, 310000])                                  # 2
+        sheet.append(['時間外手当', 12345, 0])                                    # 3
+        sheet.append(['支給総額', '=SUM(B2:B3)', '=SUM(C2:C3)'])                  # 4
+        sheet.append(['健康保険', '=ROUND(B4*料率/2,0)', '=ROUND(C4*料率/2,0)'])  # 5
+        sheet.append(['月次所得税', "=IFERROR(VLOOKUP(B4-B5,税額表!$A$2:$B$4,2),0)",
+                      "=IFERROR(VLOOKUP(C4-C5,税額表!$A$2:$B$4,2),0)"])           # 6
+        sheet.append(['控除合計', '=B5+B6', '=C5+C6'])                            # 7
+        sheet.append(['実支給額', '=B4-B7', '=C4-C7'])                            # 8
+        sheet.append(['判定', '=IF(B8>=280000,"OK","NG")', '=IF(C8>=280000,"OK","NG")'])
+        sheet['E1'] = 0.1
+        workbook.defined_names['料率'] = DefinedName('料率', attr_text='給与!$E$1')
+
+        table = workbook.create_sheet('税額表')
+        table.append(['以上', '税額'])
+        table.append([0, 0])
+        table.append([250000, 6000])
+        table.append([300000, 8000])
+
+        fd, self.path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        # Excel で計算した場合の結果
+        self.cached = {
+            (1, 'B4'): 312345, (1, 'C4'): 310000,
+            (1, 'B5'): 15617, (1, 'C5'): 15500,
+            (1, 'B6'): 6000, (1, 'C6'): 6000,
+            (1, 'B7'): 21617, (1, 'C7'): 21500,
+            (1, 'B8'): 290728, (1, 'C8'): 288500,
+            (1, 'B9'): 'OK', (1, 'C9'): 'OK',
+        }
+        self.workbook = workbook
+
+    def load(self, cached):
+        from .formulas import FormulaWorkbook
+
+        _save_with_cached_values(self.workbook, self.path, cached)
+        return FormulaWorkbook.load(self.path)
+
+    def test_verify(self):
+        workbook = self.load(self.cached)
+        self.assertEqual(workbook.uncompiled, {})
+        self.assertEqual(workbook.verify(), [])
+
+    def test_verify_reports_mismatch(self):
+        workbook = self.load({**self.cached, (1, 'B6'): 7000})
+        mismatches = workbook.verify()
+        self.assertEqual([(key, expected, actual) for key, formula, expected, actual in mismatches],
+                         [(('給与', 6, 2), 7000, 6000)])
+
+    def test_recalculates_downstream_only(self):
+        workbook = self.load(self.cached)
+        self.assertEqual(
+            workbook.downstream([('給与', 3, 2)]),
+            [('給与', 4, 2), ('給与', 5, 2), ('給与', 6, 2), ('給与', 7, 2), ('給与', 8, 2), ('給与', 9, 2)],
+        )
+
+        changed = workbook.set_values({('給与', 3, 3): 50000})
+        self.assertEqual({(row, column) for sheet, row, column in changed}, {(3, 3), (4, 3), (5, 3), (6, 3), (7, 3), (8, 3)})
+        self.assertEqual(workbook.values[('給与', 8, 3)], 360000 - 18000 - 8000)
+        self.assertEqual(workbook.values[('給与', 8, 2)], 290728)
+
+    def test_payroll_calculator(self):
+        from .formulas import PayrollCalculator
+
+        calculator = PayrollCalculator(self.load(self.cached))
+        record = SalaryRecord(year_month=date(2025, 3, 1), base_salary=320000, overtime_pay=0)
+        calculator.calculate(record)
+
+        self.assertEqual(record.total_payment, 320000)
+        self.assertEqual(record.health_insurance, 16000)
+        self.assertEqual(record.monthly_income_tax, 8000)
+        self.assertEqual(record.actual_payment, 296000)
+
+    def test_payroll_calculator_blank_and_text(self):
+        from .formulas import PayrollCalculator
+
+        label = SalaryRecord._meta.get_field('year_end_adjustment').verbose_name
+        self.workbook.active.append([label, '=IF(B3=0,"",B3)', '=IF(C3=0,"","精算なし")'])  # 10
+        calculator = PayrollCalculator(self.load(self.cached))
+
+        record = SalaryRecord(year_month=date(2025, 1, 1), base_salary=320000, overtime_pay=0)
+        calculator.calculate(record)
+        self.assertEqual(record.year_end_adjustment, 0)
+
+        record = SalaryRecord(year_month=date(2025, 2, 1), base_salary=320000, overtime_pay=500)
+        with self.assertRaisesMessage(ValueError, "給与!C10 を数値に変換できません: '精算なし'"):
+            calculator.calculate(record)
+
+
+@skipIf(tax_tables.np is None, 'NumPy が必要です')
+class TaxTableTests(TestCase):
+    """等級表・税額表の区分と端数処理を確認"""
+
+    def test_grades(self):
+        self.assertEqual(tax_tables.HEALTH_GRADES.grade([62999, 63000, 1354999, 1355000]).tolist(), [1, 2, 49, 50])
+        self.assertEqual(
+            tax_tables.PENSION_GRADES.standard([50000, 93000, 634999, 635000]).tolist(),
+            [88000, 98000, 620000, 650000]
+        )
+
+    def test_employee_share_rounding(self):
+        # 50銭以下は切捨て、50銭超は切上げ
+        self.assertEqual(tax_tables.employee_share(1005, 10), 100)
+        self.assertEqual(tax_tables.employee_share(1006, 10), 101)
+
+    def test_computed_withholding_tax(self):
+        tax = tax_tables.computed_withholding_tax([300000, 300000, 210000, 50000], [0, 1, 0, 0])
+        self.assertEqual(tax.tolist(), [8380, 6720, 5120, 0])
+
+    def test_scalar_and_vectorized_agree(self):
+        payments = [180000, 250000, 300000, 420000, 900000]
+        vectorized = tax_tables.deductions(payments, dependents=[0, 1, 2, 0, 3], care=True)
+        for i, payment in enumerate(payments):
+            scalar = tax_tables.deductions(payment, dependents=[0, 1, 2, 0, 3][i], care=True)
+            for name, values in vectorized.items():
+                self.assertEqual(int(scalar[name]), int(values[i]), name)
+
+    def test_record_deductions(self):
+        record = SalaryRecord(year_month=date(2025, 4, 1), base_salary=300000)
+        self.assertEqual(tax_tables.record_deductions(record), {
+            'health_insurance': 14970,
+            'pension_insurance': 27450,
+            'employment_insurance': 1800,
+            'monthly_income_tax': 6760,
+        })
+        self.assertEqual((record.total_payment, record.taxable_amount, record.total_deduction), (0, 0, 0))
+
+    def test_withholding_table_csv(self):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('以上,未満,0人,1人,2人,3人,4人,5人,6人,7人\n')
+            f.write('88000,89000,130,0,0,0,0,0,0,0\n')
+            f.write('"299,000","302,000",8420,6800,5190,3570,1960,330,0,0\n')
+        table = tax_tables.WithholdingTable.from_csv(path)
+
+        self.assertEqual(table.tax([87999, 88500, 300000, 300000], [0, 0, 0, 2]).tolist(), [0, 130, 8420, 5190])
+        # 表の範囲外は電子計算機による計算
+        self.assertEqual(table.tax(302000).tolist(), tax_tables.computed_withholding_tax(302000).tolist())
+
+
+@skipIf(tax_tables.np is None, 'NumPy が必要です')
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SalaryPredictionTests(TestCase):
+    """予測パラメータがキャッシュされ、給与明細の変更でだけ作り直されることを確認"""
+
+    def setUp(self):
+        cache.clear()
+        for month, minutes in [(1, 600), (2, 1200), (3, 600)]:
+            SalaryRecord.objects.create(
+                year_month=date(2025, month, 1), base_salary=300000,
+                overtime_minutes=minutes, overtime_pay=minutes * 40,
+                health_insurance=15000, pension_insurance=27450,
+                employment_insurance=1800, resident_tax=10000,
+            )
+
+    def test_predict(self):
+        result = prediction.predict(date(2026, 2, 1))
+        # 2月の残業は (1200 + 全体平均800) / 2 = 1000分
+        self.assertEqual(result['overtime_quantity'], 1000)
+        self.assertEqual(result['overtime_pay'], 40000)
+        self.assertEqual(result['total_payment'], 340000)
+        self.assertEqual(result['actual_payment'], 340000 - result['total_deduction'])
+
+    def test_cached_until_salary_record_changes(self):
+        prediction.predict(date(2025, 4, 1))
+        with mock.patch.object(prediction, 'fit', wraps=prediction.fit) as fit:
+            with self.assertNumQueries(1):  # 件数・最終更新日時の集計だけ（履歴は読まない）
+                prediction.predict(date(2025, 5, 1))
+            self.assertEqual(fit.call_count, 0)
+
+            # save() を通らない変更でも updated_at を更新すれば作り直される
+            SalaryRecord.objects.filter(year_month=date(2025, 3, 1)).update(
+                overtime_minutes=1800, updated_at=timezone.now()
+            )
+            result = prediction.predict(date(2026, 3, 1))
+            self.assertEqual(fit.call_count, 1)
+        # 3月の残業は (1800 + 全体平均1200) / 2 = 1500分
+        self.assertEqual(result['overtime_quantity'], 1500)
+
+        # 削除でも件数が変わるため作り直される
+        SalaryRecord.objects.filter(year_month=date(2025, 3, 1)).delete()
+        self.assertEqual(prediction.predict(date(2026, 3, 1))['overtime_quantity'], 900)
+
+
+class SalaryRecordNeighborTests(TestCase):
+    """前月・翌月の参照がまとめて1クエリで取れることを確認"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for month in (1, 2, 3, 5):
+            SalaryRecord.objects.create(year_month=date(2025, month, 1), base_salary=month * 100000)
+
+    def test_between_with_neighbors(self):
+        with self.assertNumQueries(1):
+            records = SalaryRecord.objects.between_with_neighbors(date(2025, 2, 1), date(2025, 5, 1))
+            pairs = [
+                (r.year_month.month, getattr(r.get_previous_month(), 'base_salary', None),
+                 getattr(r.get_next_month(), 'base_salary', None))
+                for r in records
+            ]
+        self.assertEqual(pairs, [(2, 100000, 300000), (3, 200000, None), (5, None, None)])
+
+    def test_get_previous_month_is_memoized(self):
+        record = SalaryRecord.objects.get(year_month=date(2025, 3, 1))
+        with self.assertNumQueries(1):
+            self.assertEqual(record.get_previous_month().base_salary, 200000)
+            record.get_previous_month()
+
+    def test_with_neighbors(self):
+        with self.assertNumQueries(1):
+            rows = list(SalaryRecord.objects.with_neighbors().values_list(
+                'year_month', 'previous_year_month', 'previous_total_payment', 'next_total_payment'
+            ))
+        self.assertEqual(rows[0], (date(2025, 1, 1), None, None, 200000))
+        self.assertEqual(rows[3], (date(2025, 5, 1), date(2025, 3, 1), 300000, None))
+
+
+class SalaryRecordApiTests(TestCase):
+    """?fields= で項目と読み込む列が絞られることを確認"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('api', password='api'))
+        for month in (1, 2):
+            SalaryRecord.objects.create(year_month=date(2025, month, 1), base_salary=300000, resident_tax=20000)
+
+    def test_sparse_fields(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/salary-records/', {'fields': 'year_month,actual_payment'})
+        self.assertEqual(response.json()['results'], [
+            {'year_month': '2025-02-01', 'actual_payment': 280000},
+            {'year_month': '2025-01-01', 'actual_payment': 280000},
+        ])
+        sql = context.captured_queries[-1]['sql']
+        self.assertIn('actual_payment', sql)
+        self.assertNotIn('base_salary', sql)
+
+    def test_unknown_field(self):
+        response = self.client.get('/api/salary-records/', {'fields': 'year_month,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['fields'])
+
+    def test_calculated_fields_are_read_only(self):
+        response = self.client.post(
+            '/api/salary-records/',
+            {'year_month': '2025-03-01', 'base_salary': 250000, 'actual_payment': 1},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['actual_payment'], 250000)
@@ -0,0 +1,9 @@
+from rest_framework.routers import SimpleRouter
+
+from . import views
+
+
+router = SimpleRouter()
+router.register('salary-records', views.SalaryRecordViewSet)
+
+urlpatterns = router.urls
@@ -1,3 +1,12 @@
-from django.shortcuts import render
+from rest_framework import viewsets
 
-# Create your views here.
+from common.api import SparseFieldsetMixin, cursor_pagination
+from .models import SalaryRecord
+from .serializers import SalaryRecordSerializer
+
+
+class SalaryRecordViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
+    """給与明細（40項目以上あるため ?fields= で絞って取得する）"""
+    queryset = SalaryRecord.objects.all()
+    serializer_class = SalaryRecordSerializer
+    pagination_class = cursor_pagination('-year_month')